@@ -0,0 +1,325 @@
+"""キー入力から描画までの処理時間を計測するベンチマーク
+
+QT_QPA_PLATFORM=offscreen で動作し、結果をJSONで出力する。
+
+    python benchmarks/benchmark.py --switches 1000 --image-size 2000x1500
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# sys.pathとos.environの変更だけならE402にならない
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+)
+
+from PIL import Image
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtTest import QTest
+
+from constants import (
+    DEFAULT_INFO,
+    IMAGE_DIR,
+    KEY_MAP_FILE,
+    SWITCH_FILE,
+    SWITCH_TYPES,
+    VALID_KEYS,
+)
+
+PAINT_TIMEOUT = 1.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--switches", type=int, default=100, help="10 - 10000")
+    parser.add_argument("--images", type=int, default=20, help="distinct image files")
+    parser.add_argument("--image-size", default="1600x1200", help="WIDTHxHEIGHT")
+    parser.add_argument("--presses", type=int, default=500)
+    parser.add_argument("--burst", type=int, default=10, help="presses per burst")
+    parser.add_argument("--bursts", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--startup-runs", type=int, default=3, help="cold processes")
+    parser.add_argument("--startup-only", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--base-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    return parser.parse_args()
+
+
+def generate_base_dir(base_dir, switches, images, image_size):
+    image_dir = os.path.join(base_dir, IMAGE_DIR)
+    os.makedirs(image_dir, exist_ok=True)
+    image_names = []
+    for index in range(images):
+        name = f"switch_{index}.jpg"
+        color = (index * 37 % 256, index * 91 % 256, index * 13 % 256)
+        Image.new("RGB", image_size, color).save(os.path.join(image_dir, name))
+        image_names.append(name)
+
+    switch_info = {}
+    for index in range(switches):
+        name = f"Switch {index:05d}"
+        info = DEFAULT_INFO.copy()
+        info.update(
+            switch_name=name,
+            switch_type=SWITCH_TYPES[1 + index % (len(SWITCH_TYPES) - 1)],
+            image=image_names[index % len(image_names)] if image_names else "",
+            pre_travel=f"{1.0 + index % 10 / 10:.1f}mm",
+            total_travel=f"{3.5 + index % 5 / 10:.1f}mm",
+            operation_force=f"{35 + index % 40}g",
+            bottom_out_force=f"{45 + index % 40}g",
+            price=f"${0.2 + index % 30 / 100:.2f}",
+            link=f"https://example.com/{index}",
+        )
+        switch_info[name] = info
+    names = list(switch_info)
+    key_map = {key: names[index % len(names)] for index, key in enumerate(VALID_KEYS)}
+
+    with open(os.path.join(base_dir, SWITCH_FILE), "w") as file:
+        json.dump(switch_info, file)
+    with open(os.path.join(base_dir, KEY_MAP_FILE), "w") as file:
+        json.dump(key_map, file)
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+class PaintCounter(QtCore.QObject):
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.count = 0
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint:
+            self.count += 1
+        return False
+
+
+def wait_for_paint(app, counter, painted):
+    deadline = time.perf_counter() + PAINT_TIMEOUT
+    while counter.count == painted and time.perf_counter() < deadline:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 5)
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_keypress(app, window, counter, keys, presses):
+    latencies = []
+    previous = None
+    for index in range(presses):
+        key = keys[index % len(keys)]
+        if key == previous:
+            continue
+        previous = key
+        painted = counter.count
+        start = time.perf_counter()
+        QTest.keyClick(window, key)
+        wait_for_paint(app, counter, painted)
+        latencies.append(time.perf_counter() - start)
+        # 1フレーム以上空けて、まとめ処理の待ち時間を計測に含めない
+        QTest.qWait(20)
+    return percentiles(latencies)
+
+
+def bench_bursts(app, window, counter, keys, bursts, burst):
+    latencies = []
+    total_presses = 0
+    total_time = 0.0
+    for index in range(bursts):
+        painted = counter.count
+        start = time.perf_counter()
+        for offset in range(burst):
+            QTest.keyClick(window, keys[(index * burst + offset) % len(keys)])
+        wait_for_paint(app, counter, painted)
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        total_presses += burst
+        total_time += elapsed
+        QTest.qWait(20)
+    result = percentiles(latencies)
+    result["presses_per_second"] = total_presses / total_time if total_time else 0.0
+    return result
+
+
+def bench_dialog(app, dialog_class, window, key, repeat=5):
+    """初回は構築を含み、2回目以降は使い回したダイアログのrebindのみ"""
+    samples = []
+    dialog = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if dialog is None:
+            dialog = dialog_class(window)
+        dialog.rebind(key)
+        dialog.show()
+        app.processEvents()
+        samples.append(time.perf_counter() - start)
+        dialog.close()
+        app.processEvents()
+    dialog.deleteLater()
+    result = percentiles(samples)
+    result["first_ms"] = samples[0] * 1000
+    return result
+
+
+def bench_save(window, repeat=20):
+    store = window.data_store
+    switch_name = next(iter(store.switch_info))
+    key = VALID_KEYS[0]
+    switch_samples = []
+    key_samples = []
+    for index in range(repeat):
+        info = dict(store.switch_info[switch_name])
+        info["price"] = f"${index / 100:.2f}"
+
+        def save_switch():
+            window.switch_info_manager.update_switch_info(switch_name, info)
+            window.config_manager.flush()
+
+        def save_key():
+            window.key_map_manager.update_key_map(key, switch_name)
+            window.config_manager.flush()
+
+        switch_samples.append(timed(save_switch))
+        key_samples.append(timed(save_key))
+    return {
+        "update_switch_info": percentiles(switch_samples),
+        "update_key_map": percentiles(key_samples),
+    }
+
+
+def create_settings(workdir, base_dir):
+    settings = QtCore.QSettings(
+        os.path.join(workdir, "settings.ini"), QtCore.QSettings.IniFormat
+    )
+    settings.setValue("base_dir", base_dir)
+    settings.setValue("open_dir", workdir)
+    return settings
+
+
+def start_window(base_dir, workdir):
+    """MainWindowを作成して最初の描画まで進め、各段階の時間を返す"""
+    timings = {}
+    start = time.perf_counter()
+    from main_window import MainWindow
+
+    timings["import_s"] = time.perf_counter() - start
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    start = time.perf_counter()
+    window = MainWindow(create_settings(workdir, base_dir))
+    timings["construct_s"] = time.perf_counter() - start
+    counter = PaintCounter(window.ui_manager.view)
+    window.show()
+    wait_for_paint(app, counter, 0)
+    timings["first_paint_s"] = time.perf_counter() - start
+    deadline = time.perf_counter() + 60
+    while not window.data_store.is_loaded and time.perf_counter() < deadline:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 5)
+    timings["config_load_s"] = time.perf_counter() - start
+    return app, window, counter, timings
+
+
+def bench_cold_startup(base_dir, runs):
+    samples = []
+    for _ in range(runs):
+        workdir = tempfile.mkdtemp(prefix="keytester-bench-")
+        try:
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, __file__, "--startup-only", "--base-dir", base_dir],
+                cwd=workdir,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            samples.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return percentiles(samples)
+
+
+def main():
+    args = parse_args()
+    if args.startup_only:
+        app, window, _, _ = start_window(args.base_dir, os.getcwd())
+        window.close()
+        app.processEvents()
+        return
+
+    random.seed(args.seed)
+    width, height = (int(v) for v in args.image_size.lower().split("x"))
+    workdir = tempfile.mkdtemp(prefix="keytester-bench-")
+    base_dir = os.path.join(workdir, "base")
+    generate_base_dir(base_dir, args.switches, args.images, (width, height))
+
+    results = {
+        "parameters": vars(args),
+        "python": sys.version.split()[0],
+        "qt": QtCore.QT_VERSION_STR,
+        "cold_startup": bench_cold_startup(base_dir, args.startup_runs),
+    }
+    app, window, counter, results["startup"] = start_window(base_dir, workdir)
+
+    from change_key_map_dialog import ChangeKeyMapDialog
+    from edit_switch_info_dialog import EditSwitchInfoDialog
+
+    keys = list(VALID_KEYS)
+    start = time.perf_counter()
+    painted = counter.count
+    QTest.keyClick(window, keys[0])
+    wait_for_paint(app, counter, painted)
+    results["first_press_s"] = time.perf_counter() - start
+
+    window.image_loader.wait_for_done()
+    app.processEvents()
+    random.shuffle(keys)
+    results["keypress"] = bench_keypress(app, window, counter, keys, args.presses)
+    results["bursts"] = bench_bursts(
+        app, window, counter, keys, args.bursts, args.burst
+    )
+    results["dialogs"] = {
+        "edit_switch_info": bench_dialog(app, EditSwitchInfoDialog, window, keys[0]),
+        "change_key_map": bench_dialog(app, ChangeKeyMapDialog, window, keys[0]),
+    }
+    results["save"] = bench_save(window)
+    results["image_cache"] = window.image_cache.stats()
+
+    window.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
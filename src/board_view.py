@@ -0,0 +1,185 @@
+import os
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import Qt
+
+from constants import BOARD_THUMBNAIL_SIZE
+
+KEY_UNIT = 56  # 1uのキーの幅
+TILE_HEIGHT = 72
+TILE_MARGIN = 3
+
+
+class BoardView(QtWidgets.QWidget):
+    """キー配列に沿ってスイッチを並べて表示し、押されているキーを強調する
+
+    各キーのタイル (サムネイルとスイッチ名) はボードと同じ配置のアトラスに描画しておき、
+    paintEventではアトラスから転写して押下状態を重ねるだけにする。キーの状態が
+    変わったときは、そのタイルの範囲だけを再描画する。
+    """
+
+    def __init__(self, parent_window, parent=None):
+        super().__init__(parent)
+        self.window = parent_window
+        self.data_store = parent_window.data_store
+        self.pressed = set()
+        self.tile_rects = {}
+        self.labels = {}
+        self.waiting_images = {}
+        self.atlas = None
+        self.font_name = QtGui.QFont(self.font())
+        self.font_name.setPixelSize(10)
+        self.font_key = QtGui.QFont(self.font())
+        self.font_key.setBold(True)
+        self.font_key.setPixelSize(11)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Fixed)
+        self.set_layout(parent_window.keyboard_layout)
+
+        self.data_store.key_changed.connect(self.refresh_key)
+        self.data_store.reset.connect(self.refresh_all)
+        parent_window.image_loader.image_loaded.connect(self._on_image_loaded)
+
+    def set_layout(self, keyboard_layout):
+        self.pressed = set()
+        self.waiting_images = {}
+        self._layout_tiles(keyboard_layout)
+        self._create_atlas()
+        self.updateGeometry()
+        self.refresh_all()
+
+    def sizeHint(self):
+        return self._board_size
+
+    def minimumSizeHint(self):
+        return self._board_size
+
+    def set_pressed(self, key, pressed):
+        if key not in self.tile_rects or (key in self.pressed) == pressed:
+            return
+        if pressed:
+            self.pressed.add(key)
+        else:
+            self.pressed.discard(key)
+        self.update(self._target_rect(key))
+
+    def release_all(self):
+        pressed, self.pressed = self.pressed, set()
+        for key in pressed:
+            self.update(self._target_rect(key))
+
+    def refresh_key(self, key):
+        if key in self.tile_rects:
+            self._render_tile(key)
+            self.update(self._target_rect(key))
+
+    def refresh_all(self):
+        for key in self.tile_rects:
+            self._render_tile(key)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        exposed = event.rect()
+        highlight = self.palette().color(QtGui.QPalette.Highlight)
+        highlight.setAlpha(110)
+        for key in self.tile_rects:
+            target = self._target_rect(key)
+            if not target.intersects(exposed):
+                continue
+            painter.drawPixmap(QtCore.QRectF(target), self.atlas, self._atlas_rect(key))
+            if key in self.pressed:
+                painter.fillRect(target, highlight)
+
+    def _layout_tiles(self, keyboard_layout):
+        self.tile_rects = {}
+        self.labels = {}
+        for layout_key in keyboard_layout.keys:
+            self.tile_rects[layout_key.key] = QtCore.QRect(
+                round(layout_key.x * KEY_UNIT),
+                round(layout_key.y * TILE_HEIGHT),
+                round(layout_key.width * KEY_UNIT),
+                TILE_HEIGHT,
+            )
+            self.labels[layout_key.key] = layout_key.label
+        self._board_size = QtCore.QSize(
+            round(keyboard_layout.width * KEY_UNIT),
+            round(keyboard_layout.height * TILE_HEIGHT),
+        )
+
+    def _create_atlas(self):
+        ratio = self.devicePixelRatioF()
+        self.atlas = QtGui.QPixmap(
+            int(self._board_size.width() * ratio),
+            int(self._board_size.height() * ratio),
+        )
+        self.atlas.setDevicePixelRatio(ratio)
+        self.atlas.fill(Qt.transparent)
+
+    def _atlas_rect(self, key):
+        # QPainter.drawPixmapのsourceは物理ピクセルで指定する
+        cell = self.tile_rects[key]
+        ratio = self.atlas.devicePixelRatio()
+        return QtCore.QRectF(
+            cell.x() * ratio,
+            cell.y() * ratio,
+            cell.width() * ratio,
+            cell.height() * ratio,
+        )
+
+    def _target_rect(self, key):
+        # ウィジェットの中央に配置する
+        offset_x = max(0, (self.width() - self._board_size.width()) // 2)
+        return self.tile_rects[key].translated(offset_x, 0)
+
+    def _render_tile(self, key):
+        switch_info = self.data_store.resolve(key)
+        image_path = None
+        pixmap = None
+        if switch_info and switch_info.get("image"):
+            image_path = os.path.join(
+                self.window.config_manager.get_image_dir(), switch_info["image"]
+            )
+            pixmap = self.window.image_cache.peek(image_path, BOARD_THUMBNAIL_SIZE)
+            if pixmap is None:
+                self.waiting_images.setdefault(image_path, set()).add(key)
+                self.window.image_loader.request(image_path, BOARD_THUMBNAIL_SIZE)
+
+        cell = self.tile_rects[key]
+        palette = self.palette()
+        painter = QtGui.QPainter(self.atlas)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        painter.fillRect(cell, Qt.transparent)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+        inner = cell.adjusted(TILE_MARGIN, TILE_MARGIN, -TILE_MARGIN, -TILE_MARGIN)
+        painter.setPen(palette.color(QtGui.QPalette.Mid))
+        painter.setBrush(palette.color(QtGui.QPalette.Base))
+        painter.drawRoundedRect(inner, 4, 4)
+
+        painter.setPen(palette.color(QtGui.QPalette.Text))
+        painter.setFont(self.font_key)
+        painter.drawText(
+            inner.adjusted(4, 2, 0, 0), Qt.AlignLeft | Qt.AlignTop, self.labels[key]
+        )
+        if pixmap is not None:
+            image_rect = QtCore.QRect(QtCore.QPoint(0, 0), pixmap.size())
+            image_rect.moveCenter(QtCore.QPoint(inner.center().x(), inner.top() + 34))
+            painter.drawPixmap(image_rect, pixmap)
+        if switch_info:
+            painter.setFont(self.font_name)
+            metrics = QtGui.QFontMetrics(self.font_name)
+            name = metrics.elidedText(
+                str(switch_info.get("switch_name", "")),
+                Qt.ElideRight,
+                inner.width() - 4,
+            )
+            painter.drawText(
+                inner.adjusted(2, 0, -2, -2), Qt.AlignHCenter | Qt.AlignBottom, name
+            )
+        painter.end()
+
+    def _on_image_loaded(self, image_path):
+        keys = self.waiting_images.pop(image_path, None)
+        if not keys:
+            return
+        for key in keys:
+            self.refresh_key(key)
@@ -0,0 +1,314 @@
+"""CSV / JSON Lines のスイッチカタログを一括で取り込む (Qtに依存しない)"""
+
+import csv
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from constants import CURVE_DIR, FIELDS, NUMERIC_FIELDS, SWITCH_TYPES
+from force_curve import CurveStore
+from image_store import ImageStore
+from switch_record import SwitchRecord
+
+# よく使われる列名からフィールド名への対応 (列名は正規化してから引く)
+COLUMN_ALIASES = {
+    "name": "switch_name",
+    "switch": "switch_name",
+    "type": "switch_type",
+    "top": "top_housing",
+    "bottom": "bottom_housing",
+    "pretravel": "pre_travel",
+    "actuation": "pre_travel",
+    "travel": "total_travel",
+    "actuation_force": "operation_force",
+    "operating_force": "operation_force",
+    "bottom_force": "bottom_out_force",
+    "lubed": "factory_lubed",
+    "url": "link",
+    "picture": "image",
+    "photo": "image",
+    "curve": "force_curve",
+    "force_curve_csv": "force_curve",
+}
+ON_DUPLICATE = ("skip", "replace")
+PROGRESS_INTERVAL = 64  # 行
+
+
+def _normalize_column(column):
+    return "_".join(column.strip().lower().replace("-", " ").split())
+
+
+def build_column_map(columns, overrides=None):
+    """列名→フィールド名の対応を作る。overridesは列名→フィールド名で優先される"""
+    overrides = overrides or {}
+    column_map = {}
+    for column in columns:
+        if not isinstance(column, str):
+            # 見出しより多いセル (csv.DictReaderではキーがNone)
+            continue
+        if column in overrides:
+            field = overrides[column]
+        else:
+            normalized = _normalize_column(column)
+            field = COLUMN_ALIASES.get(normalized, normalized)
+        if field in FIELDS:
+            column_map[column] = field
+    return column_map
+
+
+def read_rows(file):
+    """(行番号, 行のdict) を1行ずつ返す。fileはバイナリで開いたファイル"""
+    name = getattr(file, "name", "")
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if name.lower().endswith(".csv"):
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    first = text.read(1)
+    while first.isspace():
+        first = text.read(1)
+    if first == "[" or (first == "{" and name.lower().endswith(".json")):
+        # switch_info.jsonと同じ形式、またはオブジェクトの配列は全体を読み込む
+        data = json.loads(first + text.read())
+        rows = data.values() if isinstance(data, dict) else data
+        for line_num, row in enumerate(rows, start=1):
+            yield line_num, row
+        return
+    for line_num, line in enumerate(_prepend(first, text), start=1):
+        if line.strip():
+            yield line_num, json.loads(line)
+
+
+def _prepend(first, text):
+    lines = iter(text)
+    yield first + next(lines, "")
+    yield from lines
+
+
+def validate(info):
+    """取り込めない理由のリストを返す"""
+    errors = []
+    if not info.get("switch_name"):
+        errors.append("switch_name is empty")
+    switch_type = info.get("switch_type", "")
+    if switch_type and switch_type not in SWITCH_TYPES:
+        errors.append(f"unknown switch_type {switch_type!r}")
+    return errors
+
+
+def _normalize_switch_type(text):
+    for switch_type in SWITCH_TYPES:
+        if switch_type.casefold() == text.casefold():
+            return switch_type
+    return text
+
+
+class ImportResult:
+    def __init__(self):
+        self.records = {}
+        self.skipped = []
+        self.errors = []
+        self.warnings = []
+        self.copied_images = []
+        self.cancelled = False
+
+    def summary(self):
+        text = f"Imported {len(self.records)} switches"
+        if self.skipped:
+            text += f", skipped {len(self.skipped)} duplicates"
+        if self.errors:
+            text += f", {len(self.errors)} rows with errors"
+        return text + "."
+
+
+class CatalogImporter:
+    """ファイルを1行ずつ読み、検証・重複除外しながら画像と荷重曲線をワーカーで並列に取り込む
+
+    取り込んだ結果はImportResult.recordsにまとめて返すので、保存は呼び出し側で1回だけ行う。
+    """
+
+    def __init__(
+        self,
+        existing_names,
+        image_dir,
+        source_image_dir=None,
+        column_overrides=None,
+        on_duplicate="skip",
+        workers=4,
+        copy_images=True,
+        curve_dir=None,
+    ):
+        if on_duplicate not in ON_DUPLICATE:
+            raise ValueError(f"on_duplicate must be one of {ON_DUPLICATE}")
+        self.existing_names = set(existing_names)
+        self.image_store = ImageStore(image_dir)
+        # 省略時は画像と同じベースディレクトリのcurves/
+        self.curve_store = CurveStore(
+            curve_dir or os.path.join(os.path.dirname(image_dir), CURVE_DIR)
+        )
+        self.source_image_dir = source_image_dir
+        self.column_overrides = column_overrides
+        self.on_duplicate = on_duplicate
+        self.workers = workers
+        self.copy_images = copy_images
+
+    def run(self, source_path, progress_callback=None):
+        """progress_callback(done, total) がFalseを返すと中止し、コピーした画像を削除する"""
+        result = ImportResult()
+        source_image_dir = self.source_image_dir or os.path.dirname(source_path)
+        total = os.path.getsize(source_path)
+        image_jobs = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            with open(source_path, "rb") as file:
+                column_map = None
+                for count, (line_num, row) in enumerate(read_rows(file), start=1):
+                    if column_map is None and isinstance(row, dict):
+                        column_map = build_column_map(row, self.column_overrides)
+                    self._import_row(
+                        line_num,
+                        row,
+                        column_map,
+                        source_image_dir,
+                        executor,
+                        image_jobs,
+                        result,
+                    )
+                    if (
+                        progress_callback
+                        and count % PROGRESS_INTERVAL == 0
+                        and not progress_callback(file.tell(), total)
+                    ):
+                        result.cancelled = True
+                        break
+
+            if not result.cancelled:
+                result.cancelled = not self._wait_for_images(
+                    image_jobs, result, progress_callback
+                )
+            if result.cancelled:
+                for future in image_jobs:
+                    future.cancel()
+
+        if result.cancelled:
+            self._remove_copied_images(image_jobs, result)
+            result.records = {}
+        return result
+
+    def _import_row(
+        self, line_num, row, column_map, source_image_dir, executor, image_jobs, result
+    ):
+        if not isinstance(row, dict):
+            result.errors.append((line_num, "row is not an object"))
+            return
+        info = {}
+        for column, value in row.items():
+            if not isinstance(column, str):
+                extra = [
+                    cell
+                    for cell in (value if isinstance(value, list) else [value])
+                    if str(cell).strip()
+                ]
+                if extra:
+                    result.warnings.append(
+                        (line_num, f"{len(extra)} cells beyond the header ignored")
+                    )
+                continue
+            field = column_map.get(column)
+            if field is None and column not in column_map:
+                # JSON Linesは行ごとに列が違うことがある
+                field = build_column_map([column], self.column_overrides).get(column)
+                column_map[column] = field
+            if field is not None and value is not None:
+                info[field] = str(value).strip()
+        if info.get("switch_type"):
+            info["switch_type"] = _normalize_switch_type(info["switch_type"])
+
+        errors = validate(info)
+        if errors:
+            result.errors.append((line_num, "; ".join(errors)))
+            return
+        name = info["switch_name"]
+        if name in result.records or (
+            name in self.existing_names and self.on_duplicate == "skip"
+        ):
+            result.skipped.append(name)
+            return
+
+        record = SwitchRecord(dict.fromkeys(FIELDS, ""))
+        record.update(info)
+        unparsed = [
+            field
+            for field in NUMERIC_FIELDS
+            if record.get(field) and record.value(field) is None
+        ]
+        if unparsed:
+            result.warnings.append(
+                (line_num, f"cannot parse {', '.join(unparsed)} (kept as text)")
+            )
+        image = info.get("image")
+        record["image"] = ""
+        if image:
+            image_path = os.path.join(source_image_dir, os.path.expanduser(image))
+            if os.path.isfile(image_path) and not self.copy_images:
+                record["image"] = os.path.basename(image_path)
+            elif os.path.isfile(image_path):
+                future = executor.submit(self.image_store.ingest, image_path)
+                image_jobs[future] = (line_num, name, "image")
+            else:
+                result.warnings.append((line_num, f"image not found: {image}"))
+        force_curve = info.get("force_curve")
+        record["force_curve"] = ""
+        if force_curve:
+            curve_path = os.path.join(source_image_dir, os.path.expanduser(force_curve))
+            if not os.path.isfile(curve_path):
+                result.warnings.append(
+                    (line_num, f"force curve not found: {force_curve}")
+                )
+            elif self.copy_images:
+                future = executor.submit(self.curve_store.ingest, curve_path)
+                image_jobs[future] = (line_num, name, "force_curve")
+        result.records[name] = record
+
+    def _wait_for_images(self, image_jobs, result, progress_callback):
+        pending = set(image_jobs)
+        while pending:
+            done, pending = wait(pending, timeout=0.1)
+            for future in done:
+                line_num, name, field = image_jobs[future]
+                try:
+                    stored_name, created = future.result()
+                except (OSError, ValueError) as error:
+                    label = field.replace("_", " ")
+                    result.warnings.append(
+                        (line_num, f"cannot import {label}: {error}")
+                    )
+                    continue
+                if created:
+                    result.copied_images.append((field, stored_name))
+                result.records[name][field] = stored_name
+            if progress_callback and not progress_callback(
+                len(image_jobs) - len(pending), len(image_jobs)
+            ):
+                return False
+        return True
+
+    def _remove_copied_images(self, image_jobs, result):
+        # 既にあった画像・曲線は残し、この取り込みで作成したものだけを削除する
+        copied_images = set(result.copied_images)
+        for future, (_, _, field) in image_jobs.items():
+            if future.cancelled() or future.exception():
+                continue
+            stored_name, created = future.result()
+            if created:
+                copied_images.add((field, stored_name))
+        result.copied_images = []
+        for field, stored_name in copied_images:
+            if field == "force_curve":
+                self.curve_store.release(stored_name, {})
+                continue
+            try:
+                os.remove(os.path.join(self.image_store.image_dir, stored_name))
+            except OSError:
+                pass
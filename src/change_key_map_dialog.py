@@ -3,22 +3,35 @@ from PyQt5.QtWidgets import QMessageBox
 
 
 class ChangeKeyMapDialog(QtWidgets.QDialog):
-    def __init__(self, parent, key):
+    def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
+        self.key = None
+        self.switch_name = None
+        self.switch_list_model = self.parent.switch_list_model
+        self._setup_ui()
+
+    def rebind(self, key):
+        """ダイアログを使い回すため、表示のたびに対象のキーを設定し直す"""
         self.key = key
-        self.switch_info = self.parent.switch_info_manager.get_switch_info()
         self.switch_name = self.parent.key_map_manager.get_key_map().get(self.key)
-        self._setup_ui()
+        self.search_box.clear()
+        self.switch_list_model.set_filter("")
+        self.select_box.setCurrentIndex(self.switch_list_model.row_of(self.switch_name))
 
     def _setup_ui(self):
         self.setWindowTitle("Change Switch")
         self.setGeometry(450, 300, 100, 100)
         layout = QtWidgets.QVBoxLayout(self)
 
+        self.search_box = QtWidgets.QLineEdit(self)
+        self.search_box.setPlaceholderText("Search")
+        self.search_box.textChanged.connect(self._filter)
+        layout.addWidget(self.search_box)
+
         self.select_box = QtWidgets.QComboBox()
-        self.select_box.addItems(self.switch_info.keys())
-        self.select_box.setCurrentText(self.switch_name)
+        self.select_box.view().setUniformItemSizes(True)
+        self.select_box.setModel(self.switch_list_model)
         layout.addWidget(self.select_box)
 
         # Saveボタン
@@ -38,15 +51,13 @@ class ChangeKeyMapDialog(QtWidgets.QDialog):
 
     def _save(self):
         self._update_switch_name()
+        if not self.switch_name:
+            return
         self.parent.key_map_manager.update_key_map(self.key, self.switch_name)
-        self.parent.ui_manager.update_display_info(
-            self.key, self.switch_info.get(self.switch_name)
-        )
         self.accept()
 
     def _delete(self):
         self.parent.key_map_manager.delete_key_map(self.key)
-        self.parent.ui_manager.update_display_info(self.key, None)
         self.accept()
 
     def _show_confirm(self):
@@ -61,5 +72,9 @@ class ChangeKeyMapDialog(QtWidgets.QDialog):
         if reply == QMessageBox.Yes:
             self._delete()
 
+    def _filter(self, text):
+        self.switch_list_model.set_filter(text)
+        self.select_box.setCurrentIndex(0 if self.switch_list_model.rowCount() else -1)
+
     def _update_switch_name(self):
         self.switch_name = self.select_box.currentText()
@@ -0,0 +1,163 @@
+"""キーの押下・解放の時刻からチャタリングを検出し、押下時間と押下間隔の分布を集計する
+(Qtに依存しない)"""
+
+from array import array
+
+from constants import DEFAULT_CHATTER_WINDOW_MS, VALID_KEYS
+
+# 分布は2の累乗ごとのビンで数える。ビンbは [2^(b-1), 2^b) ms、ビン0は0ms
+HISTOGRAM_BINS = 16
+
+
+def histogram_bin(ms):
+    if ms <= 0:
+        return 0
+    return min(ms.bit_length(), HISTOGRAM_BINS - 1)
+
+
+def bin_upper_bound(index):
+    """ビンに入る値の上限 (ms)"""
+    return (1 << index) - 1 if index else 0
+
+
+def histogram_percentile(histogram, fraction):
+    """fractionの位置の値が入るビンの上限を返す。空ならNone"""
+    total = sum(histogram)
+    if not total:
+        return None
+    threshold = total * fraction
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= threshold:
+            return bin_upper_bound(index)
+    return bin_upper_bound(len(histogram) - 1)
+
+
+class ChatterDetector:
+    """キーごとの状態を固定長の配列に持ち、イベントごとにO(1)で更新する
+
+    解放からwindow_ms未満で次の押下が来たものをチャタリング (二重入力) として数える。
+    スイッチごとの集計はsummarizeで、表示するときにキーマップを通して行う。
+    """
+
+    def __init__(self, window_ms=DEFAULT_CHATTER_WINDOW_MS, keys=VALID_KEYS):
+        self.window_ms = window_ms
+        # 集計結果が変わるたびに増える (表示側の再描画の判定用)
+        self.revision = 0
+        self.set_keys(keys)
+
+    def set_keys(self, keys):
+        """対象のキーを変える (キー配列の切り替え時)。集計は消える"""
+        self.keys = keys
+        self.slots = {key: slot for slot, key in enumerate(keys)}
+        count = len(keys)
+        self.down = bytearray(count)
+        self.last_press = array("q", [0]) * count
+        self.last_release = array("q", [-1]) * count
+        self.presses = array("Q", [0]) * count
+        self.chatter = array("Q", [0]) * count
+        self.duration_sum = array("Q", [0]) * count
+        self.duration_count = array("Q", [0]) * count
+        self.durations = array("Q", [0]) * (count * HISTOGRAM_BINS)
+        self.intervals = array("Q", [0]) * (count * HISTOGRAM_BINS)
+        self.revision += 1
+
+    def set_window(self, window_ms):
+        self.window_ms = window_ms
+
+    def reset(self):
+        count = len(self.keys)
+        self.down[:] = bytes(count)
+        for values in (
+            self.last_press,
+            self.presses,
+            self.chatter,
+            self.duration_sum,
+            self.duration_count,
+            self.durations,
+            self.intervals,
+        ):
+            values[:] = array(values.typecode, [0]) * len(values)
+        self.last_release[:] = array("q", [-1]) * count
+        self.revision += 1
+
+    def press(self, key, timestamp):
+        """チャタリングと判定したらTrueを返す"""
+        slot = self.slots.get(key)
+        if slot is None:
+            return False
+        bounced = False
+        last_release = self.last_release[slot]
+        if last_release >= 0 and timestamp - last_release < self.window_ms:
+            self.chatter[slot] += 1
+            bounced = True
+        if self.presses[slot]:
+            interval = timestamp - self.last_press[slot]
+            self.intervals[slot * HISTOGRAM_BINS + histogram_bin(interval)] += 1
+        self.presses[slot] += 1
+        self.last_press[slot] = timestamp
+        self.down[slot] = 1
+        self.revision += 1
+        return bounced
+
+    def release(self, key, timestamp):
+        slot = self.slots.get(key)
+        if slot is None or not self.down[slot]:
+            return
+        self.down[slot] = 0
+        duration = max(0, timestamp - self.last_press[slot])
+        self.durations[slot * HISTOGRAM_BINS + histogram_bin(duration)] += 1
+        self.duration_sum[slot] += duration
+        self.duration_count[slot] += 1
+        self.last_release[slot] = timestamp
+        self.revision += 1
+
+    def release_all(self):
+        """解放のイベントが届かなかった場合 (フォーカスが外れたときなど) に押下状態を消す
+
+        押下時間は分からないので、分布にもチャタリングの判定にも使わない。
+        """
+        for slot, down in enumerate(self.down):
+            if down:
+                self.down[slot] = 0
+                self.last_release[slot] = -1
+
+    def key_stats(self, key):
+        slot = self.slots[key]
+        start = slot * HISTOGRAM_BINS
+        return {
+            "presses": self.presses[slot],
+            "chatter": self.chatter[slot],
+            "duration_sum": self.duration_sum[slot],
+            "duration_count": self.duration_count[slot],
+            "durations": self.durations[start : start + HISTOGRAM_BINS].tolist(),
+            "intervals": self.intervals[start : start + HISTOGRAM_BINS].tolist(),
+        }
+
+    def summarize(self, key_map):
+        """{スイッチ名: 集計} を返す。キーマップにないキーは含めない"""
+        summary = {}
+        for key, switch_name in key_map.items():
+            slot = self.slots.get(key)
+            if slot is None or not switch_name or not self.presses[slot]:
+                continue
+            stats = self.key_stats(key)
+            total = summary.get(switch_name)
+            if total is None:
+                stats["keys"] = [key]
+                summary[switch_name] = stats
+                continue
+            total["keys"].append(key)
+            for name in ("presses", "chatter", "duration_sum", "duration_count"):
+                total[name] += stats[name]
+            for name in ("durations", "intervals"):
+                total[name] = [a + b for a, b in zip(total[name], stats[name])]
+        for stats in summary.values():
+            stats["chatter_rate"] = stats["chatter"] / stats["presses"]
+            stats["mean_duration"] = (
+                stats["duration_sum"] / stats["duration_count"]
+                if stats["duration_count"]
+                else None
+            )
+        return summary
@@ -0,0 +1,104 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from chatter_detector import histogram_percentile
+
+REFRESH_INTERVAL_MS = 250
+COLUMNS = ("Switch", "Keys", "Presses", "Chatter", "Rate", "Press ms", "Interval ms")
+
+
+class ChatterView(QtWidgets.QWidget):
+    """スイッチごとのチャタリング率と、押下時間・押下間隔の中央値を表示する
+
+    キー入力のたびには描画せず、一定間隔で集計が変わっていれば表を作り直す。
+    """
+
+    def __init__(self, parent_window, parent=None):
+        super().__init__(parent)
+        self.window = parent_window
+        self.detector = parent_window.chatter_detector
+        self.shown_revision = None
+        self._setup_ui()
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.window.data_store.reset.connect(self.invalidate)
+        self.window.data_store.key_changed.connect(self.invalidate)
+
+    def _setup_ui(self):
+        layout = QtWidgets.QVBoxLayout(self)
+        controls = QtWidgets.QHBoxLayout()
+        controls.addWidget(QtWidgets.QLabel("Debounce window (ms)"))
+        self.window_spin = QtWidgets.QSpinBox()
+        self.window_spin.setRange(1, 100)
+        self.window_spin.setValue(self.detector.window_ms)
+        self.window_spin.valueChanged.connect(self.window.set_chatter_window)
+        controls.addWidget(self.window_spin)
+        controls.addStretch()
+        reset_button = QtWidgets.QPushButton("Reset")
+        reset_button.clicked.connect(self._reset)
+        controls.addWidget(reset_button)
+        layout.addLayout(controls)
+
+        self.table = QtWidgets.QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.table.setFocusPolicy(QtCore.Qt.NoFocus)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(
+            QtWidgets.QHeaderView.ResizeToContents
+        )
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+    def showEvent(self, event):
+        self.timer.start()
+        self.refresh()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def invalidate(self, _key=None):
+        self.shown_revision = None
+
+    def _reset(self):
+        self.detector.reset()
+        self.refresh()
+
+    def refresh(self):
+        if self.shown_revision == self.detector.revision:
+            return
+        self.shown_revision = self.detector.revision
+        summary = self.detector.summarize(self.window.data_store.key_map)
+        rows = sorted(
+            summary.items(), key=lambda item: (-item[1]["chatter_rate"], item[0])
+        )
+        keyboard_layout = self.window.keyboard_layout
+        warning = QtGui.QColor(QtCore.Qt.red)
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(rows))
+        for row, (switch_name, stats) in enumerate(rows):
+            median_duration = histogram_percentile(stats["durations"], 0.5)
+            median_interval = histogram_percentile(stats["intervals"], 0.5)
+            values = (
+                switch_name,
+                " ".join(keyboard_layout.label(key) for key in sorted(stats["keys"])),
+                str(stats["presses"]),
+                str(stats["chatter"]),
+                f"{stats['chatter_rate']:.1%}",
+                "" if median_duration is None else f"≤{median_duration}",
+                "" if median_interval is None else f"≤{median_interval}",
+            )
+            for column, value in enumerate(values):
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QtWidgets.QTableWidgetItem()
+                    self.table.setItem(row, column, item)
+                item.setText(value)
+                if stats["chatter"]:
+                    item.setForeground(warning)
+                else:
+                    item.setData(QtCore.Qt.ForegroundRole, None)
+        self.table.setUpdatesEnabled(True)
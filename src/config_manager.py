@@ -2,68 +2,216 @@ import json
 import os
 
 from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtWidgets import QMessageBox
 
 from constants import (
+    CURVE_DIR,
+    DATABASE_FILE,
     DEFAULT_BASE_DIR,
+    DEFAULT_CHATTER_WINDOW_MS,
+    DEFAULT_LAYOUT,
+    DEFAULT_IMAGE_CACHE_BUDGET,
     KEY_MAP_FILE,
     IMAGE_DIR,
     SWITCH_FILE,
     DEFAULT_OPEN_DIR,
+    DEFAULT_PUSH_SERVER_PORT,
 )
+from storage import JsonStorage, SqliteStorage
+from write_behind import WriteBehindWriter
 
 
 class ConfigManager:
-    def __init__(self, parent):
+    def __init__(self, parent, settings=None):
         self.parent = parent
-        self.settings = QtCore.QSettings("KeyTester", "Settings")
+        self.settings = settings or QtCore.QSettings("KeyTester", "Settings")
         self.base_dir = self.settings.value("base_dir", DEFAULT_BASE_DIR)
         self.key_map_file = os.path.join(self.base_dir, KEY_MAP_FILE)
         self.switch_file = os.path.join(self.base_dir, SWITCH_FILE)
         self.image_dir = os.path.join(self.base_dir, IMAGE_DIR)
+        self.curve_dir = os.path.join(self.base_dir, CURVE_DIR)
+        self.database_file = os.path.join(self.base_dir, DATABASE_FILE)
         self.open_dir = self.settings.value("open_dir", DEFAULT_OPEN_DIR)
+        self.ignore_auto_repeat = self.settings.value(
+            "ignore_auto_repeat", False, type=bool
+        )
+        self.writer = WriteBehindWriter(parent=self.parent)
+        self.writer.failed.connect(self._on_write_failed)
+        self.storage = self._open_storage()
+
+    def read_all(self):
+        """キーマップとスイッチ情報を読み込む (ワーカースレッドからも呼べる)"""
         os.makedirs(self.image_dir, exist_ok=True)
+        return self.storage.read_all()
 
     def load_key_map_file(self):
-        if os.path.exists(self.key_map_file):
-            with open(self.key_map_file, "r") as file:
-                return json.load(file)
-        return {}
+        return self.storage.load_key_map()
 
     def load_switch_file(self):
-        if os.path.exists(self.switch_file):
-            with open(self.switch_file, "r") as file:
-                return json.load(file)
-        return {}
+        return self.storage.load_switch_info()
 
     def save_key_map_file(self, key_map):
-        with open(self.key_map_file, "w") as file:
-            json.dump(key_map, file, indent=4)
+        self.storage.save_key_map(key_map)
 
     def save_switch_file(self, switch_info):
-        with open(self.switch_file, "w") as file:
-            json.dump(switch_info, file, indent=4)
+        self.storage.save_switch_info(switch_info)
+
+    def update_key(self, key_map, key):
+        self.storage.update_key(key_map, key)
+
+    def update_keys(self, key_map, keys):
+        self.storage.update_keys(key_map, keys)
+
+    def delete_key(self, key_map, key):
+        self.storage.delete_key(key_map, key)
+
+    def update_switch(self, switch_info, switch_name):
+        self.storage.update_switch(switch_info, switch_name)
+
+    def update_switches(self, switch_info, switch_names):
+        self.storage.update_switches(switch_info, switch_names)
+
+    def delete_switch(self, switch_info, switch_name):
+        self.storage.delete_switch(switch_info, switch_name)
+
+    def flush(self):
+        self.storage.flush()
+
+    def close(self):
+        self.storage.close()
+
+    def uses_sqlite(self):
+        return isinstance(self.storage, SqliteStorage)
+
+    def migrate_to_sqlite(self):
+        if self.uses_sqlite():
+            QMessageBox.information(
+                self.parent, "Message", "SQLite storage is already in use."
+            )
+            return
+        self.storage.close()
+        storage = SqliteStorage(self.database_file)
+        storage.import_data(
+            self.parent.key_map_manager.get_key_map(),
+            self.parent.switch_info_manager.get_switch_info(),
+        )
+        self.storage = storage
+        QMessageBox.information(
+            self.parent, "Message", f"Migrated to {self.database_file}."
+        )
+
+    def export_to_json(self):
+        if not self.uses_sqlite():
+            QMessageBox.information(
+                self.parent, "Message", "JSON storage is already in use."
+            )
+            return
+        self.storage.export_json(self.key_map_file, self.switch_file)
+        QMessageBox.information(
+            self.parent,
+            "Message",
+            f"Exported to {self.key_map_file} and {self.switch_file}.",
+        )
+
+    def _on_write_failed(self, file_path, message):
+        QMessageBox.warning(
+            self.parent,
+            "Message",
+            f"Cannot save {file_path}: {message}\n"
+            "It will be saved again with the next change.",
+        )
+
+    def _open_storage(self):
+        if os.path.exists(self.database_file):
+            return SqliteStorage(self.database_file)
+        return JsonStorage(self.key_map_file, self.switch_file, self.writer)
 
     def change_base_dir(self):
         new_base_dir = QtWidgets.QFileDialog.getExistingDirectory(
             self.parent, "Select Directory", DEFAULT_BASE_DIR
         )
         if new_base_dir:
-            self.settings.setValue("base_dir", new_base_dir)
-            self._update_setting(new_base_dir)
-            self.parent.key_map_manager.set_key_map(self.load_key_map_file())
+            self.parent.profile_manager.activate(new_base_dir)
+
+    def set_base_dir(self, base_dir):
+        self.settings.setValue("base_dir", base_dir)
+        self._update_setting(base_dir)
 
     def _update_setting(self, base_dir):
         self.base_dir = base_dir
         self.key_map_file = os.path.join(self.base_dir, KEY_MAP_FILE)
         self.switch_file = os.path.join(self.base_dir, SWITCH_FILE)
         self.image_dir = os.path.join(self.base_dir, IMAGE_DIR)
+        self.curve_dir = os.path.join(self.base_dir, CURVE_DIR)
+        self.database_file = os.path.join(self.base_dir, DATABASE_FILE)
         os.makedirs(self.image_dir, exist_ok=True)
+        self.storage.close()
+        self.storage = self._open_storage()
+        self.parent.thumbnail_store.set_image_dir(self.image_dir)
+        self.parent.image_store.set_image_dir(self.image_dir)
+        self.parent.curve_store.set_curve_dir(self.curve_dir)
 
     def get_image_dir(self):
         return self.image_dir
 
+    def get_curve_dir(self):
+        return self.curve_dir
+
     def get_open_dir(self):
         return self.open_dir
 
     def set_open_dir(self, new_open_dir):
+        self.open_dir = new_open_dir
         self.settings.setValue("open_dir", new_open_dir)
+
+    def get_ignore_auto_repeat(self):
+        return self.ignore_auto_repeat
+
+    def set_ignore_auto_repeat(self, ignore):
+        self.ignore_auto_repeat = ignore
+        self.settings.setValue("ignore_auto_repeat", ignore)
+
+    def get_chatter_window(self):
+        return int(self.settings.value("chatter_window_ms", DEFAULT_CHATTER_WINDOW_MS))
+
+    def set_chatter_window(self, window_ms):
+        self.settings.setValue("chatter_window_ms", window_ms)
+
+    def get_layout(self):
+        return self.settings.value("layout", DEFAULT_LAYOUT)
+
+    def set_layout(self, layout_id):
+        self.settings.setValue("layout", layout_id)
+
+    def get_push_server_enabled(self):
+        return self.settings.value("push_server_enabled", False, type=bool)
+
+    def set_push_server_enabled(self, enabled):
+        self.settings.setValue("push_server_enabled", enabled)
+
+    def get_push_server_port(self):
+        return int(self.settings.value("push_server_port", DEFAULT_PUSH_SERVER_PORT))
+
+    def get_key_map_layout(self):
+        """キーマップを物理的なキーの名前に移行したときの配列。未移行ならNone
+
+        キーマップはベースディレクトリごとにあるので、ベースディレクトリごとに覚える。
+        """
+        return self._key_map_layouts().get(self.base_dir)
+
+    def set_key_map_layout(self, layout_id):
+        key_map_layouts = self._key_map_layouts()
+        key_map_layouts[self.base_dir] = layout_id
+        self.settings.setValue("key_map_layouts", json.dumps(key_map_layouts))
+
+    def _key_map_layouts(self):
+        try:
+            key_map_layouts = json.loads(self.settings.value("key_map_layouts", "{}"))
+        except (TypeError, ValueError):
+            return {}
+        return key_map_layouts if isinstance(key_map_layouts, dict) else {}
+
+    def get_image_cache_budget(self):
+        return int(
+            self.settings.value("image_cache_budget", DEFAULT_IMAGE_CACHE_BUDGET)
+        )
@@ -0,0 +1,200 @@
+import os
+import threading
+
+from PyQt5 import QtCore
+
+from constants import DATABASE_FILE, IMAGE_EXTENSIONS, KEY_MAP_FILE, SWITCH_FILE
+
+RELOAD_DELAY_MS = 300
+RETRY_DELAY_MS = 1000
+
+
+def _signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def config_signatures(base_dir):
+    """ベースディレクトリの設定ファイルの (mtime, サイズ)"""
+    database_file = os.path.join(base_dir, DATABASE_FILE)
+    if os.path.exists(database_file):
+        file_paths = (database_file, f"{database_file}-wal")
+    else:
+        file_paths = (
+            os.path.join(base_dir, KEY_MAP_FILE),
+            os.path.join(base_dir, SWITCH_FILE),
+        )
+    return {file_path: _signature(file_path) for file_path in file_paths}
+
+
+def _scan_images(image_dir):
+    signatures = {}
+    try:
+        entries = os.scandir(image_dir)
+    except OSError:
+        return signatures
+    with entries:
+        for entry in entries:
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                stat = entry.stat()
+                signatures[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+
+class ConfigWatcher(QtCore.QObject):
+    """他の環境で更新された設定ファイルと画像を検知し、変わった部分だけを反映する
+
+    連続した変更通知はまとめ、ファイルの読み込みはワーカースレッドで行う。
+    """
+
+    _read_done = QtCore.pyqtSignal(int, object, object)
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.config_manager = parent.config_manager
+        self.data_store = parent.data_store
+        self.image_signatures = None
+        # 最後に読み込んだときの設定ファイルの (mtime, サイズ)
+        self.config_signatures = {}
+        self._initial_signatures = None
+        self._generation = 0
+        self._revision = 0
+        self._applying = False
+        self._reading = False
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._schedule)
+        self._watcher.directoryChanged.connect(self._schedule)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._reload)
+        self._read_done.connect(self._on_read_done)
+        # ファイルを読んでいる間に画面から変更された場合は、読み直す
+        for signal in (
+            self.data_store.key_changed,
+            self.data_store.switch_changed,
+            self.data_store.switch_removed,
+        ):
+            signal.connect(self._on_local_change)
+        self.data_store.loaded.connect(self.start)
+
+    def start(self):
+        """現在のベースディレクトリの監視を始める。ベースディレクトリが変わったときも呼ぶ"""
+        self._generation += 1
+        self.image_signatures = None
+        self.config_signatures = self._initial_signatures or config_signatures(
+            self.config_manager.base_dir
+        )
+        self._initial_signatures = None
+        self._timer.stop()
+        self._watch_paths()
+        self._reload()
+
+    def expect(self, signatures):
+        """次のstartで、この時点からファイルが変わっていれば読み込み直す (キャッシュの検証用)"""
+        self._initial_signatures = signatures
+
+    def _watch_paths(self):
+        paths = self._watcher.files() + self._watcher.directories()
+        if paths:
+            self._watcher.removePaths(paths)
+        # 置き換えで保存されるとファイルの監視が外れるため、ディレクトリも監視する
+        config_manager = self.config_manager
+        candidates = [
+            config_manager.base_dir,
+            config_manager.get_image_dir(),
+            config_manager.key_map_file,
+            config_manager.switch_file,
+            config_manager.database_file,
+            f"{config_manager.database_file}-wal",
+        ]
+        existing = [path for path in candidates if os.path.exists(path)]
+        if existing:
+            self._watcher.addPaths(existing)
+
+    def _schedule(self, path=None):
+        self._timer.start(RELOAD_DELAY_MS)
+
+    def _on_local_change(self, _name):
+        if not self._applying:
+            self._revision += 1
+
+    def _reload(self):
+        if self._reading:
+            self._schedule()
+            return
+        # 保存中の内容は書き込みが終わってから比較する
+        if self.config_manager.writer.has_pending():
+            self._timer.start(RETRY_DELAY_MS)
+            return
+        self._reading = True
+        generation = self._generation
+        revision = self._revision
+        signatures = config_signatures(self.config_manager.base_dir)
+        read_config = not self._is_known(signatures)
+        image_dir = self.config_manager.get_image_dir()
+
+        def read():
+            config = None
+            if read_config:
+                try:
+                    config = (revision, signatures, *self.config_manager.read_all())
+                except (OSError, ValueError):
+                    # 同期ツールが書き込み中の可能性があるので後でやり直す
+                    config = False
+            images = (image_dir, _scan_images(image_dir))
+            self._read_done.emit(generation, config, images)
+
+        threading.Thread(target=read, daemon=True).start()
+
+    def _is_known(self, signatures):
+        """設定ファイルが、最後に読み込んだか自分で書き込んだ状態のままか"""
+        written = self.config_manager.writer.written
+        return all(
+            signature in (self.config_signatures.get(path), written.get(path))
+            for path, signature in signatures.items()
+        )
+
+    def _on_read_done(self, generation, config, images):
+        self._reading = False
+        if generation != self._generation:
+            return
+        self._watch_paths()
+        self._apply_images(*images)
+        if config is None:
+            return
+        if config is False:
+            self._timer.start(RETRY_DELAY_MS)
+            return
+        revision, signatures, key_map, switch_info = config
+        if revision != self._revision or self.config_manager.writer.has_pending():
+            self._schedule()
+            return
+        self.config_signatures = signatures
+        self._applying = True
+        try:
+            self.data_store.apply_changes(key_map, switch_info)
+        finally:
+            self._applying = False
+
+    def _apply_images(self, image_dir, image_signatures):
+        previous, self.image_signatures = self.image_signatures, image_signatures
+        if previous is None:
+            return
+        changed = [
+            name
+            for name, signature in previous.items()
+            if image_signatures.get(name, signature) != signature
+        ]
+        if not changed:
+            return
+        for name in changed:
+            self.parent.image_cache.invalidate(os.path.join(image_dir, name))
+        # 表示中のキーの画像が変わったときだけ描画し直す
+        key = self.parent.key_map_manager.get_current_key()
+        switch_info = self.data_store.resolve(key)
+        if switch_info and switch_info.get("image") in changed:
+            self.parent.ui_manager.refresh_key(key)
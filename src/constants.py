@@ -1,10 +1,41 @@
 import os
+import sys
 
 DEFAULT_BASE_DIR = os.path.join(os.environ["HOME"], "Documents/KeyTester")
 KEY_MAP_FILE = "key_map.json"
 SWITCH_FILE = "switch_info.json"
+DATABASE_FILE = "key_tester.db"
 IMAGE_DIR = "images"
+CURVE_DIR = "curves"
+THUMBNAIL_DIR = ".thumbs"
+THUMBNAIL_INDEX_FILE = "index.json"
+RECORDING_DIR = "recordings"
+LAYOUT_DIR = "layouts"  # ベースディレクトリに置く独自のキー配列
+# 組み込みのキー配列 (PyInstallerでまとめた場合はsrc/ごと同梱される)
+BUILTIN_LAYOUT_DIR = os.path.join(
+    getattr(
+        sys, "_MEIPASS", os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ),
+    "src",
+    LAYOUT_DIR,
+)
+DEFAULT_LAYOUT = "us_ansi_104"
+OVERLAY_FILE = os.path.join(os.path.dirname(BUILTIN_LAYOUT_DIR), "overlay.html")
+PUSH_SERVER_HOST = "127.0.0.1"  # 他のマシンからは接続できないようにする
+DEFAULT_PUSH_SERVER_PORT = 8765
+PUSH_QUEUE_SIZE = 64  # クライアントごとに送信を待てるメッセージ数
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
 DEFAULT_OPEN_DIR = os.path.join(os.environ["HOME"], "Downloads")
+IMAGE_DISPLAY_SIZE = (200, 200)
+BOARD_THUMBNAIL_SIZE = (40, 40)
+IMAGE_STORE_MAX_SIZE = (800, 800)  # 取り込み時にこのサイズまで縮小する
+DEFAULT_IMAGE_CACHE_BUDGET = 64 * 1024 * 1024  # bytes
+WRITE_BEHIND_DELAY_MS = 500
+PROFILE_CACHE_SIZE = 4  # 現在のもの以外にメモリに残すプロファイルの数
+PROFILE_CACHE_BUDGET = 32 * 1024 * 1024  # bytes (スイッチ情報の概算)
+FRAME_INTERVAL_MS = 16
+DEFAULT_CHATTER_WINDOW_MS = 5  # 解放からこの時間内の再押下をチャタリングとみなす
+# キー配列の導入前にキーマップで使っていたキー (US配列で同じ名前になる)
 VALID_KEYS = r"1234567890-=qwertyuiop[]\asdfghjkl;'zxcvbnm,./"
 SWITCH_TYPES = [
     "-",
@@ -17,6 +48,7 @@ SWITCH_TYPES = [
 ]
 FIELDS = [
     "image",
+    "force_curve",
     "switch_name",
     "switch_type",
     "top_housing",
@@ -33,3 +65,11 @@ FIELDS = [
     "link",
 ]
 DEFAULT_INFO = dict.fromkeys(FIELDS, "")
+# 数値として解釈するフィールドと、正規化後の単位 (priceは通貨を変換しない)
+NUMERIC_FIELDS = {
+    "pre_travel": "mm",
+    "total_travel": "mm",
+    "operation_force": "gf",
+    "bottom_out_force": "gf",
+    "price": "",
+}
@@ -0,0 +1,212 @@
+import threading
+
+from PyQt5 import QtCore
+
+from switch_record import SwitchRecord, to_records
+
+
+class DataStore(QtCore.QObject):
+    """キーマップとスイッチ情報を一度だけ読み込み、キー→スイッチ情報の索引を保持する"""
+
+    key_changed = QtCore.pyqtSignal(str)
+    switch_changed = QtCore.pyqtSignal(str)
+    switch_removed = QtCore.pyqtSignal(str)
+    reset = QtCore.pyqtSignal()
+    loaded = QtCore.pyqtSignal()
+    load_failed = QtCore.pyqtSignal(str)
+    _data_read = QtCore.pyqtSignal(int, object, object)
+    _read_failed = QtCore.pyqtSignal(int, str)
+
+    def __init__(self, config_manager, parent=None):
+        super().__init__(parent)
+        self.config_manager = config_manager
+        self.key_map = {}
+        self.switch_info = {}
+        self.resolved = {}
+        self.keys_by_switch = {}
+        self.is_loaded = False
+        self.load_error = None
+        self._load_generation = 0
+        self._data_read.connect(self._on_data_read)
+        self._read_failed.connect(self._on_read_failed)
+
+    def load(self):
+        self._load_generation += 1
+        key_map, switch_info = self.config_manager.read_all()
+        self._apply_loaded(key_map, switch_info)
+
+    def load_async(self):
+        """ワーカースレッドでファイルを読み込み、GUIスレッドで反映する"""
+        self._load_generation += 1
+        generation = self._load_generation
+
+        def read():
+            try:
+                key_map, switch_info = self.config_manager.read_all()
+            except Exception as error:
+                # スレッドの中で例外が消えないよう、壊れたJSONやSQLiteのエラーも全て伝える
+                self._read_failed.emit(generation, str(error))
+                return
+            self._data_read.emit(generation, key_map, switch_info)
+
+        threading.Thread(target=read, daemon=True).start()
+
+    def set_data(self, key_map, switch_info):
+        """読み込み済みのデータをそのまま使う (プロファイルの切り替え時)"""
+        self._load_generation += 1
+        self._apply_loaded(key_map, switch_info)
+
+    def _on_data_read(self, generation, key_map, switch_info):
+        # 読み込み中にベースディレクトリが変わった場合は古い結果を捨てる
+        if generation == self._load_generation:
+            self._apply_loaded(key_map, switch_info)
+
+    def _on_read_failed(self, generation, message):
+        if generation == self._load_generation:
+            self.load_error = message
+            self.reset.emit()
+            self.load_failed.emit(message)
+
+    def _apply_loaded(self, key_map, switch_info):
+        self.load_error = None
+        self.key_map = key_map
+        self.switch_info = switch_info
+        self._rebuild_index()
+        self.is_loaded = True
+        self.reset.emit()
+        self.loaded.emit()
+
+    def resolve(self, key):
+        return self.resolved.get(key)
+
+    def set_key_map(self, key_map):
+        self.key_map = key_map
+        self._rebuild_index()
+        self.reset.emit()
+
+    def replace_key_map(self, key_map):
+        """キーマップ全体を置き換えて保存する (キー配列への移行時)"""
+        self.key_map = key_map
+        self._rebuild_index()
+        self.config_manager.save_key_map_file(key_map)
+        self.reset.emit()
+
+    def set_switch_info(self, switch_info):
+        self.switch_info = to_records(switch_info)
+        self._rebuild_index()
+        self.reset.emit()
+
+    def update_key(self, key, switch_name):
+        self._unlink_key(key)
+        self.key_map[key] = switch_name
+        self._link_key(key, switch_name)
+        self.config_manager.update_key(self.key_map, key)
+        self.key_changed.emit(key)
+
+    def update_keys(self, assignments):
+        """複数のキーの割り当てを1回の保存でまとめて変更する"""
+        for key, switch_name in assignments.items():
+            self._unlink_key(key)
+            self.key_map[key] = switch_name
+            self._link_key(key, switch_name)
+        self.config_manager.update_keys(self.key_map, list(assignments))
+        for key in assignments:
+            self.key_changed.emit(key)
+
+    def delete_key(self, key):
+        self._unlink_key(key)
+        self.key_map.pop(key, None)
+        self.config_manager.delete_key(self.key_map, key)
+        self.key_changed.emit(key)
+
+    def update_switch(self, switch_name, switch_info):
+        if not isinstance(switch_info, SwitchRecord):
+            switch_info = SwitchRecord.from_dict(switch_info)
+        self.switch_info[switch_name] = switch_info
+        self.config_manager.update_switch(self.switch_info, switch_name)
+        self._refresh_switch(switch_name)
+        self.switch_changed.emit(switch_name)
+
+    def update_switch_fields(self, switch_name, changes):
+        self.switch_info[switch_name].update(changes)
+        self.config_manager.update_switch(self.switch_info, switch_name)
+        self._refresh_switch(switch_name)
+        self.switch_changed.emit(switch_name)
+
+    def update_switches(self, switch_info):
+        """取り込みなどで複数のスイッチを1回の保存でまとめて追加・更新する"""
+        self.switch_info.update(to_records(switch_info))
+        self.config_manager.update_switches(self.switch_info, list(switch_info))
+        self._rebuild_index()
+        self.reset.emit()
+
+    def delete_switch(self, switch_name):
+        self.switch_info.pop(switch_name, None)
+        self.config_manager.delete_switch(self.switch_info, switch_name)
+        self._refresh_switch(switch_name)
+        self.switch_removed.emit(switch_name)
+
+    def rename_switch(self, old_name, new_name):
+        switch_info = self.switch_info.pop(old_name)
+        switch_info["switch_name"] = new_name
+        self.config_manager.delete_switch(self.switch_info, old_name)
+        self.switch_info[new_name] = switch_info
+        self.config_manager.update_switch(self.switch_info, new_name)
+        keys = sorted(self.keys_by_switch.get(old_name, ()))
+        if keys:
+            self.update_keys(dict.fromkeys(keys, new_name))
+        self.switch_removed.emit(old_name)
+        self.switch_changed.emit(new_name)
+
+    def apply_changes(self, key_map, switch_info):
+        """外部で変更されたファイルの内容との差分だけを反映する (保存はしない)"""
+        for switch_name in [
+            name for name in self.switch_info if name not in switch_info
+        ]:
+            del self.switch_info[switch_name]
+            self._refresh_switch(switch_name)
+            self.switch_removed.emit(switch_name)
+        for switch_name, record in switch_info.items():
+            current = self.switch_info.get(switch_name)
+            if current is not None and current == record:
+                continue
+            self.switch_info[switch_name] = record
+            self._refresh_switch(switch_name)
+            self.switch_changed.emit(switch_name)
+
+        for key in set(self.key_map) | set(key_map):
+            switch_name = key_map.get(key)
+            if self.key_map.get(key) == switch_name:
+                continue
+            self._unlink_key(key)
+            if switch_name is None:
+                del self.key_map[key]
+            else:
+                self.key_map[key] = switch_name
+                self._link_key(key, switch_name)
+            self.key_changed.emit(key)
+
+    def _refresh_switch(self, switch_name):
+        switch_info = self.switch_info.get(switch_name)
+        for key in list(self.keys_by_switch.get(switch_name, ())):
+            self.resolved[key] = switch_info
+            self.key_changed.emit(key)
+
+    def _link_key(self, key, switch_name):
+        self.keys_by_switch.setdefault(switch_name, set()).add(key)
+        self.resolved[key] = self.switch_info.get(switch_name)
+
+    def _unlink_key(self, key):
+        switch_name = self.key_map.get(key)
+        keys = self.keys_by_switch.get(switch_name)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_switch[switch_name]
+        self.resolved.pop(key, None)
+
+    def _rebuild_index(self):
+        self.resolved = {}
+        self.keys_by_switch = {}
+        for key, switch_name in self.key_map.items():
+            self._link_key(key, switch_name)
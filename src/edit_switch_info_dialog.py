@@ -5,18 +5,32 @@ from constants import SWITCH_TYPES, FIELDS, DEFAULT_INFO
 
 
 class EditSwitchInfoDialog(QtWidgets.QDialog):
-    def __init__(self, parent, key):
+    def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
-        self.key = key
-        self.switch_info = self.parent.switch_info_manager.get_switch_info()
-        self.switch_names = list(self.switch_info.keys())
-        self.current_switch_name = self.switch_names[0]
-        self.last_opened_directory = self.parent.config_manager.get_open_dir()
+        self.key = None
+        self.switch_list_model = self.parent.switch_list_model
+        self.current_switch_name = None
+        self.chosen_image_path = None
+        self.chosen_curve_path = None
         self.labels = {}
         self.fields = {}
         self._setup_ui()
 
+    @property
+    def switch_info(self):
+        return self.parent.switch_info_manager.get_switch_info()
+
+    def rebind(self, key):
+        """ダイアログを使い回すため、表示のたびに対象のキーとスイッチを設定し直す"""
+        self.key = key
+        self.search_box.clear()
+        self.switch_list_model.set_filter("")
+        switch_name = self.parent.key_map_manager.get_key_map().get(key)
+        row = self.switch_list_model.row_of(switch_name)
+        self._select_row(row if row >= 0 else 0)
+        self._toggle_ui_elements(True)
+
     def _setup_ui(self):
         self.setWindowTitle("Edit Switch Information")
         self.setGeometry(600, 300, 400, 400)
@@ -24,41 +38,51 @@ class EditSwitchInfoDialog(QtWidgets.QDialog):
 
         self._create_switch_name_combo()
         self._create_image_section()
+        self._create_curve_section()
         self._create_type_combo()
         self._create_other_fields()
         self._create_buttons()
 
     def _create_switch_name_combo(self):
+        self.search_box = QtWidgets.QLineEdit(self)
+        self.search_box.setPlaceholderText("Search")
+        self.search_box.textChanged.connect(self._filter)
+        self.layout.addWidget(self.search_box)
+
         self.switch_name_combo = QtWidgets.QComboBox()
-        self.switch_name_combo.addItems(self.switch_names)
-        self.switch_name_combo.setCurrentText(self.current_switch_name)
+        self.switch_name_combo.view().setUniformItemSizes(True)
+        self.switch_name_combo.setModel(self.switch_list_model)
         self.switch_name_combo.currentIndexChanged.connect(self._on_switch_name_changed)
         self.layout.addLayout(
             self._create_combo_layout("Switch Name: ", self.switch_name_combo)
         )
 
     def _create_image_section(self):
-        self.image_path = QtWidgets.QLabel(
-            os.path.basename(self.switch_info[self.current_switch_name]["image"])
-        )
+        self.image_path = QtWidgets.QLabel("")
         self.layout.addLayout(self._create_image_layout())
 
+    def _create_curve_section(self):
+        self.curve_path = QtWidgets.QLabel("")
+        layout = QtWidgets.QHBoxLayout()
+        layout.addWidget(QtWidgets.QLabel("Force Curve: "))
+        layout.addWidget(self.curve_path)
+        choose_curve_button = QtWidgets.QPushButton("Choose Curve", self)
+        choose_curve_button.clicked.connect(self._choose_curve)
+        layout.addWidget(choose_curve_button)
+        self.layout.addLayout(layout)
+
     def _create_type_combo(self):
         self.type_combo = QtWidgets.QComboBox()
         self.type_combo.addItems(SWITCH_TYPES)
-        self.type_combo.setCurrentText(
-            self.switch_info[self.current_switch_name]["switch_type"]
-        )
         self.layout.addLayout(
             self._create_combo_layout("Switch Type: ", self.type_combo)
         )
 
     def _create_other_fields(self):
-        exclude_fields = ["switch_name", "image", "switch_type"]
+        exclude_fields = ["switch_name", "image", "force_curve", "switch_type"]
         for field in filter(lambda f: f not in exclude_fields, FIELDS):
             self.fields[field], field_layout = self._create_layout_with_input(
-                f"{field.replace('_', ' ').title()}: ",
-                self.switch_info[self.current_switch_name].get(field, ""),
+                f"{field.replace('_', ' ').title()}: ", ""
             )
             self.layout.addLayout(field_layout)
 
@@ -81,19 +105,55 @@ class EditSwitchInfoDialog(QtWidgets.QDialog):
 
         self.cancel_button.hide()
 
+    def _filter(self, text):
+        self.switch_list_model.set_filter(text)
+        if self.switch_list_model.rowCount():
+            self._select_row(0)
+
+    def _select_row(self, row):
+        if not self.switch_list_model.rowCount():
+            # 選べる行がないとcurrentIndexChangedが送られないので、ここで表示を消す
+            self.current_switch_name = None
+            self._update_display()
+        elif self.switch_name_combo.currentIndex() == row:
+            self._on_switch_name_changed(row)
+        else:
+            self.switch_name_combo.setCurrentIndex(row)
+
     def _on_switch_name_changed(self, index):
-        self.current_switch_name = self.switch_names[index]
+        switch_name = self.switch_list_model.name_at(index)
+        if switch_name is None and self.switch_list_model.rowCount():
+            return
+        self.current_switch_name = switch_name
         self._update_display()
 
     def _update_display(self):
-        self.image_path.setText(
-            os.path.basename(self.switch_info[self.current_switch_name]["image"])
-        )
-        self.type_combo.setCurrentText(
-            self.switch_info[self.current_switch_name]["switch_type"]
-        )
+        self.chosen_image_path = None
+        self.chosen_curve_path = None
+        record = self.switch_info.get(self.current_switch_name)
+        self.save_button.setEnabled(record is not None)
+        self.delete_button.setEnabled(record is not None)
+        if record is None:
+            self._clear_fields()
+            return
+        self.image_path.setText(os.path.basename(record.get("image") or ""))
+        self.curve_path.setText(record.get("force_curve") or "")
+        self.type_combo.setCurrentText(record.get("switch_type", ""))
         for field, widget in self.fields.items():
-            widget.setText(self.switch_info[self.current_switch_name].get(field, ""))
+            widget.setText(record.get(field, ""))
+
+    def _collect_changes(self):
+        """変更されたフィールドだけを返す"""
+        record = self.switch_info[self.current_switch_name]
+        changes = {
+            field: widget.text()
+            for field, widget in self.fields.items()
+            if widget.text() != record.get(field, "")
+        }
+        switch_type = self.type_combo.currentText()
+        if switch_type != record.get("switch_type", ""):
+            changes["switch_type"] = switch_type
+        return changes
 
     def _show_confirm(self):
         reply = QMessageBox.question(
@@ -110,72 +170,93 @@ class EditSwitchInfoDialog(QtWidgets.QDialog):
         file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
             self,
             "Select Image",
-            self.last_opened_directory,
+            self.parent.config_manager.get_open_dir(),
             "Images (*.png *.jpg *.jpeg)",
         )
         if file_path:
             self.parent.config_manager.set_open_dir(os.path.dirname(file_path))
+            self.chosen_image_path = file_path
             self.image_path.setText(file_path)
 
+    def _choose_curve(self):
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self,
+            "Select Force Curve",
+            self.parent.config_manager.get_open_dir(),
+            "Force Curves (*.csv *.txt)",
+        )
+        if file_path:
+            self.parent.config_manager.set_open_dir(os.path.dirname(file_path))
+            self.chosen_curve_path = file_path
+            self.curve_path.setText(file_path)
+
     def _save(self):
-        for field, widget in self.fields.items():
-            self.switch_info[self.current_switch_name][field] = widget.text()
+        if self.current_switch_name is None:
+            return
+        changes = self._collect_changes()
 
-        new_image_path = self.parent.key_map_manager.save_image(self.image_path.text())
-        if new_image_path:
-            self.switch_info[self.current_switch_name]["image"] = os.path.basename(
-                new_image_path
-            )
+        record = self.switch_info[self.current_switch_name]
+        # 取り込みはファイルの内容で名前が決まるので、失敗してやり直しても重複しない
+        if self.chosen_curve_path:
+            try:
+                curve_name, _ = self.parent.curve_store.ingest(self.chosen_curve_path)
+            except (OSError, ValueError) as error:
+                QMessageBox.warning(
+                    self, "Message", f"Cannot read the force curve: {error}"
+                )
+                return
+            if curve_name != record.get("force_curve"):
+                changes["force_curve"] = curve_name
+            self.curve_path.setText(curve_name)
 
-        self.switch_info[self.current_switch_name]["switch_type"] = self.type_combo.currentText()
+        if self.chosen_image_path:
+            try:
+                image_name, _ = self.parent.image_store.ingest(self.chosen_image_path)
+            except OSError as error:
+                QMessageBox.warning(self, "Message", f"Cannot read the image: {error}")
+                return
+            if image_name != record.get("image"):
+                changes["image"] = image_name
+            self.image_path.setText(image_name)
+        self.chosen_image_path = None
+        self.chosen_curve_path = None
 
-        self.parent.switch_info_manager.update_switch_info(
-            self.current_switch_name, self.switch_info[self.current_switch_name]
-        )
+        if changes:
+            self.parent.switch_info_manager.update_switch_fields(
+                self.current_switch_name, changes
+            )
         self._toggle_ui_elements(True)
 
     def _delete(self):
+        if self.current_switch_name is None:
+            return
         self.parent.switch_info_manager.delete_switch_info(self.current_switch_name)
-        self.switch_names.remove(self.current_switch_name)
-        self.switch_name_combo.removeItem(
-            self.switch_name_combo.findText(self.current_switch_name)
-        )
-        self.parent.ui_manager.update_display_info(
-            self.key,
-            self.switch_info.get(
-                self.parent.key_map_manager.get_key_map().get(self.key)
-            ),
-        )
+        if not self.switch_list_model.rowCount():
+            self.search_box.clear()
+        self._select_row(0)
 
     def _create_new(self):
         new_name, ok = QInputDialog.getText(
             self, "New Switch", "Enter new switch name:"
         )
         if ok and new_name:
-            if new_name in self.switch_names:
+            if new_name in self.switch_info:
                 QMessageBox.warning(self, "Warning", "This switch name already exists.")
                 return
-            self.switch_info[new_name] = DEFAULT_INFO.copy()
-            self.switch_info[new_name]["switch_name"] = new_name
-            self.switch_names.append(new_name)
-            self.current_switch_name = new_name
-            self.switch_name_combo.addItem(new_name)
-            self.switch_name_combo.setCurrentText(new_name)
-            self._clear_fields()
+            new_info = DEFAULT_INFO.copy()
+            new_info["switch_name"] = new_name
+            self.search_box.clear()
+            self.parent.switch_info_manager.update_switch_info(new_name, new_info)
+            self._select_row(self.switch_list_model.row_of(new_name))
             self._toggle_ui_elements(False)
 
     def _cancel(self):
-        self.switch_names.remove(self.current_switch_name)
-        self.parent.switch_info_manager.delete_switch_info(self.current_switch_name)
-        self.switch_name_combo.removeItem(
-            self.switch_name_combo.findText(self.current_switch_name)
-        )
-        self.switch_name_combo.setCurrentText(self.switch_names[0])
+        if self.current_switch_name is not None:
+            self.parent.switch_info_manager.delete_switch_info(self.current_switch_name)
+        self._select_row(0)
         self._toggle_ui_elements(True)
 
     def _close(self):
-        self.current_switch_name = self.switch_names[0]
-        self.switch_name_combo.setCurrentText(self.current_switch_name)
         self.accept()
 
     def _create_image_layout(self):
@@ -209,8 +290,9 @@ class EditSwitchInfoDialog(QtWidgets.QDialog):
 
     def _clear_fields(self):
         self.image_path.setText("")
+        self.curve_path.setText("")
         self.type_combo.setCurrentIndex(0)
-        for field, widget in self.fields.items():
+        for widget in self.fields.values():
             widget.setText("")
 
     def _toggle_ui_elements(self, enabled):
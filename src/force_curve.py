@@ -0,0 +1,335 @@
+"""スイッチの荷重曲線 (ストロークと荷重のサンプル) を取り込み、メモリマップで読む (Qtに依存しない)
+
+曲線は.npy形式 (float32、形状は (2, サンプル数)、1行目がストローク、2行目が荷重) で保存するので、
+NumPyがあればnumpy.load(path, mmap_mode="r")でそのまま読める。
+"""
+
+import ast
+import bisect
+import csv
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPY_ALIGNMENT = 64
+LOD_BUCKETS = 1024  # 詳細度を落とした曲線の、ストローク方向の区間数
+TACTILE_DROP_GF = 3.0  # 荷重がこれ以上下がった山をタクタイルのピークとみなす
+NEWTON_TO_GF = 101.971621
+OPEN_CURVE_CACHE_SIZE = 16
+_STORED_NAME = re.compile(r"^[0-9a-f]{32}\.npy$")
+_NUMBER = re.compile(r"^[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?$")
+
+
+def is_stored_curve(name):
+    return bool(name) and _STORED_NAME.match(name) is not None
+
+
+def write_npy(file_path, rows):
+    """同じ長さのfloat32のarrayのリストを、形状 (行数, 長さ) の.npyとして書き込む"""
+    length = len(rows[0]) if rows else 0
+    header = f"{{'descr': '<f4', 'fortran_order': False, 'shape': ({len(rows)}, {length}), }}"
+    # ヘッダーの後ろを空白で埋め、データの開始位置を揃える
+    padding = -(len(NPY_MAGIC) + 2 + len(header) + 1) % NPY_ALIGNMENT
+    header = header + " " * padding + "\n"
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(NPY_MAGIC)
+        file.write(struct.pack("<H", len(header)))
+        file.write(header.encode("latin-1"))
+        for row in rows:
+            if sys.byteorder == "big":
+                row = array("f", row)
+                row.byteswap()
+            row.tofile(file)
+    os.replace(tmp_path, file_path)
+
+
+def open_npy(file_path):
+    """(mmap, float32のmemoryview, 形状) を返す。読めない形式ならValueError"""
+    with open(file_path, "rb") as file:
+        prefix = file.read(len(NPY_MAGIC) + 2)
+        if prefix[: len(NPY_MAGIC)] != NPY_MAGIC:
+            raise ValueError(f"{file_path} is not a .npy v1.0 file")
+        (header_length,) = struct.unpack("<H", prefix[len(NPY_MAGIC) :])
+        try:
+            header = ast.literal_eval(file.read(header_length).decode("latin-1"))
+        except (SyntaxError, ValueError, TypeError, RecursionError):
+            raise ValueError(f"{file_path} has a broken .npy header") from None
+        shape = header.get("shape") if isinstance(header, dict) else None
+        if (
+            not isinstance(header, dict)
+            or header.get("descr") != "<f4"
+            or header.get("fortran_order") is not False
+            or not isinstance(shape, tuple)
+            or len(shape) != 2
+            or not all(type(size) is int and size >= 0 for size in shape)
+        ):
+            raise ValueError(f"{file_path} is not a float32 2-D array")
+        offset = len(prefix) + header_length
+        count = shape[0] * shape[1]
+        if os.fstat(file.fileno()).st_size < offset + count * 4:
+            raise ValueError(f"{file_path} is truncated")
+        if not count:
+            return None, memoryview(array("f")), shape
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if sys.byteorder == "big":
+        # ビッグエンディアンの環境では変換したコピーを使う
+        values = array("f", mapped[offset : offset + count * 4])
+        values.byteswap()
+        mapped.close()
+        return None, memoryview(values), shape
+    view = memoryview(mapped)[offset : offset + count * 4].cast("f")
+    return mapped, view, shape
+
+
+def read_curve_csv(file_path):
+    """CSVを読み、(ストローク, 荷重, 接点) のarrayを返す
+
+    ストローク (mm) と荷重 (gf) の2列と、あれば接点の状態 (0/1) の3列目を読む。
+    見出しに「N」や「newton」があれば荷重をgfに変換する。数値でない行は読み飛ばす。
+    """
+    travel = array("f")
+    force = array("f")
+    contact = array("f")
+    scale = 1.0
+    with open(file_path, newline="", encoding="utf-8-sig") as file:
+        sample = file.read(4096)
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t ")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(file, dialect):
+            cells = [cell.strip() for cell in row if cell.strip()]
+            if len(cells) < 2:
+                continue
+            if not (_NUMBER.match(cells[0]) and _NUMBER.match(cells[1])):
+                if not travel and re.search(r"\bn\b|newton", cells[1].lower()):
+                    scale = NEWTON_TO_GF
+                continue
+            travel.append(float(cells[0]))
+            force.append(float(cells[1]) * scale)
+            if len(cells) > 2 and _NUMBER.match(cells[2]):
+                contact.append(float(cells[2]))
+    if len(travel) < 2:
+        raise ValueError(f"{file_path} has no force curve samples")
+    return travel, force, contact if len(contact) == len(travel) else None
+
+
+def analyze(travel, force, contact=None):
+    """押し込み側の曲線から、底打ち・タクタイルのピーク・接点が入った位置を求める"""
+    bottom_index = travel.index(max(travel))
+    result = {
+        "samples": len(travel),
+        "bottom_index": bottom_index,
+        "max_travel": float(travel[bottom_index]),
+        "max_force": float(max(force)),
+        "bottom_out": [float(travel[bottom_index]), float(force[bottom_index])],
+        "tactile_peak": None,
+        "actuation": None,
+    }
+    # 押し込み側で、荷重が一度TACTILE_DROP_GF以上下がる直前の山
+    peak_index = 0
+    peak = force[0]
+    for index in range(1, bottom_index + 1):
+        value = force[index]
+        if value > peak:
+            peak = value
+            peak_index = index
+        elif peak - value >= TACTILE_DROP_GF:
+            result["tactile_peak"] = [float(travel[peak_index]), float(peak)]
+            break
+    if contact is not None:
+        for index in range(bottom_index + 1):
+            if contact[index] >= 0.5:
+                result["actuation"] = [float(travel[index]), float(force[index])]
+                break
+    return result
+
+
+def build_lod(travel, force, bottom_index, max_travel, buckets=LOD_BUCKETS):
+    """ストロークをbuckets区間に分け、押し込み側と戻り側の荷重の最小・最大を求める
+
+    [押し込み最小, 押し込み最大, 戻り最小, 戻り最大] の順に並べ、サンプルのない区間はNaN。
+    """
+    nan = math.nan
+    lod = [array("f", [nan]) * buckets for _ in range(4)]
+    scale = (buckets - 1) / max_travel if max_travel > 0 else 0.0
+    for index, (position, value) in enumerate(zip(travel, force)):
+        bucket = min(buckets - 1, max(0, int(position * scale)))
+        low, high = (lod[0], lod[1]) if index <= bottom_index else (lod[2], lod[3])
+        if not value >= low[bucket]:  # NaNとの比較はFalse
+            low[bucket] = value
+        if not value <= high[bucket]:
+            high[bucket] = value
+    return lod
+
+
+def decimate(low, high, start, stop, width):
+    """区間 [start, stop) を幅widthに縮め、列ごとの (最小, 最大) のリストを返す (NaNは除く)"""
+    columns = []
+    count = stop - start
+    for column in range(width):
+        first = start + column * count // width
+        last = max(first + 1, start + (column + 1) * count // width)
+        lows = [value for value in low[first:last] if not math.isnan(value)]
+        highs = [value for value in high[first:last] if not math.isnan(value)]
+        columns.append((min(lows), max(highs)) if lows else None)
+    return columns
+
+
+class ForceCurve:
+    """メモリマップした曲線と、詳細度を落とした曲線、取り込み時に求めた値"""
+
+    def __init__(self, curve_path):
+        base_path = curve_path[: -len(".npy")]
+        self._map, view, shape = open_npy(curve_path)
+        self.travel = view[: shape[1]]
+        self.force = view[shape[1] :]
+        self._lod_map, lod, lod_shape = open_npy(f"{base_path}.lod.npy")
+        self.buckets = lod_shape[1]
+        self.lod = [
+            lod[row * self.buckets : (row + 1) * self.buckets] for row in range(4)
+        ]
+        with open(f"{base_path}.json", encoding="utf-8") as file:
+            self.info = json.load(file)
+
+    @property
+    def max_travel(self):
+        return self.info["max_travel"]
+
+    @property
+    def max_force(self):
+        return self.info["max_force"]
+
+    def force_at(self, position):
+        """押し込み側のpositionの荷重 (線形補間)。範囲外ならNone"""
+        bottom_index = self.info["bottom_index"]
+        travel = self.travel[: bottom_index + 1]
+        index = bisect.bisect_left(travel, position)
+        if index == 0 or index > bottom_index:
+            return None
+        x0, x1 = travel[index - 1], travel[index]
+        y0, y1 = self.force[index - 1], self.force[index]
+        if x1 == x0:
+            return y1
+        return y0 + (y1 - y0) * (position - x0) / (x1 - x0)
+
+    def columns(self, width, max_travel=None):
+        """幅widthの列ごとに、押し込み側と戻り側の荷重の (最小, 最大) を返す
+
+        横軸は0からmax_travel (省略時は曲線の最大ストローク) まで。
+        """
+        max_travel = max_travel or self.max_travel
+        # 曲線が横軸の一部にしかない場合は、その分の列だけを縮める
+        used = max(1, min(width, round(width * self.max_travel / max_travel)))
+        down = decimate(self.lod[0], self.lod[1], 0, self.buckets, used)
+        up = decimate(self.lod[2], self.lod[3], 0, self.buckets, used)
+        return down, up
+
+    def close(self):
+        if self.travel is None:
+            return
+        # mmapを参照するビューを全て手放してからでないと閉じられない
+        views = [self.travel, self.force, *self.lod]
+        self.travel = self.force = None
+        self.lod = []
+        for view in views:
+            view.release()
+        for mapped in (self._map, self._lod_map):
+            if mapped is not None:
+                mapped.close()
+        self._map = self._lod_map = None
+
+
+class CurveStore:
+    """荷重曲線をサンプルの内容のハッシュをファイル名にして curves/ に保存する
+
+    1つの曲線は<ハッシュ>.npy (全サンプル)、<ハッシュ>.lod.npy (詳細度を落とした曲線)、
+    <ハッシュ>.json (取り込み時に求めた値) の3ファイルになる。
+    """
+
+    def __init__(self, curve_dir):
+        self.curve_dir = curve_dir
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_curve_dir(self, curve_dir):
+        self.curve_dir = curve_dir
+        self.close()
+
+    def ingest(self, source_path):
+        """CSVを取り込み、(ファイル名, 新しく作成したか) を返す。読めなければOSErrorかValueError"""
+        travel, force, contact = read_curve_csv(source_path)
+        digest = hashlib.sha256(travel.tobytes())
+        digest.update(force.tobytes())
+        name = f"{digest.hexdigest()[:32]}.npy"
+        curve_path = os.path.join(self.curve_dir, name)
+        if os.path.exists(curve_path):
+            return name, False
+
+        os.makedirs(self.curve_dir, exist_ok=True)
+        info = analyze(travel, force, contact)
+        lod = build_lod(travel, force, info["bottom_index"], info["max_travel"])
+        base_path = curve_path[: -len(".npy")]
+        write_npy(f"{base_path}.lod.npy", lod)
+        with open(f"{base_path}.json", "w", encoding="utf-8") as file:
+            json.dump(info, file)
+        # 本体を最後に書くので、本体があれば他のファイルも揃っている
+        write_npy(curve_path, [travel, force])
+        return name, True
+
+    def open(self, name):
+        """曲線を開く。最近開いたものは開いたままにしておく。読めなければNone"""
+        if not name:
+            return None
+        with self._lock:
+            curve = self._open.get(name)
+            if curve is not None:
+                self._open.move_to_end(name)
+                return curve
+        try:
+            curve = ForceCurve(os.path.join(self.curve_dir, name))
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._lock:
+            self._open[name] = curve
+            while len(self._open) > OPEN_CURVE_CACHE_SIZE:
+                _, evicted = self._open.popitem(last=False)
+                evicted.close()
+        return curve
+
+    def release(self, name, switch_info):
+        """どのスイッチからも参照されなくなった曲線を削除する"""
+        if not is_stored_curve(name):
+            return False
+        if any(record.get("force_curve") == name for record in switch_info.values()):
+            return False
+        with self._lock:
+            curve = self._open.pop(name, None)
+        if curve is not None:
+            curve.close()
+        base_path = os.path.join(self.curve_dir, name[: -len(".npy")])
+        removed = False
+        for path in (f"{base_path}.npy", f"{base_path}.lod.npy", f"{base_path}.json"):
+            try:
+                os.remove(path)
+                removed = True
+            except OSError:
+                pass
+        return removed
+
+    def close(self):
+        with self._lock:
+            curves, self._open = list(self._open.values()), OrderedDict()
+        for curve in curves:
+            curve.close()
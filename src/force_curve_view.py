@@ -0,0 +1,260 @@
+import math
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+PLOT_MARGINS = (56, 8, 8, 18)  # 左, 上, 右, 下
+PLOT_MIN_SIZE = (240, 160)
+COMPARE_LIMIT = 4  # 並べて表示する曲線の数
+DOWN_COLOR = QtGui.QColor(30, 90, 200)
+UP_COLOR = QtGui.QColor(150, 150, 150)
+PEAK_COLOR = QtGui.QColor(220, 60, 40)
+ACTUATION_COLOR = QtGui.QColor(30, 160, 70)
+
+
+def _nice_ceiling(value, step):
+    return max(step, math.ceil(value / step) * step)
+
+
+def curve_scale(curves):
+    """曲線を同じ目盛りで描くための (最大ストローク, 最大荷重)"""
+    curves = [curve for curve in curves if curve is not None]
+    if not curves:
+        return None
+    return (
+        _nice_ceiling(max(curve.max_travel for curve in curves), 0.5),
+        _nice_ceiling(max(curve.max_force for curve in curves), 10),
+    )
+
+
+def actuation_of(curve, pre_travel=None):
+    """接点の列がなければ、スイッチのpre_travelの位置の荷重を使う"""
+    actuation = curve.info.get("actuation")
+    if actuation is None and pre_travel is not None:
+        force = curve.force_at(pre_travel)
+        if force is not None:
+            actuation = [pre_travel, force]
+    return actuation
+
+
+def curve_summary(curve, pre_travel=None):
+    """取り込み時に求めた値の説明"""
+    lines = []
+    for label, point in (
+        ("Actuation", actuation_of(curve, pre_travel)),
+        ("Tactile peak", curve.info.get("tactile_peak")),
+        ("Bottom-out", curve.info.get("bottom_out")),
+    ):
+        if point is not None:
+            lines.append(f"{label}: {point[1]:.0f} gf @ {point[0]:.2f} mm")
+    return lines
+
+
+class ForceCurveWidget(QtWidgets.QWidget):
+    """荷重曲線を描く
+
+    取り込み時に作った詳細度を落とした曲線を、さらに描画幅の列ごとの最小・最大に縮め、
+    1列に1本の縦線で描く。サンプル数に関係なく描画の手間は幅に比例する。
+    """
+
+    def __init__(self, curve_store, parent=None):
+        super().__init__(parent)
+        self.curve_store = curve_store
+        self.curve_name = None
+        self.scale = None
+        self.pre_travel = None
+        self.title = None
+        self._columns_key = None
+        self._columns = None
+        self.setMinimumSize(*PLOT_MIN_SIZE)
+
+    def set_curve(self, curve_name, scale=None, pre_travel=None, title=None):
+        """scaleは (最大ストローク, 最大荷重)。省略時は曲線に合わせる"""
+        state = (curve_name, scale, pre_travel, title)
+        if state == (self.curve_name, self.scale, self.pre_travel, self.title):
+            return
+        self.curve_name, self.scale, self.pre_travel, self.title = state
+        self.update()
+
+    def _plot_rect(self):
+        left, top, right, bottom = PLOT_MARGINS
+        return self.rect().adjusted(left, top, -right, -bottom)
+
+    def _curve_columns(self, curve, width, max_travel):
+        # 開いた曲線はCurveStore側で閉じられることがあるので、名前と幅で結果だけを覚える
+        key = (self.curve_name, width, max_travel)
+        if key != self._columns_key:
+            self._columns_key = key
+            self._columns = curve.columns(width, max_travel)
+        return self._columns
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+        curve = self.curve_store.open(self.curve_name)
+        if curve is None:
+            painter.drawText(
+                self.rect(), QtCore.Qt.AlignCenter, self.title or "No force curve"
+            )
+            return
+        max_travel, max_force = self.scale or curve_scale([curve])
+        plot = self._plot_rect()
+        if plot.width() < 2 or plot.height() < 2:
+            return
+
+        def to_y(force):
+            return plot.bottom() - force / max_force * plot.height()
+
+        def to_point(point):
+            return QtCore.QPointF(
+                plot.left() + point[0] / max_travel * plot.width(), to_y(point[1])
+            )
+
+        painter.setPen(self.palette().mid().color())
+        painter.drawRect(plot)
+        painter.setPen(self.palette().text().color())
+        font_height = painter.fontMetrics().height()
+        painter.drawText(
+            QtCore.QRect(0, plot.top(), PLOT_MARGINS[0] - 4, font_height),
+            QtCore.Qt.AlignRight,
+            f"{max_force:.0f} gf",
+        )
+        painter.drawText(
+            QtCore.QRect(plot.left(), plot.bottom() + 2, plot.width(), font_height),
+            QtCore.Qt.AlignRight,
+            f"{max_travel:.1f} mm",
+        )
+        painter.drawText(
+            QtCore.QRect(plot.left(), plot.bottom() + 2, plot.width(), font_height),
+            QtCore.Qt.AlignLeft,
+            "0",
+        )
+
+        down, up = self._curve_columns(curve, plot.width(), max_travel)
+        for columns, color in ((up, UP_COLOR), (down, DOWN_COLOR)):
+            lines = []
+            previous = None
+            previous_x = None
+            for x, column in enumerate(columns, start=plot.left()):
+                if column is None:
+                    continue
+                low, high = column
+                if previous is not None and x - previous_x > 1:
+                    # サンプルのない列は前の列から直線でつなぐ
+                    lines.append(
+                        QtCore.QLineF(previous_x, to_y(previous[1]), x, to_y(column[0]))
+                    )
+                elif previous is not None:
+                    # 隣の列と離れていれば縦線を伸ばしてつなげる
+                    low = min(low, previous[1])
+                    high = max(high, previous[0])
+                previous = column
+                previous_x = x
+                lines.append(QtCore.QLineF(x, to_y(low), x, to_y(high)))
+            painter.setPen(color)
+            painter.drawLines(lines)
+
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        for point, color in (
+            (curve.info.get("tactile_peak"), PEAK_COLOR),
+            (actuation_of(curve, self.pre_travel), ACTUATION_COLOR),
+        ):
+            if point is not None:
+                painter.setPen(color)
+                painter.setBrush(color)
+                painter.drawEllipse(to_point(point), 3, 3)
+
+        painter.setPen(self.palette().text().color())
+        text = "\n".join(
+            ([self.title] if self.title else []) + curve_summary(curve, self.pre_travel)
+        )
+        painter.drawText(
+            plot.adjusted(6, 4, -4, -4), QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop, text
+        )
+
+
+class ForceCurveCompareDialog(QtWidgets.QDialog):
+    """荷重曲線のあるスイッチを選び、同じ目盛りで横に並べて比べる"""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.checked = []
+        self._setup_ui()
+
+    def _setup_ui(self):
+        self.setWindowTitle("Compare Force Curves")
+        self.setGeometry(400, 250, 900, 400)
+        layout = QtWidgets.QHBoxLayout(self)
+        self.switch_list = QtWidgets.QListWidget()
+        self.switch_list.setMaximumWidth(200)
+        self.switch_list.itemChanged.connect(self._on_item_changed)
+        layout.addWidget(self.switch_list)
+        self.plots = []
+        plot_layout = QtWidgets.QHBoxLayout()
+        for _ in range(COMPARE_LIMIT):
+            plot = ForceCurveWidget(self.parent.curve_store, self)
+            plot.hide()
+            self.plots.append(plot)
+            plot_layout.addWidget(plot)
+        layout.addLayout(plot_layout, 1)
+
+    def rebind(self, key):
+        """曲線のあるスイッチを並べ直し、キーに割り当てたスイッチを選んでおく"""
+        switch_info = self.parent.switch_info_manager.get_switch_info()
+        names = sorted(
+            name for name, record in switch_info.items() if record.get("force_curve")
+        )
+        current = self.parent.key_map_manager.get_key_map().get(key)
+        self.checked = [name for name in self.checked if name in names]
+        if current in names and current not in self.checked:
+            self.checked = (self.checked + [current])[-COMPARE_LIMIT:]
+        self.switch_list.blockSignals(True)
+        self.switch_list.clear()
+        for name in names:
+            item = QtWidgets.QListWidgetItem(name)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(
+                QtCore.Qt.Checked if name in self.checked else QtCore.Qt.Unchecked
+            )
+            self.switch_list.addItem(item)
+        self.switch_list.blockSignals(False)
+        self._update_plots()
+
+    def _on_item_changed(self, item):
+        name = item.text()
+        if item.checkState() == QtCore.Qt.Checked:
+            if name not in self.checked:
+                self.checked.append(name)
+            if len(self.checked) > COMPARE_LIMIT:
+                # 一番古く選んだものを外す
+                removed = self.checked.pop(0)
+                self.switch_list.blockSignals(True)
+                for match in self.switch_list.findItems(
+                    removed, QtCore.Qt.MatchExactly
+                ):
+                    match.setCheckState(QtCore.Qt.Unchecked)
+                self.switch_list.blockSignals(False)
+        elif name in self.checked:
+            self.checked.remove(name)
+        self._update_plots()
+
+    def _update_plots(self):
+        switch_info = self.parent.switch_info_manager.get_switch_info()
+        curve_store = self.parent.curve_store
+        records = [switch_info[name] for name in self.checked]
+        scale = curve_scale(
+            [curve_store.open(record.get("force_curve")) for record in records]
+        )
+        for index, plot in enumerate(self.plots):
+            if index < len(records):
+                record = records[index]
+                plot.set_curve(
+                    record.get("force_curve"),
+                    scale,
+                    record.value("pre_travel"),
+                    record.get("switch_name"),
+                )
+                plot.show()
+            else:
+                plot.set_curve(None)
+                plot.hide()
@@ -0,0 +1,75 @@
+from collections import OrderedDict
+
+from constants import DEFAULT_IMAGE_CACHE_BUDGET, IMAGE_DISPLAY_SIZE
+
+
+class ImageCache:
+    """表示用にスケール済みのQPixmapを保持するLRUキャッシュ (読み込みはImageLoaderが行う)"""
+
+    def __init__(self, budget=DEFAULT_IMAGE_CACHE_BUDGET):
+        self.budget = budget
+        self.size_in_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # invalidate/clearのたびに増える。表示側が古い画像を使い回さないために使う
+        self.generation = 0
+        self._entries = OrderedDict()
+
+    def lookup(self, image_path, size=IMAGE_DISPLAY_SIZE):
+        cache_key = (image_path, size)
+        pixmap = self._entries.get(cache_key)
+        if pixmap is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(cache_key)
+        self.hits += 1
+        return pixmap
+
+    def peek(self, image_path, size=IMAGE_DISPLAY_SIZE):
+        return self._entries.get((image_path, size))
+
+    def put(self, image_path, pixmap, size=IMAGE_DISPLAY_SIZE):
+        cache_key = (image_path, size)
+        if cache_key in self._entries:
+            self.size_in_bytes -= self._cost(self._entries.pop(cache_key))
+        cost = self._cost(pixmap)
+        if cost > self.budget:
+            return
+        self._entries[cache_key] = pixmap
+        self.size_in_bytes += cost
+        self._evict()
+
+    def invalidate(self, image_path):
+        self.generation += 1
+        for cache_key in [k for k in self._entries if k[0] == image_path]:
+            self.size_in_bytes -= self._cost(self._entries.pop(cache_key))
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self.size_in_bytes = 0
+
+    def set_budget(self, budget):
+        self.budget = budget
+        self._evict()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size_in_bytes": self.size_in_bytes,
+            "budget": self.budget,
+        }
+
+    def _evict(self):
+        while self.size_in_bytes > self.budget and self._entries:
+            _, pixmap = self._entries.popitem(last=False)
+            self.size_in_bytes -= self._cost(pixmap)
+            self.evictions += 1
+
+    @staticmethod
+    def _cost(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
@@ -0,0 +1,85 @@
+import os
+
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtCore import Qt
+
+from constants import IMAGE_DISPLAY_SIZE
+
+
+class _ImageLoadSignals(QtCore.QObject):
+    loaded = QtCore.pyqtSignal(str, tuple, QtGui.QImage)
+
+
+class _ImageLoadTask(QtCore.QRunnable):
+    """ワーカースレッドで画像をデコードし、表示サイズに縮小する"""
+
+    def __init__(self, image_path, size, signals, thumbnail_store=None):
+        super().__init__()
+        self.image_path = image_path
+        self.size = size
+        self.signals = signals
+        self.thumbnail_store = thumbnail_store
+
+    def run(self):
+        try:
+            image = self._load()
+        except Exception:
+            # 例外をスレッドプールに漏らさず、読めなかった画像としてpendingから外させる
+            image = QtGui.QImage()
+        self.signals.loaded.emit(self.image_path, self.size, image)
+
+    def _load(self):
+        image = QtGui.QImage()
+        if os.path.exists(self.image_path):
+            thumb_path = None
+            if self.thumbnail_store and self._fits_thumbnail():
+                thumb_path = self.thumbnail_store.get_thumbnail_path(self.image_path)
+            if not (thumb_path and image.load(thumb_path)):
+                image.load(self.image_path)
+        if not image.isNull():
+            image = image.scaled(*self.size, Qt.KeepAspectRatio)
+        return image
+
+    def _fits_thumbnail(self):
+        width, height = self.thumbnail_store.size
+        return self.size[0] <= width and self.size[1] <= height
+
+
+class ImageLoader(QtCore.QObject):
+    """画像をバックグラウンドで読み込み、GUIスレッドでImageCacheに登録する"""
+
+    image_loaded = QtCore.pyqtSignal(str)
+
+    def __init__(self, image_cache, thumbnail_store=None, parent=None):
+        super().__init__(parent)
+        self.image_cache = image_cache
+        self.thumbnail_store = thumbnail_store
+        self.thread_pool = QtCore.QThreadPool(self)
+        self.pending = set()
+        self._signals = _ImageLoadSignals(self)
+        self._signals.loaded.connect(self._on_loaded)
+
+    def request(self, image_path, size=IMAGE_DISPLAY_SIZE):
+        cache_key = (image_path, size)
+        if cache_key in self.pending or self.image_cache.peek(image_path, size):
+            return
+        self.pending.add(cache_key)
+        self.thread_pool.start(
+            _ImageLoadTask(image_path, size, self._signals, self.thumbnail_store)
+        )
+
+    def prefetch(self, image_paths, size=IMAGE_DISPLAY_SIZE):
+        for image_path in image_paths:
+            self.request(image_path, size)
+
+    def wait_for_done(self, msecs=-1):
+        return self.thread_pool.waitForDone(msecs)
+
+    def _on_loaded(self, image_path, size, image):
+        self.pending.discard((image_path, size))
+        if not self.pending and self.thumbnail_store:
+            self.thumbnail_store.save_index()
+        if image.isNull():
+            return
+        self.image_cache.put(image_path, QtGui.QPixmap.fromImage(image), size)
+        self.image_loaded.emit(image_path)
@@ -0,0 +1,139 @@
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from PIL import Image, ImageOps
+
+from constants import IMAGE_EXTENSIONS, IMAGE_STORE_MAX_SIZE
+from thumbnail_store import hash_file
+
+# ImageStoreが作成したファイル名 (内容のハッシュ + 拡張子)
+_STORED_NAME = re.compile(r"^[0-9a-f]{32}\.(?:jpg|png)$")
+JPEG_QUALITY = 85
+
+
+def is_stored_name(name):
+    return bool(name) and _STORED_NAME.match(name) is not None
+
+
+class ImageStore:
+    """画像を内容のハッシュをファイル名にして images/ に1つだけ保存する
+
+    取り込み時に最大サイズまで縮小し、透過があればPNG、なければJPEGに変換する。
+    """
+
+    def __init__(self, image_dir, max_size=IMAGE_STORE_MAX_SIZE):
+        self.image_dir = image_dir
+        self.max_size = max_size
+
+    def set_image_dir(self, image_dir):
+        self.image_dir = image_dir
+
+    def ingest(self, source_path):
+        """画像を取り込み、(ファイル名, 新しく作成したか) を返す。開けない画像はOSError"""
+        content_hash = hash_file(source_path)[:32]
+        for extension in ("jpg", "png"):
+            name = f"{content_hash}.{extension}"
+            if os.path.exists(os.path.join(self.image_dir, name)):
+                return name, False
+
+        os.makedirs(self.image_dir, exist_ok=True)
+        with Image.open(source_path) as image:
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or (
+                "transparency" in image.info
+            )
+            extension = "png" if has_alpha else "jpg"
+            name = f"{content_hash}.{extension}"
+            image_path = os.path.join(self.image_dir, name)
+            tmp_path = f"{image_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                if self._can_copy(image, extension):
+                    # 十分小さく形式も同じなら、再圧縮せずにそのまま使う
+                    shutil.copyfile(source_path, tmp_path)
+                else:
+                    self._transcode(image, has_alpha, tmp_path)
+                os.replace(tmp_path, image_path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        return name, True
+
+    def ingest_all(self, image_names, progress_callback=None):
+        """images/ にある既存の画像を取り込み直し、{元の名前: 新しい名前} を返す"""
+        renamed = {}
+        with ThreadPoolExecutor() as executor:
+            futures = {
+                executor.submit(self.ingest, os.path.join(self.image_dir, name)): name
+                for name in image_names
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    renamed[futures[future]] = future.result()[0]
+                except OSError:
+                    pass
+                if progress_callback and not progress_callback(done, len(futures)):
+                    for pending in futures:
+                        pending.cancel()
+                    break
+        return renamed
+
+    def release(self, name, switch_info):
+        """どのスイッチからも参照されなくなった取り込み済みの画像を削除する"""
+        if not is_stored_name(name):
+            return False
+        if any(record.get("image") == name for record in switch_info.values()):
+            return False
+        try:
+            os.remove(os.path.join(self.image_dir, name))
+        except OSError:
+            return False
+        return True
+
+    def collect_garbage(self, switch_info, stored_only=True):
+        """参照されていない画像を削除し、削除したファイル名を返す
+
+        stored_onlyがFalseなら、取り込み以前にコピーされた画像も対象にする。
+        """
+        if not os.path.isdir(self.image_dir):
+            return []
+        referenced = {record.get("image") for record in switch_info.values()}
+        removed = []
+        for name in os.listdir(self.image_dir):
+            if name in referenced or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if stored_only and not is_stored_name(name):
+                continue
+            try:
+                os.remove(os.path.join(self.image_dir, name))
+            except OSError:
+                continue
+            removed.append(name)
+        return removed
+
+    def _can_copy(self, image, extension):
+        expected_format = "PNG" if extension == "png" else "JPEG"
+        return (
+            image.format == expected_format
+            and image.width <= self.max_size[0]
+            and image.height <= self.max_size[1]
+            and image.getexif().get(0x0112, 1) == 1  # 回転の指定がない
+        )
+
+    def _transcode(self, image, has_alpha, tmp_path):
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(self.max_size, Image.LANCZOS)
+        if has_alpha:
+            if image.mode not in ("RGBA", "LA"):
+                image = image.convert("RGBA")
+            image.save(tmp_path, "PNG", optimize=True)
+        else:
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.save(
+                tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True
+            )
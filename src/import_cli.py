@@ -0,0 +1,106 @@
+"""スイッチカタログをGUIなしで取り込む
+
+python src/import_cli.py vendor.csv --image-dir ./photos --map "Model=switch_name"
+"""
+
+import argparse
+import os
+import sys
+
+from PyQt5 import QtCore
+
+from catalog_import import ON_DUPLICATE, CatalogImporter
+from constants import (
+    DATABASE_FILE,
+    DEFAULT_BASE_DIR,
+    IMAGE_DIR,
+    KEY_MAP_FILE,
+    SWITCH_FILE,
+)
+from storage import JsonStorage, SqliteStorage
+from write_behind import ImmediateWriter
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="CSV, JSON Lines or JSON file")
+    parser.add_argument(
+        "--base-dir", help="KeyTester base directory (default: the app setting)"
+    )
+    parser.add_argument(
+        "--image-dir", help="directory of the images in the catalog (default: source's)"
+    )
+    parser.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        metavar="COLUMN=FIELD",
+        help="map a column to a field, can be repeated",
+    )
+    parser.add_argument("--on-duplicate", choices=ON_DUPLICATE, default="skip")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="validate without saving anything"
+    )
+    return parser.parse_args(argv)
+
+
+def open_storage(base_dir):
+    database_file = os.path.join(base_dir, DATABASE_FILE)
+    if os.path.exists(database_file):
+        return SqliteStorage(database_file)
+    return JsonStorage(
+        os.path.join(base_dir, KEY_MAP_FILE),
+        os.path.join(base_dir, SWITCH_FILE),
+        ImmediateWriter(),
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    base_dir = args.base_dir or QtCore.QSettings("KeyTester", "Settings").value(
+        "base_dir", DEFAULT_BASE_DIR
+    )
+    column_overrides = {}
+    for mapping in args.map:
+        column, separator, field = mapping.partition("=")
+        if not separator:
+            sys.exit(f"invalid --map {mapping!r}, expected COLUMN=FIELD")
+        column_overrides[column] = field
+
+    os.makedirs(base_dir, exist_ok=True)
+    storage = open_storage(base_dir)
+    try:
+        switch_info = storage.load_switch_info()
+
+        def report(done, total):
+            print(f"\r{done}/{total}", end="", file=sys.stderr)
+            return True
+
+        importer = CatalogImporter(
+            switch_info,
+            os.path.join(base_dir, IMAGE_DIR),
+            args.image_dir,
+            column_overrides,
+            args.on_duplicate,
+            args.workers,
+            copy_images=not args.dry_run,
+        )
+        result = importer.run(args.source, report if sys.stderr.isatty() else None)
+        print(file=sys.stderr)
+        for line_num, text in result.errors:
+            print(f"error: line {line_num}: {text}", file=sys.stderr)
+        for line_num, text in result.warnings:
+            print(f"warning: line {line_num}: {text}", file=sys.stderr)
+
+        if result.records and not args.dry_run:
+            switch_info.update(result.records)
+            storage.update_switches(switch_info, list(result.records))
+        print(result.summary())
+    finally:
+        storage.close()
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""キーの押下・解放をバイナリのセッションファイルに記録する (Qtに依存しない)"""
+
+import contextlib
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+MAGIC = b"KTREC001"
+# 時刻(ms), Qtのキーコード, ネイティブのスキャンコード, 文字(UTF-16), フラグ
+RECORD = struct.Struct("<QIIHBx")
+HEADER = struct.Struct("<8sII")  # マジック, レコードサイズ, 書き出したレコード数
+RING_CAPACITY = 4096  # レコード
+GROW_RECORDS = 65536  # セッションファイルを一度に拡張するレコード数
+
+FLAG_PRESS = 1
+FLAG_AUTO_REPEAT = 2
+COLUMNS = (
+    ("timestamp_ms", "Q"),
+    ("qt_key", "I"),
+    ("scan_code", "I"),
+    ("key", "H"),
+    ("flags", "B"),
+)
+
+
+class KeyRecorder:
+    """イベントを事前確保したリングバッファにpack_intoで書き込み、一定数ごとに
+    メモリマップしたセッションファイルへまとめて書き出す
+
+    recordはイベントごとにPythonオブジェクトを作らないので、GUIスレッドの負荷は小さい。
+    """
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self.ring = bytearray(capacity * RECORD.size)
+        self.head = 0  # リングバッファ内の書き出していないレコード数
+        self.count = 0  # セッション全体のレコード数
+        self.session_path = None
+        self._file = None
+        self._map = None
+        self._mapped_records = 0
+
+    @property
+    def active(self):
+        return self._file is not None
+
+    def start(self, directory):
+        """新しいセッションファイルを作って記録を始め、そのパスを返す"""
+        self.stop()
+        os.makedirs(directory, exist_ok=True)
+        name = time.strftime("session-%Y%m%d-%H%M%S.ktrec")
+        self.session_path = os.path.join(directory, name)
+        with contextlib.ExitStack() as stack:
+            # 拡張やmmapに失敗したらファイルを閉じ、記録していない状態に戻す
+            self._file = stack.enter_context(open(self.session_path, "w+b"))
+            stack.callback(setattr, self, "_file", None)
+            self._file.write(HEADER.pack(MAGIC, RECORD.size, 0))
+            self.head = 0
+            self.count = 0
+            self._mapped_records = 0
+            self._grow()
+            # 記録中は開いたままにし、stopで閉じる
+            stack.pop_all()
+        return self.session_path
+
+    def stop(self):
+        if self._file is None:
+            return
+        self._spill()
+        self._map.close()
+        self._map = None
+        # 拡張した分を切り詰める
+        self._file.truncate(HEADER.size + self.count * RECORD.size)
+        self._file.close()
+        self._file = None
+
+    def record(self, timestamp, qt_key, scan_code, text, pressed, auto_repeat):
+        flags = (FLAG_PRESS if pressed else 0) | (
+            FLAG_AUTO_REPEAT if auto_repeat else 0
+        )
+        RECORD.pack_into(
+            self.ring,
+            self.head * RECORD.size,
+            timestamp,
+            qt_key & 0xFFFFFFFF,
+            scan_code & 0xFFFFFFFF,
+            ord(text[0]) & 0xFFFF if text else 0,
+            flags,
+        )
+        self.head += 1
+        if self.head == self.capacity:
+            self._spill()
+
+    def _spill(self):
+        if not self.head:
+            return
+        if self.count + self.head > self._mapped_records:
+            self._grow()
+        offset = HEADER.size + self.count * RECORD.size
+        length = self.head * RECORD.size
+        self._map[offset : offset + length] = self.ring[:length]
+        self.count += self.head
+        self.head = 0
+        # 異常終了しても、拡張しただけの0のレコードを読まないよう件数を残す
+        HEADER.pack_into(self._map, 0, MAGIC, RECORD.size, self.count)
+
+    def _grow(self):
+        if self._map is not None:
+            self._map.close()
+        self._mapped_records += GROW_RECORDS
+        self._file.truncate(HEADER.size + self._mapped_records * RECORD.size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+
+def read_session(session_path):
+    """セッションファイルのレコードを (時刻, キーコード, スキャンコード, 文字, フラグ) で返す"""
+    with open(session_path, "rb") as file:
+        magic, record_size, count = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{session_path} is not a key recording")
+        data = file.read(count * RECORD.size)
+    usable = len(data) - len(data) % RECORD.size
+    return RECORD.iter_unpack(memoryview(data)[:usable])
+
+
+def export_csv(session_path, csv_path):
+    with open(csv_path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            ["timestamp_ms", "key", "event", "auto_repeat", "qt_key", "scan_code"]
+        )
+        for timestamp, qt_key, scan_code, key, flags in read_session(session_path):
+            writer.writerow(
+                [
+                    timestamp,
+                    chr(key) if key else "",
+                    "press" if flags & FLAG_PRESS else "release",
+                    int(bool(flags & FLAG_AUTO_REPEAT)),
+                    qt_key,
+                    scan_code,
+                ]
+            )
+
+
+def export_columns(session_path, output_dir):
+    """列ごとのリトルエンディアンの配列ファイルとschema.jsonを書き出す"""
+    os.makedirs(output_dir, exist_ok=True)
+    columns = [array(typecode) for _, typecode in COLUMNS]
+    count = 0
+    for values in read_session(session_path):
+        for column, value in zip(columns, values):
+            column.append(value)
+        count += 1
+    schema = {"rows": count, "byteorder": "little", "columns": []}
+    for (name, typecode), column in zip(COLUMNS, columns):
+        if column.itemsize > 1 and sys.byteorder == "big":
+            column.byteswap()
+        file_name = f"{name}.bin"
+        with open(os.path.join(output_dir, file_name), "wb") as file:
+            column.tofile(file)
+        schema["columns"].append(
+            {
+                "name": name,
+                "file": file_name,
+                "type": typecode,
+                "itemsize": column.itemsize,
+            }
+        )
+    with open(os.path.join(output_dir, "schema.json"), "w") as file:
+        json.dump(schema, file, indent=2)
+    return count
@@ -0,0 +1,271 @@
+"""キー配列の定義ファイルを読み込み、キーイベントからキーを引く表を作る (Qtに依存しない)"""
+
+import json
+import os
+import sys
+
+# 物理的なキーの位置 (W3CのKeyboardEvent.code) ごとの
+# (キーの名前, 表示名, Windowsのスキャンコード, X11のキーコード, macOSの仮想キーコード, Qtのキーコード)
+# 文字キーの名前はUS配列の文字で、Qtのキーコードは配列の文字から求める
+PHYSICAL_KEYS = {
+    "Escape": ("esc", "Esc", 0x01, 9, 0x35, 0x01000000),
+    "F1": ("f1", "F1", 0x3B, 67, 0x7A, 0x01000030),
+    "F2": ("f2", "F2", 0x3C, 68, 0x78, 0x01000031),
+    "F3": ("f3", "F3", 0x3D, 69, 0x63, 0x01000032),
+    "F4": ("f4", "F4", 0x3E, 70, 0x76, 0x01000033),
+    "F5": ("f5", "F5", 0x3F, 71, 0x60, 0x01000034),
+    "F6": ("f6", "F6", 0x40, 72, 0x61, 0x01000035),
+    "F7": ("f7", "F7", 0x41, 73, 0x62, 0x01000036),
+    "F8": ("f8", "F8", 0x42, 74, 0x64, 0x01000037),
+    "F9": ("f9", "F9", 0x43, 75, 0x65, 0x01000038),
+    "F10": ("f10", "F10", 0x44, 76, 0x6D, 0x01000039),
+    "F11": ("f11", "F11", 0x57, 95, 0x67, 0x0100003A),
+    "F12": ("f12", "F12", 0x58, 96, 0x6F, 0x0100003B),
+    "PrintScreen": ("print", "PrtSc", 0x137, 107, 0x69, 0x01000009),
+    "ScrollLock": ("scroll", "ScrLk", 0x46, 78, 0x6B, 0x01000026),
+    "Pause": ("pause", "Pause", 0x45, 127, 0x71, 0x01000008),
+    "Backquote": ("`", "`", 0x29, 49, 0x32, None),
+    "Digit1": ("1", "1", 0x02, 10, 0x12, None),
+    "Digit2": ("2", "2", 0x03, 11, 0x13, None),
+    "Digit3": ("3", "3", 0x04, 12, 0x14, None),
+    "Digit4": ("4", "4", 0x05, 13, 0x15, None),
+    "Digit5": ("5", "5", 0x06, 14, 0x17, None),
+    "Digit6": ("6", "6", 0x07, 15, 0x16, None),
+    "Digit7": ("7", "7", 0x08, 16, 0x1A, None),
+    "Digit8": ("8", "8", 0x09, 17, 0x1C, None),
+    "Digit9": ("9", "9", 0x0A, 18, 0x19, None),
+    "Digit0": ("0", "0", 0x0B, 19, 0x1D, None),
+    "Minus": ("-", "-", 0x0C, 20, 0x1B, None),
+    "Equal": ("=", "=", 0x0D, 21, 0x18, None),
+    "Backspace": ("backspace", "Backspace", 0x0E, 22, 0x33, 0x01000003),
+    "Tab": ("tab", "Tab", 0x0F, 23, 0x30, 0x01000001),
+    "KeyQ": ("q", "Q", 0x10, 24, 0x0C, None),
+    "KeyW": ("w", "W", 0x11, 25, 0x0D, None),
+    "KeyE": ("e", "E", 0x12, 26, 0x0E, None),
+    "KeyR": ("r", "R", 0x13, 27, 0x0F, None),
+    "KeyT": ("t", "T", 0x14, 28, 0x11, None),
+    "KeyY": ("y", "Y", 0x15, 29, 0x10, None),
+    "KeyU": ("u", "U", 0x16, 30, 0x20, None),
+    "KeyI": ("i", "I", 0x17, 31, 0x22, None),
+    "KeyO": ("o", "O", 0x18, 32, 0x1F, None),
+    "KeyP": ("p", "P", 0x19, 33, 0x23, None),
+    "BracketLeft": ("[", "[", 0x1A, 34, 0x21, None),
+    "BracketRight": ("]", "]", 0x1B, 35, 0x1E, None),
+    "Backslash": ("\\", "\\", 0x2B, 51, 0x2A, None),
+    "CapsLock": ("caps", "Caps", 0x3A, 66, 0x39, 0x01000024),
+    "KeyA": ("a", "A", 0x1E, 38, 0x00, None),
+    "KeyS": ("s", "S", 0x1F, 39, 0x01, None),
+    "KeyD": ("d", "D", 0x20, 40, 0x02, None),
+    "KeyF": ("f", "F", 0x21, 41, 0x03, None),
+    "KeyG": ("g", "G", 0x22, 42, 0x05, None),
+    "KeyH": ("h", "H", 0x23, 43, 0x04, None),
+    "KeyJ": ("j", "J", 0x24, 44, 0x26, None),
+    "KeyK": ("k", "K", 0x25, 45, 0x28, None),
+    "KeyL": ("l", "L", 0x26, 46, 0x25, None),
+    "Semicolon": (";", ";", 0x27, 47, 0x29, None),
+    "Quote": ("'", "'", 0x28, 48, 0x27, None),
+    "Enter": ("enter", "Enter", 0x1C, 36, 0x24, 0x01000004),
+    "ShiftLeft": ("lshift", "Shift", 0x2A, 50, 0x38, 0x01000020),
+    "IntlBackslash": ("iso", "ISO", 0x56, 94, 0x0A, None),
+    "KeyZ": ("z", "Z", 0x2C, 52, 0x06, None),
+    "KeyX": ("x", "X", 0x2D, 53, 0x07, None),
+    "KeyC": ("c", "C", 0x2E, 54, 0x08, None),
+    "KeyV": ("v", "V", 0x2F, 55, 0x09, None),
+    "KeyB": ("b", "B", 0x30, 56, 0x0B, None),
+    "KeyN": ("n", "N", 0x31, 57, 0x2D, None),
+    "KeyM": ("m", "M", 0x32, 58, 0x2E, None),
+    "Comma": (",", ",", 0x33, 59, 0x2B, None),
+    "Period": (".", ".", 0x34, 60, 0x2F, None),
+    "Slash": ("/", "/", 0x35, 61, 0x2C, None),
+    "ShiftRight": ("rshift", "Shift", 0x36, 62, 0x3C, 0x01000020),
+    "ControlLeft": ("lctrl", "Ctrl", 0x1D, 37, 0x3B, 0x01000021),
+    "MetaLeft": ("lmeta", "Meta", 0x15B, 133, 0x37, 0x01000022),
+    "AltLeft": ("lalt", "Alt", 0x38, 64, 0x3A, 0x01000023),
+    "Space": ("space", "Space", 0x39, 65, 0x31, 0x20),
+    "AltRight": ("ralt", "Alt", 0x138, 108, 0x3D, 0x01000023),
+    "MetaRight": ("rmeta", "Meta", 0x15C, 134, 0x36, 0x01000022),
+    "ContextMenu": ("menu", "Menu", 0x15D, 135, 0x6E, 0x01000055),
+    "ControlRight": ("rctrl", "Ctrl", 0x11D, 105, 0x3E, 0x01000021),
+    "Insert": ("insert", "Ins", 0x152, 118, 0x72, 0x01000006),
+    "Home": ("home", "Home", 0x147, 110, 0x73, 0x01000010),
+    "PageUp": ("pgup", "PgUp", 0x149, 112, 0x74, 0x01000016),
+    "Delete": ("delete", "Del", 0x153, 119, 0x75, 0x01000007),
+    "End": ("end", "End", 0x14F, 115, 0x77, 0x01000011),
+    "PageDown": ("pgdn", "PgDn", 0x151, 117, 0x79, 0x01000017),
+    "ArrowUp": ("up", "↑", 0x148, 111, 0x7E, 0x01000013),
+    "ArrowLeft": ("left", "←", 0x14B, 113, 0x7B, 0x01000012),
+    "ArrowDown": ("down", "↓", 0x150, 116, 0x7D, 0x01000015),
+    "ArrowRight": ("right", "→", 0x14D, 114, 0x7C, 0x01000014),
+    "NumLock": ("num", "Num", 0x145, 77, 0x47, 0x01000025),
+    "NumpadDivide": ("kp/", "/", 0x135, 106, 0x4B, None),
+    "NumpadMultiply": ("kp*", "*", 0x37, 63, 0x43, None),
+    "NumpadSubtract": ("kp-", "-", 0x4A, 82, 0x4E, None),
+    "Numpad7": ("kp7", "7", 0x47, 79, 0x59, None),
+    "Numpad8": ("kp8", "8", 0x48, 80, 0x5B, None),
+    "Numpad9": ("kp9", "9", 0x49, 81, 0x5C, None),
+    "NumpadAdd": ("kp+", "+", 0x4E, 86, 0x45, None),
+    "Numpad4": ("kp4", "4", 0x4B, 83, 0x56, None),
+    "Numpad5": ("kp5", "5", 0x4C, 84, 0x57, None),
+    "Numpad6": ("kp6", "6", 0x4D, 85, 0x58, None),
+    "Numpad1": ("kp1", "1", 0x4F, 87, 0x53, None),
+    "Numpad2": ("kp2", "2", 0x50, 88, 0x54, None),
+    "Numpad3": ("kp3", "3", 0x51, 89, 0x55, None),
+    "NumpadEnter": ("kpenter", "Enter", 0x11C, 104, 0x4C, 0x01000005),
+    "Numpad0": ("kp0", "0", 0x52, 90, 0x52, None),
+    "NumpadDecimal": ("kp.", ".", 0x53, 91, 0x41, None),
+}
+# テンキーの文字はQtのキーコードがメインの文字キーと同じなので、キーコードからは引かない
+NUMPAD_PREFIX = "kp"
+
+if sys.platform == "darwin":
+    NATIVE_COLUMN = 4
+elif sys.platform == "win32":
+    NATIVE_COLUMN = 2
+else:
+    NATIVE_COLUMN = 3
+
+
+def native_code(event):
+    """キーイベントの、このプラットフォームでの物理的なキーのコード"""
+    if NATIVE_COLUMN == 4:
+        return event.nativeVirtualKey()
+    return event.nativeScanCode()
+
+
+class LayoutKey:
+    __slots__ = ("key", "code", "label", "text", "x", "y", "width")
+
+    def __init__(self, key, code, label, text, x, y, width):
+        self.key = key
+        self.code = code
+        self.label = label
+        self.text = text
+        self.x = x
+        self.y = y
+        self.width = width
+
+
+class KeyboardLayout:
+    """配列の定義から、キーイベントをキーの名前に変換する表を作る
+
+    物理的なキーのコードで引く表と、コードが分からない場合 (合成したイベントなど) に
+    Qtのキーコードで引く表を持つ。キーの名前はキーマップのキーとして使う。
+    """
+
+    def __init__(self, layout_id, name, keys):
+        self.layout_id = layout_id
+        self.name = name
+        self.keys = keys
+        self.by_key = {key.key: key for key in keys}
+        self.by_native = {}
+        self.by_qt_key = {}
+        self.by_text = {}
+        for key in keys:
+            physical = PHYSICAL_KEYS[key.code]
+            self.by_native[physical[NATIVE_COLUMN]] = key.key
+            qt_key = physical[5]
+            if qt_key is None and key.text and not key.key.startswith(NUMPAD_PREFIX):
+                # Qtのキーコードは大文字の文字コード (ßのように1文字にならないものはそのまま)
+                upper = key.text.upper()
+                qt_key = ord(upper if len(upper) == 1 else key.text)
+                self.by_text.setdefault(key.text, key.key)
+            if qt_key is not None:
+                self.by_qt_key.setdefault(qt_key, key.key)
+        self.width = max((key.x + key.width for key in keys), default=0)
+        self.height = max((key.y + 1 for key in keys), default=0)
+
+    def resolve(self, native, qt_key):
+        """キーの名前を返す。配列にないキーはNone"""
+        # macOSの仮想キーコード0は「A」のキーなので、0でもQtのキーコードより優先しない
+        if native:
+            key = self.by_native.get(native)
+            if key is not None:
+                return key
+        return self.by_qt_key.get(qt_key)
+
+    def key_for_text(self, text):
+        return self.by_text.get(text)
+
+    def label(self, key):
+        layout_key = self.by_key.get(key)
+        return layout_key.label if layout_key else key
+
+    def key_names(self):
+        return [key.key for key in self.keys]
+
+    def needs_migration(self, key_map):
+        """入力された文字で保存されたキーマップが、この配列では別のキーを指すか
+
+        既に物理的なキーの名前で保存されたキーマップには使わない (移行済みかどうかは呼び出し側で覚える)。
+        """
+        return any(self.by_text.get(key, key) != key for key in key_map)
+
+
+def load_layout(file_path):
+    """配列の定義ファイルを読み込む。定義が正しくなければValueError"""
+    with open(file_path, encoding="utf-8") as file:
+        data = json.load(file)
+    layout_id = os.path.splitext(os.path.basename(file_path))[0]
+    keys = []
+    for row_index, row in enumerate(data.get("rows", [])):
+        x = 0.0
+        for item in row:
+            if isinstance(item, str):
+                item = {"code": item}
+            if "gap" in item:
+                x += float(item["gap"])
+                continue
+            code = item.get("code")
+            if code not in PHYSICAL_KEYS:
+                raise ValueError(f"{file_path}: unknown key code {code!r}")
+            key, label, *_ = PHYSICAL_KEYS[code]
+            # 文字キーの名前は1文字。配列で入力される文字が違う場合はtextで指定する
+            text = item.get("text", key if len(key) == 1 else "")
+            width = float(item.get("width", 1))
+            label = item.get("label", text.upper() if text else label)
+            keys.append(
+                LayoutKey(
+                    key, code, label, text, x, row_index + item.get("y", 0), width
+                )
+            )
+            x += width
+    if not keys:
+        raise ValueError(f"{file_path}: no keys")
+    return KeyboardLayout(layout_id, data.get("name", layout_id), keys)
+
+
+def find_layouts(directories):
+    """{配列のID: 定義ファイルのパス}。後のディレクトリのものが優先される"""
+    layouts = {}
+    for directory in directories:
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            continue
+        for name in names:
+            if name.endswith(".json"):
+                layouts[name[:-5]] = os.path.join(directory, name)
+    return layouts
+
+
+def migrate_key_map(key_map, layout):
+    """入力された文字で保存されたキーマップを、配列の物理的なキーの名前に変換する
+
+    別々のスイッチが割り当てられた文字が同じキーに移る場合は、どちらかを消さないようValueError。
+    """
+    migrated = {}
+    sources = {}
+    collisions = []
+    for key, name in key_map.items():
+        target = layout.by_text.get(key, key)
+        if target in migrated and migrated[target] != name:
+            collisions.append(
+                f"{sources[target]!r} and {key!r} would both move to the "
+                f"{layout.label(target)} key"
+            )
+            continue
+        migrated[target] = name
+        sources[target] = key
+    if collisions:
+        raise ValueError("; ".join(collisions))
+    return migrated
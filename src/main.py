@@ -1,9 +1,17 @@
 """メインモジュール"""
 
+from startup_timer import startup_timer  # 起動時間の計測のため最初にimportする
+
+import multiprocessing
+
 from PyQt5 import QtWidgets
 from main_window import MainWindow
 
+startup_timer.mark("import")
+
 if __name__ == "__main__":
+    # PyInstallerでビルドしたアプリでプロセスプールを使うため
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication([])
     window = MainWindow()
     window.show()
@@ -1,46 +1,540 @@
-from PyQt5 import QtWidgets
+import csv
+import os
+
+from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtGui import QKeyEvent
 
+from chatter_detector import ChatterDetector
 from config_manager import ConfigManager
-from constants import VALID_KEYS
+from config_watcher import ConfigWatcher
+from constants import (
+    BUILTIN_LAYOUT_DIR,
+    DEFAULT_LAYOUT,
+    LAYOUT_DIR,
+    RECORDING_DIR,
+)
+from data_store import DataStore
+from force_curve import CurveStore
 from key_map_manager import KeyMapManager
-from change_key_map_dialog import ChangeKeyMapDialog
-from edit_switch_info_dialog import EditSwitchInfoDialog
+from key_recorder import KeyRecorder
+from keyboard_layout import find_layouts, load_layout, migrate_key_map, native_code
+from profile_manager import ProfileManager
+from rollover_tester import RolloverTester
+from image_cache import ImageCache
+from image_loader import ImageLoader
+from image_store import ImageStore, is_stored_name
+from startup_timer import startup_timer
 from switch_info_manager import SwitchInfoManager
+from switch_list_model import SwitchListModel
+from switch_query import SwitchQuery
+from thumbnail_store import ThumbnailStore
 from ui_manager import UIManager
 
 
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    def __init__(self, settings=None):
         super().__init__()
         self.setWindowTitle("KeyTester")
         self.setGeometry(300, 200, 400, 400)
+        self.auto_repeat_count = 0
+        self.key_recorder = KeyRecorder()
+        self.switch_edit_dialog = None
+        self.change_dialog = None
+        self.filter_dialog = None
+        self.curve_compare_dialog = None
+        self.board_dock = None
+        self.chatter_dock = None
+        self.rollover_dock = None
+        self.rollover_tester = RolloverTester()
+        self.push_server = None
 
-        self.config_manager = ConfigManager(self)
+        self.config_manager = ConfigManager(self, settings)
+        self.keyboard_layout = self._load_layout(self.config_manager.get_layout())
+        self.chatter_detector = ChatterDetector(
+            self.config_manager.get_chatter_window(),
+            self.keyboard_layout.key_names(),
+        )
+        self.image_cache = ImageCache(self.config_manager.get_image_cache_budget())
+        self.thumbnail_store = ThumbnailStore(self.config_manager.get_image_dir())
+        self.image_store = ImageStore(self.config_manager.get_image_dir())
+        self.curve_store = CurveStore(self.config_manager.get_curve_dir())
+        self.image_loader = ImageLoader(self.image_cache, self.thumbnail_store, self)
+        self.data_store = DataStore(self.config_manager, self)
+        self.data_store.key_changed.connect(self._prefetch_key)
+        self.data_store.reset.connect(self.prefetch_images)
+        self.data_store.loaded.connect(self._on_data_loaded)
+        self.data_store.load_failed.connect(self._on_load_failed)
         self.key_map_manager = KeyMapManager(self)
         self.switch_info_manager = SwitchInfoManager(self)
+        self.switch_list_model = SwitchListModel(self.data_store, self)
+        self.switch_query = SwitchQuery(self.data_store)
+        self.profile_manager = ProfileManager(self)
         self.ui_manager = UIManager(self)
+        if self.config_manager.get_push_server_enabled():
+            self.set_push_server(True)
         self.ui_manager.setup_ui()
+        self.config_watcher = ConfigWatcher(self)
+        self.ui_manager.view.installEventFilter(self)
+        startup_timer.mark("ui_build")
+        # ウィンドウを先に表示し、設定ファイルは最初の描画後に読み込む
+        QtCore.QTimer.singleShot(0, self.data_store.load_async)
+
+    def eventFilter(self, obj, event):
+        if obj is self.ui_manager.view and event.type() == QtCore.QEvent.Paint:
+            obj.removeEventFilter(self)
+            startup_timer.mark("first_paint")
+        return super().eventFilter(obj, event)
 
     def keyPressEvent(self, event: QKeyEvent) -> None:
-        key = event.text().lower()
-        if key and key in VALID_KEYS:
+        if self.key_recorder.active:
+            self._record_key_event(event, True)
+        key = self.keyboard_layout.resolve(native_code(event), event.key())
+        if event.isAutoRepeat():
+            self.auto_repeat_count += 1
+            if self.config_manager.get_ignore_auto_repeat():
+                return
+        else:
+            self.chatter_detector.press(key, event.timestamp())
+            if self.rollover_tester.enabled:
+                self.rollover_tester.press(event.key())
+        if key is not None:
             self.key_map_manager.set_current_key(key)
-            self.ui_manager.hide_label("message")
-            self.ui_manager.update_display_info(
-                key,
-                self.switch_info_manager.get_switch_info().get(
-                    self.key_map_manager.key_map.get(key)
-                ),
+            self.ui_manager.request_display_info(key)
+            if self.board_dock is not None:
+                self.board_dock.widget().set_pressed(key, True)
+            if self.push_server is not None and not event.isAutoRepeat():
+                self.push_server.publish_key(key, self.keyboard_layout.label(key), True)
+
+    def keyReleaseEvent(self, event: QKeyEvent) -> None:
+        if self.key_recorder.active:
+            self._record_key_event(event, False)
+        if event.isAutoRepeat():
+            return
+        key = self.keyboard_layout.resolve(native_code(event), event.key())
+        self.chatter_detector.release(key, event.timestamp())
+        if self.rollover_tester.enabled:
+            self.rollover_tester.release(event.key())
+        if key is None:
+            return
+        if self.board_dock is not None:
+            self.board_dock.widget().set_pressed(key, False)
+        if self.push_server is not None:
+            self.push_server.publish_key(key, self.keyboard_layout.label(key), False)
+
+    def _record_key_event(self, event, pressed):
+        self.key_recorder.record(
+            event.timestamp(),
+            event.key(),
+            event.nativeScanCode(),
+            event.text(),
+            pressed,
+            event.isAutoRepeat(),
+        )
+
+    def changeEvent(self, event) -> None:
+        # フォーカスが外れるとキーを離したイベントが届かないため、押下状態を消す
+        if event.type() == QtCore.QEvent.ActivationChange and not self.isActiveWindow():
+            self.chatter_detector.release_all()
+            self.rollover_tester.release_all()
+            if self.board_dock is not None:
+                self.board_dock.widget().release_all()
+            if self.push_server is not None:
+                self.push_server.release_all()
+        super().changeEvent(event)
+
+    def closeEvent(self, event) -> None:
+        self.key_recorder.stop()
+        if self.push_server is not None:
+            self.push_server.stop()
+        self.curve_store.close()
+        self.config_manager.close()
+        super().closeEvent(event)
+
+    def set_recording(self, recording):
+        if recording:
+            session_path = self.key_recorder.start(
+                os.path.join(self.config_manager.base_dir, RECORDING_DIR)
+            )
+            self.statusBar().showMessage(f"Recording to {session_path}")
+        else:
+            self.key_recorder.stop()
+            self.statusBar().showMessage(
+                f"Recorded {self.key_recorder.count} key events", 5000
             )
-            self.ui_manager.show_edit_button()
 
-    def open_switch_edit(self):
+    def set_push_server(self, enabled):
+        """オーバーレイ用のサーバーを起動・停止する。起動できなければFalseを返す"""
+        if not enabled:
+            if self.push_server is not None:
+                self.push_server.stop()
+                self.push_server = None
+            self.config_manager.set_push_server_enabled(False)
+            return True
+        if self.push_server is not None:
+            return True
+        from push_server import PushServer
+
+        push_server = PushServer(
+            self.thumbnail_store, port=self.config_manager.get_push_server_port()
+        )
+        try:
+            push_server.start()
+        except OSError as error:
+            QtWidgets.QMessageBox.warning(
+                self, "Message", f"Cannot start the overlay server: {error}"
+            )
+            self.config_manager.set_push_server_enabled(False)
+            return False
+        self.push_server = push_server
+        self.config_manager.set_push_server_enabled(True)
+        self.statusBar().showMessage(f"Overlay server at {push_server.url}", 5000)
         key = self.key_map_manager.get_current_key()
-        dialog = EditSwitchInfoDialog(self, key)
-        dialog.exec_()
+        self.ui_manager.publish_display_info(key, self.data_store.resolve(key))
+        return True
+
+    def export_recording(self, columnar=False):
+        from key_recorder import export_columns, export_csv
+
+        session_path = self.key_recorder.session_path
+        if self.key_recorder.active or session_path is None:
+            QtWidgets.QMessageBox.information(
+                self, "Message", "Stop a recording before exporting it."
+            )
+            return
+        default_path = os.path.splitext(session_path)[0]
+        if columnar:
+            output_path = QtWidgets.QFileDialog.getExistingDirectory(
+                self, "Export Columns To", os.path.dirname(session_path)
+            )
+            if output_path:
+                output_path = os.path.join(output_path, os.path.basename(default_path))
+                export_columns(session_path, output_path)
+        else:
+            output_path, _ = QtWidgets.QFileDialog.getSaveFileName(
+                self, "Export CSV", f"{default_path}.csv", "CSV (*.csv)"
+            )
+            if output_path:
+                export_csv(session_path, output_path)
+
+    def set_board_visible(self, visible):
+        if self.board_dock is None:
+            if not visible:
+                return
+            from board_view import BoardView
+
+            self.board_dock = QtWidgets.QDockWidget("Board", self)
+            self.board_dock.setFeatures(
+                QtWidgets.QDockWidget.DockWidgetMovable
+                | QtWidgets.QDockWidget.DockWidgetFloatable
+            )
+            self.board_dock.setWidget(BoardView(self, self.board_dock))
+            self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.board_dock)
+        self.board_dock.setVisible(visible)
+
+    def available_layouts(self):
+        """{配列のID: 定義ファイルのパス}。ベースディレクトリのlayouts/も含める"""
+        return find_layouts(
+            [BUILTIN_LAYOUT_DIR, os.path.join(self.config_manager.base_dir, LAYOUT_DIR)]
+        )
+
+    def _load_layout(self, layout_id):
+        layouts = self.available_layouts()
+        for candidate in (layout_id, DEFAULT_LAYOUT):
+            if candidate in layouts:
+                try:
+                    return load_layout(layouts[candidate])
+                except (OSError, ValueError) as error:
+                    QtWidgets.QMessageBox.warning(
+                        self, "Message", f"Cannot load layout {candidate}: {error}"
+                    )
+        raise FileNotFoundError(f"No keyboard layout found in {BUILTIN_LAYOUT_DIR}")
+
+    def set_layout(self, layout_id):
+        try:
+            keyboard_layout = self._load_layout(layout_id)
+        except FileNotFoundError as error:
+            # 今の配列のまま使い続ける
+            QtWidgets.QMessageBox.warning(self, "Message", str(error))
+            return
+        self.keyboard_layout = keyboard_layout
+        self.config_manager.set_layout(keyboard_layout.layout_id)
+        self.chatter_detector.set_keys(keyboard_layout.key_names())
+        if self.board_dock is not None:
+            self.board_dock.widget().set_layout(keyboard_layout)
+        self._migrate_key_map()
+        self.ui_manager.refresh_key(self.key_map_manager.get_current_key())
+
+    def _migrate_key_map(self):
+        """入力された文字で保存された以前のキーマップを、一度だけキーの位置に移す"""
+        config_manager = self.config_manager
+        if not self.data_store.is_loaded or config_manager.get_key_map_layout():
+            return
+        keyboard_layout = self.keyboard_layout
+        key_map = self.data_store.key_map
+        if not keyboard_layout.needs_migration(key_map):
+            # この配列では移す必要がなくても、別の配列を選んだときには移す必要がある
+            return
+        reply = QtWidgets.QMessageBox.question(
+            self,
+            "Message",
+            "Key mappings are saved by the typed character. "
+            f"Move them to the keys of {keyboard_layout.name}?",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+            QtWidgets.QMessageBox.Yes,
+        )
+        if reply == QtWidgets.QMessageBox.Yes:
+            try:
+                migrated = migrate_key_map(key_map, keyboard_layout)
+            except ValueError as error:
+                # 何も変えずに、次に配列を選んだときにもう一度聞く
+                QtWidgets.QMessageBox.warning(
+                    self, "Message", f"Cannot move the key mappings: {error}"
+                )
+                return
+            self.data_store.replace_key_map(migrated)
+        # 「No」の場合も、以降はキーの名前で保存されたものとして扱う
+        config_manager.set_key_map_layout(keyboard_layout.layout_id)
+
+    def set_chatter_visible(self, visible):
+        if self.chatter_dock is None:
+            if not visible:
+                return
+            from chatter_view import ChatterView
+
+            self.chatter_dock = QtWidgets.QDockWidget("Chatter", self)
+            self.chatter_dock.setFeatures(
+                QtWidgets.QDockWidget.DockWidgetMovable
+                | QtWidgets.QDockWidget.DockWidgetFloatable
+            )
+            self.chatter_dock.setWidget(ChatterView(self, self.chatter_dock))
+            self.addDockWidget(QtCore.Qt.RightDockWidgetArea, self.chatter_dock)
+        self.chatter_dock.setVisible(visible)
+
+    def set_rollover_visible(self, visible):
+        if self.rollover_dock is None:
+            if not visible:
+                return
+            from rollover_view import RolloverView
+
+            self.rollover_dock = QtWidgets.QDockWidget("Rollover Test", self)
+            self.rollover_dock.setFeatures(
+                QtWidgets.QDockWidget.DockWidgetMovable
+                | QtWidgets.QDockWidget.DockWidgetFloatable
+            )
+            self.rollover_dock.setWidget(RolloverView(self, self.rollover_dock))
+            self.addDockWidget(QtCore.Qt.RightDockWidgetArea, self.rollover_dock)
+        self.rollover_dock.setVisible(visible)
+
+    def set_chatter_window(self, window_ms):
+        self.chatter_detector.set_window(window_ms)
+        self.config_manager.set_chatter_window(window_ms)
+
+    def open_switch_edit(self):
+        if not self.data_store.is_loaded:
+            return
+        if self.switch_edit_dialog is None:
+            from edit_switch_info_dialog import EditSwitchInfoDialog
+
+            self.switch_edit_dialog = EditSwitchInfoDialog(self)
+        self.switch_edit_dialog.rebind(self.key_map_manager.get_current_key())
+        self.switch_edit_dialog.exec_()
 
     def open_change_dialog(self):
-        key = self.key_map_manager.get_current_key()
-        dialog = ChangeKeyMapDialog(self, key)
-        dialog.exec_()
+        if not self.data_store.is_loaded:
+            return
+        if self.change_dialog is None:
+            from change_key_map_dialog import ChangeKeyMapDialog
+
+            self.change_dialog = ChangeKeyMapDialog(self)
+        self.change_dialog.rebind(self.key_map_manager.get_current_key())
+        self.change_dialog.exec_()
+
+    def open_filter_dialog(self):
+        if not self.data_store.is_loaded:
+            return
+        if self.filter_dialog is None:
+            from switch_filter_dialog import SwitchFilterDialog
+
+            self.filter_dialog = SwitchFilterDialog(self)
+        self.filter_dialog.rebind(self.key_map_manager.get_current_key())
+        self.filter_dialog.exec_()
+
+    def open_curve_compare(self):
+        if not self.data_store.is_loaded:
+            return
+        if self.curve_compare_dialog is None:
+            from force_curve_view import ForceCurveCompareDialog
+
+            self.curve_compare_dialog = ForceCurveCompareDialog(self)
+        self.curve_compare_dialog.rebind(self.key_map_manager.get_current_key())
+        self.curve_compare_dialog.exec_()
+
+    def _on_data_loaded(self):
+        startup_timer.mark("config_load")
+        # 読み込みの途中でダイアログを出さないよう、反映し終えてから確認する
+        QtCore.QTimer.singleShot(0, self._migrate_key_map)
+        # 最初のキー入力に不要なダイアログのモジュールは、アイドル時に読み込んでおく
+        QtCore.QTimer.singleShot(0, self._prewarm_dialogs)
+
+    def _on_load_failed(self, message):
+        QtWidgets.QMessageBox.warning(
+            self,
+            "Message",
+            f"Cannot load the configuration files in {self.config_manager.base_dir}: "
+            f"{message}\nFix or replace them, then choose the base directory again.",
+        )
+
+    @staticmethod
+    def _prewarm_dialogs():
+        import change_key_map_dialog  # noqa: F401
+        import edit_switch_info_dialog  # noqa: F401
+
+    def prefetch_images(self):
+        image_dir = self.config_manager.get_image_dir()
+        image_paths = set()
+        for switch_info in self.data_store.resolved.values():
+            if switch_info and switch_info.get("image"):
+                image_paths.add(os.path.join(image_dir, switch_info["image"]))
+        self.image_loader.prefetch(image_paths)
+
+    def _prefetch_key(self, key):
+        switch_info = self.data_store.resolve(key)
+        if switch_info and switch_info.get("image"):
+            self.image_loader.request(
+                os.path.join(self.config_manager.get_image_dir(), switch_info["image"])
+            )
+
+    def import_catalog(self):
+        if not self.data_store.is_loaded:
+            return
+        from catalog_import import CatalogImporter
+
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self,
+            "Import Switch Catalog",
+            self.config_manager.get_open_dir(),
+            "Switch Catalogs (*.csv *.jsonl *.ndjson *.json)",
+        )
+        if not file_path:
+            return
+        self.config_manager.set_open_dir(os.path.dirname(file_path))
+        progress = QtWidgets.QProgressDialog(
+            "Importing switches...", "Cancel", 0, 0, self
+        )
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def update_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+            QtWidgets.QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        importer = CatalogImporter(
+            self.data_store.switch_info,
+            self.config_manager.get_image_dir(),
+            curve_dir=self.config_manager.get_curve_dir(),
+        )
+        try:
+            result = importer.run(file_path, update_progress)
+        except (OSError, ValueError, csv.Error) as error:
+            progress.close()
+            QtWidgets.QMessageBox.warning(self, "Message", f"Import failed: {error}")
+            return
+        progress.close()
+        if result.cancelled:
+            return
+        if result.records:
+            self.switch_info_manager.update_switch_infos(result.records)
+        message = result.summary()
+        problems = result.errors + result.warnings
+        if problems:
+            message += "\n\n" + "\n".join(
+                f"Line {line_num}: {text}" for line_num, text in problems[:20]
+            )
+        QtWidgets.QMessageBox.information(self, "Message", message)
+
+    def optimize_images(self):
+        """既存の画像を取り込み直して縮小・重複排除し、使われていない画像を削除する"""
+        if not self.data_store.is_loaded:
+            return
+        reply = QtWidgets.QMessageBox.question(
+            self,
+            "Message",
+            "Shrink and deduplicate all switch images, and delete images that no "
+            "switch uses?",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+            QtWidgets.QMessageBox.No,
+        )
+        if reply != QtWidgets.QMessageBox.Yes:
+            return
+        image_dir = self.config_manager.get_image_dir()
+        image_names = {
+            switch_info.get("image")
+            for switch_info in self.data_store.switch_info.values()
+        }
+        image_names = [
+            name
+            for name in image_names
+            if name
+            and not is_stored_name(name)
+            and os.path.isfile(os.path.join(image_dir, name))
+        ]
+        progress = QtWidgets.QProgressDialog(
+            "Optimizing images...", "Cancel", 0, 0, self
+        )
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def update_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+            QtWidgets.QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        self.image_loader.wait_for_done()
+        renamed = self.image_store.ingest_all(image_names, update_progress)
+        cancelled = progress.wasCanceled()
+        progress.close()
+        changed = {}
+        for switch_name, switch_info in self.data_store.switch_info.items():
+            new_name = renamed.get(switch_info.get("image"))
+            if new_name:
+                record = switch_info.copy()
+                record["image"] = new_name
+                changed[switch_name] = record
+        if changed:
+            self.switch_info_manager.update_switch_infos(changed)
+        # 元の画像を消す前に、新しい名前を参照するスイッチ情報を書き込んでおく
+        self.config_manager.flush()
+        removed = []
+        if not cancelled and not self.config_manager.writer.has_pending():
+            removed = self.image_store.collect_garbage(
+                self.data_store.switch_info, stored_only=False
+            )
+        self.image_cache.clear()
+        self.prefetch_images()
+        QtWidgets.QMessageBox.information(
+            self,
+            "Message",
+            f"Optimized {len(renamed)} images and removed {len(removed)} unused files.",
+        )
+
+    def rebuild_thumbnails(self):
+        progress = QtWidgets.QProgressDialog(
+            "Rebuilding thumbnails...", "Cancel", 0, 0, self
+        )
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def update_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+            QtWidgets.QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        self.image_loader.wait_for_done()
+        self.thumbnail_store.rebuild(update_progress)
+        progress.close()
+        self.image_cache.clear()
+        self.prefetch_images()
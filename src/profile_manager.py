@@ -0,0 +1,164 @@
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt5 import QtCore
+
+from config_watcher import config_signatures
+from constants import IMAGE_DIR, PROFILE_CACHE_BUDGET, PROFILE_CACHE_SIZE
+from storage import read_base_dir
+
+RECORD_COST = 1024  # bytes (1スイッチあたりの概算)
+
+
+def _cost(key_map, switch_info):
+    return (len(switch_info) + len(key_map) // 8 + 1) * RECORD_COST
+
+
+class _Profile:
+    __slots__ = ("key_map", "switch_info", "config_signatures", "cost")
+
+    def __init__(self, key_map, switch_info, config_signatures):
+        self.key_map = key_map
+        self.switch_info = switch_info
+        self.config_signatures = config_signatures
+        self.cost = _cost(key_map, switch_info)
+
+
+class ProfileManager(QtCore.QObject):
+    """ベースディレクトリをプロファイルとして切り替える
+
+    最近使ったプロファイルの内容はメモリに残し、次に使いそうなプロファイルを先読みしておく。
+    画像はImageCacheがパスごとに持つので、切り替えても破棄されない。
+    """
+
+    _preloaded = QtCore.pyqtSignal(str, object, object, object)
+
+    def __init__(self, parent, budget=PROFILE_CACHE_BUDGET, size=PROFILE_CACHE_SIZE):
+        super().__init__(parent)
+        self.parent = parent
+        self.config_manager = parent.config_manager
+        self.data_store = parent.data_store
+        self.budget = budget
+        self.size = size
+        self.cache = OrderedDict()
+        self.cache_cost = 0
+        self._preloading = set()
+        self._preloaded.connect(self._on_preloaded)
+        self.data_store.loaded.connect(self._preload_next)
+
+    def profiles(self):
+        profiles = self.config_manager.settings.value("profiles", [])
+        if isinstance(profiles, str):
+            # QSettingsは要素が1つのリストを文字列で返すことがある
+            profiles = [profiles]
+        profiles = list(profiles or [])
+        if self.config_manager.base_dir not in profiles:
+            profiles.insert(0, self.config_manager.base_dir)
+        return profiles
+
+    def current(self):
+        return self.config_manager.base_dir
+
+    def add_profile(self, base_dir):
+        profiles = self.profiles()
+        if base_dir not in profiles:
+            profiles.append(base_dir)
+            self._save_profiles(profiles)
+
+    def remove_profile(self, base_dir):
+        profiles = self.profiles()
+        if base_dir == self.current() or base_dir not in profiles:
+            return
+        profiles.remove(base_dir)
+        self._save_profiles(profiles)
+        self._evict(base_dir)
+
+    def next_profile(self):
+        profiles = self.profiles()
+        if len(profiles) < 2:
+            return None
+        return profiles[(profiles.index(self.current()) + 1) % len(profiles)]
+
+    def activate_next(self):
+        base_dir = self.next_profile()
+        if base_dir is not None:
+            self.activate(base_dir)
+
+    def activate(self, base_dir):
+        self.add_profile(base_dir)
+        if base_dir == self.current():
+            return
+        self.config_manager.flush()
+        if self.data_store.is_loaded:
+            self._store(
+                self.current(),
+                _Profile(
+                    self.data_store.key_map,
+                    self.data_store.switch_info,
+                    self.parent.config_watcher.config_signatures,
+                ),
+            )
+        self.config_manager.set_base_dir(base_dir)
+        profile = self._evict(base_dir)
+        if profile is None:
+            self.data_store.load_async()
+        else:
+            # ファイルが変わっていればConfigWatcherが読み込み直す
+            self.parent.config_watcher.expect(profile.config_signatures)
+            self.data_store.set_data(profile.key_map, profile.switch_info)
+
+    def _save_profiles(self, profiles):
+        self.config_manager.settings.setValue("profiles", profiles)
+
+    def _store(self, base_dir, profile):
+        self._evict(base_dir)
+        self.cache[base_dir] = profile
+        self.cache_cost += profile.cost
+        while self.cache and (
+            len(self.cache) > self.size or self.cache_cost > self.budget
+        ):
+            _, evicted = self.cache.popitem(last=False)
+            self.cache_cost -= evicted.cost
+
+    def _evict(self, base_dir):
+        profile = self.cache.pop(base_dir, None)
+        if profile is not None:
+            self.cache_cost -= profile.cost
+        return profile
+
+    def _preload_next(self):
+        base_dir = self.next_profile()
+        if (
+            base_dir is None
+            or base_dir in self.cache
+            or base_dir in self._preloading
+            or not os.path.isdir(base_dir)
+        ):
+            return
+        self._preloading.add(base_dir)
+
+        def read():
+            # 読み込み前の状態を記録し、読み込み中に変わった場合は切り替え時に読み直させる
+            signatures = config_signatures(base_dir)
+            try:
+                key_map, switch_info = read_base_dir(base_dir)
+            except (OSError, ValueError):
+                key_map = switch_info = None
+            self._preloaded.emit(base_dir, key_map, switch_info, signatures)
+
+        threading.Thread(target=read, daemon=True).start()
+
+    def _on_preloaded(self, base_dir, key_map, switch_info, signatures):
+        self._preloading.discard(base_dir)
+        if switch_info is None or base_dir == self.current():
+            return
+        self._store(base_dir, _Profile(key_map, switch_info, signatures))
+        # 割り当てられている画像も先にデコードしておく
+        image_dir = os.path.join(base_dir, IMAGE_DIR)
+        image_paths = set()
+        for switch_name in key_map.values():
+            image = (switch_info.get(switch_name) or {}).get("image")
+            if image:
+                image_paths.add(os.path.join(image_dir, image))
+        self.parent.image_loader.prefetch(image_paths)
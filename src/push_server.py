@@ -0,0 +1,447 @@
+"""表示中のキーとスイッチ情報を配信するHTTP / WebSocketサーバー (Qtに依存しない)
+
+GUIとは別のスレッドでasyncioのイベントループを動かす。GUIスレッドからは
+call_soon_threadsafeでメッセージを渡すだけなので、クライアントが遅くてもキー入力の処理は待たない。
+
+- GET /        オーバーレイのHTML
+- GET /state   現在の状態 (JSON)
+- GET /ws      WebSocket。接続時に状態を送り、以降は変更分だけを送る
+- GET /thumbs/<画像名>  サムネイル (ETagで再検証できる)
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import threading
+from collections import deque
+from urllib.parse import unquote, urlsplit
+
+from constants import (
+    DEFAULT_PUSH_SERVER_PORT,
+    OVERLAY_FILE,
+    PUSH_QUEUE_SIZE,
+    PUSH_SERVER_HOST,
+)
+from image_store import is_stored_name
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B65"
+REQUEST_TIMEOUT = 5.0  # 秒
+SEND_TIMEOUT = 5.0  # 秒。これ以上送信が詰まったクライアントは切断する
+MAX_CLIENT_FRAME = 4096  # クライアントからは制御用の小さなフレームしか受け取らない
+ALLOWED_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+STATUS_TEXT = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+}
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+def encode_message(message):
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def websocket_frame(payload, opcode=OP_TEXT):
+    """サーバーからクライアントへのフレーム (マスクしない)"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def websocket_accept(key):
+    return base64.b64encode(hashlib.sha1(key.encode() + WEBSOCKET_GUID).digest())
+
+
+def record_delta(old, new):
+    """(変わったフィールド, 消えたフィールド) を返す"""
+    changed = {field: value for field, value in new.items() if old.get(field) != value}
+    removed = [field for field in old if field not in new]
+    return changed, removed
+
+
+def _thumbnail_url(image):
+    return f"/thumbs/{image}" if image else ""
+
+
+class _Client:
+    """WebSocketのクライアント。送信待ちのフレームは上限までしか溜めない"""
+
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.wakeup = asyncio.Event()
+        # 溢れた分を捨てたので、次は状態をまとめて送り直す
+        self.resync = True
+
+    def push(self, frame):
+        if len(self.queue) >= self.queue_size:
+            self.queue.clear()
+            self.resync = True
+        else:
+            self.queue.append(frame)
+        self.wakeup.set()
+
+
+class PushServer:
+    """localhostだけで待ち受け、オーバーレイや2台目の画面に表示内容を配信する"""
+
+    def __init__(
+        self,
+        thumbnail_store,
+        host=PUSH_SERVER_HOST,
+        port=DEFAULT_PUSH_SERVER_PORT,
+        queue_size=PUSH_QUEUE_SIZE,
+    ):
+        self.thumbnail_store = thumbnail_store
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.key = None
+        self.label = ""
+        self.record = {}
+        self.held = {}
+        self.clients = set()
+        self._handlers = set()
+        self._overlay = b""
+        self._loop = None
+        self._stopped = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """待ち受けを始めるまで待つ。ポートが使えなければOSError"""
+        if self.running:
+            return
+        try:
+            with open(OVERLAY_FILE, "rb") as file:
+                self._overlay = file.read()
+        except OSError:
+            self._overlay = b""
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(self._serve(),), name="PushServer", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._error
+
+    def stop(self):
+        if not self.running:
+            return
+        self._call(self._stopped.set)
+        self._thread.join(SEND_TIMEOUT)
+        self._thread = None
+        self._loop = None
+
+    def publish_key(self, key, label, down):
+        """キーの押下・解放 (GUIスレッドから呼ぶ)"""
+        self._call(self._on_key, key, label, down)
+
+    def publish_record(self, key, label, record):
+        """表示しているキーとスイッチ情報 (GUIスレッドから呼ぶ)。recordはdictかNone"""
+        self._call(self._on_record, key, label, record)
+
+    def release_all(self):
+        """押下中のキーを全て離したことにする (GUIスレッドから呼ぶ)"""
+        self._call(self._on_release_all)
+
+    def _call(self, callback, *args):
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # 停止中でループが閉じている
+            pass
+
+    # 以下はイベントループのスレッドで動く
+
+    async def _serve(self):
+        self._stopped = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._handle, self.host, self.port)
+        except OSError as error:
+            self._error = error
+            self._ready.set()
+            return
+        # ポート0を指定した場合は割り当てられたポート
+        self.port = server.sockets[0].getsockname()[1]
+        self._loop = asyncio.get_running_loop()
+        self._ready.set()
+        async with server:
+            await self._stopped.wait()
+            self._loop = None
+            server.close()
+            # 接続中のクライアントを切り、処理中のリクエストが終わるのを待つ
+            for client in list(self.clients):
+                client.writer.close()
+            if self._handlers:
+                await asyncio.wait(self._handlers, timeout=SEND_TIMEOUT)
+
+    def _state(self):
+        return {
+            "type": "state",
+            "key": self.key,
+            "label": self.label,
+            "record": self.record,
+            "held": sorted(self.held.values()),
+        }
+
+    def _broadcast(self, message):
+        if not self.clients:
+            return
+        frame = websocket_frame(encode_message(message))
+        for client in self.clients:
+            client.push(frame)
+
+    def _on_key(self, key, label, down):
+        if down:
+            self.held[key] = label
+        else:
+            self.held.pop(key, None)
+        self._broadcast({"type": "key", "key": key, "label": label, "down": down})
+
+    def _on_release_all(self):
+        if not self.held:
+            return
+        self.held.clear()
+        # 押下状態を丸ごと置き換えるよう、状態全体を送る
+        self._broadcast(self._state())
+
+    def _on_record(self, key, label, record):
+        record = dict(record) if record else {}
+        if record:
+            record["image_url"] = _thumbnail_url(record.get("image"))
+        changed, removed = record_delta(self.record, record)
+        if key == self.key and not changed and not removed:
+            return
+        self.key, self.label, self.record = key, label, record
+        message = {"type": "switch", "key": key, "label": label}
+        if changed:
+            message["set"] = changed
+        if removed:
+            message["unset"] = removed
+        self._broadcast(message)
+
+    async def _handle(self, reader, writer):
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            head = await asyncio.wait_for(
+                reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT
+            )
+            method, target, headers = self._parse_request(head)
+            if headers.get("host", "").rsplit(":", 1)[0] not in ALLOWED_HOSTS:
+                # DNSリバインディングで他のサイトから読まれないようにする
+                await self._respond(writer, 403)
+            elif not self._origin_allowed(headers.get("origin")):
+                # 他のサイトのページからWebSocketやfetchで読まれないようにする
+                await self._respond(writer, 403)
+            elif method != "GET":
+                await self._respond(writer, 405)
+            else:
+                path = urlsplit(target).path
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(reader, writer, headers)
+                    return
+                await self._route(writer, path, headers)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            await self._respond(writer, 400)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            self._handlers.discard(handler)
+
+    def _origin_allowed(self, origin):
+        """Originがない (ブラウザ以外) か、このサーバー自身のページなら許可する"""
+        if origin is None:
+            return True
+        return origin.lower() in {
+            f"http://{host}:{self.port}" for host in ALLOWED_HOSTS
+        }
+
+    @staticmethod
+    def _parse_request(head):
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            name, separator, value = line.partition(":")
+            if separator:
+                headers[name.strip().lower()] = value.strip()
+        return method, target, headers
+
+    async def _respond(self, writer, status, body=b"", headers=None):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+        headers = dict(headers or {})
+        headers.setdefault("Content-Length", str(len(body)))
+        headers["Connection"] = "close"
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            await asyncio.wait_for(writer.drain(), SEND_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+    async def _route(self, writer, path, headers):
+        if path in ("/", "/overlay.html") and self._overlay:
+            await self._respond(
+                writer,
+                200,
+                self._overlay,
+                {
+                    "Content-Type": "text/html; charset=utf-8",
+                    "Cache-Control": "no-cache",
+                },
+            )
+        elif path == "/state":
+            await self._respond(
+                writer,
+                200,
+                encode_message(self._state()),
+                {"Content-Type": "application/json", "Cache-Control": "no-store"},
+            )
+        elif path.startswith("/thumbs/"):
+            await self._thumbnail(writer, unquote(path[len("/thumbs/") :]), headers)
+        else:
+            await self._respond(writer, 404)
+
+    async def _thumbnail(self, writer, image, headers):
+        if not image or image != os.path.basename(image) or image.startswith("."):
+            await self._respond(writer, 404)
+            return
+        loop = asyncio.get_running_loop()
+        image_path = os.path.join(self.thumbnail_store.image_dir, image)
+        # サムネイルの作成は重いのでループのスレッドでは行わない
+        thumb_path = await loop.run_in_executor(
+            None, self.thumbnail_store.get_thumbnail_path, image_path
+        )
+        if thumb_path is None:
+            await self._respond(writer, 404)
+            return
+        # サムネイルのファイル名には元の画像の内容のハッシュが入っている
+        etag = f'"{os.path.basename(thumb_path)}"'
+        cache_headers = {
+            "ETag": etag,
+            # 取り込んだ画像は内容で名前が決まるので変わらない
+            "Cache-Control": "public, max-age=31536000, immutable"
+            if is_stored_name(image)
+            else "no-cache",
+        }
+        if headers.get("if-none-match") == etag:
+            await self._respond(writer, 304, headers=cache_headers)
+            return
+        try:
+            body = await loop.run_in_executor(None, _read_file, thumb_path)
+        except OSError:
+            await self._respond(writer, 404)
+            return
+        content_type = "image/png" if thumb_path.endswith(".png") else "image/jpeg"
+        await self._respond(
+            writer, 200, body, {"Content-Type": content_type, **cache_headers}
+        )
+
+    async def _websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            await self._respond(writer, 400)
+            return
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + websocket_accept(key) + b"\r\n\r\n"
+        )
+        client = _Client(writer, self.queue_size)
+        client.wakeup.set()
+        self.clients.add(client)
+        sender = asyncio.ensure_future(self._send_loop(client))
+        try:
+            await self._receive_loop(reader, client)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+        # closeの応答など、残っているフレームを送ってから切断する
+        while client.queue:
+            writer.write(client.queue.popleft())
+        try:
+            await asyncio.wait_for(writer.drain(), SEND_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+    async def _send_loop(self, client):
+        writer = client.writer
+        try:
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+                if client.resync:
+                    client.resync = False
+                    client.queue.clear()
+                    writer.write(websocket_frame(encode_message(self._state())))
+                while client.queue:
+                    writer.write(client.queue.popleft())
+                await asyncio.wait_for(writer.drain(), SEND_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            writer.close()
+
+    async def _receive_loop(self, reader, client):
+        """クライアントからのフレームは、ping・closeだけに応じる"""
+        while True:
+            first, second = await reader.readexactly(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                (length,) = struct.unpack("!H", await reader.readexactly(2))
+            elif length == 127:
+                (length,) = struct.unpack("!Q", await reader.readexactly(8))
+            if not second & 0x80 or length > MAX_CLIENT_FRAME:
+                # マスクされていないか大きすぎるフレームはプロトコル違反として切る
+                client.push(websocket_frame(struct.pack("!H", 1002), OP_CLOSE))
+                return
+            mask = await reader.readexactly(4)
+            payload = bytes(
+                byte ^ mask[index % 4]
+                for index, byte in enumerate(await reader.readexactly(length))
+            )
+            if opcode == OP_CLOSE:
+                client.push(websocket_frame(payload[:2], OP_CLOSE))
+                return
+            if opcode == OP_PING:
+                client.push(websocket_frame(payload, OP_PONG))
+
+
+def _read_file(file_path):
+    with open(file_path, "rb") as file:
+        return file.read()
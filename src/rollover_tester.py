@@ -0,0 +1,248 @@
+"""同時押しできるキー数と、コードの取りこぼし・ゴーストを調べる (Qtに依存しない)"""
+
+# Qtのキーコードを0〜511の番号に詰める。0x20〜0xffは文字キー、0x01000000台は特殊キー
+KEY_SLOTS = 512
+SPECIAL_KEY_BASE = 0x01000000
+
+SPECIAL_KEYS = {
+    "esc": 0x01000000,
+    "tab": 0x01000001,
+    "backspace": 0x01000003,
+    "enter": 0x01000004,
+    "shift": 0x01000020,
+    "ctrl": 0x01000021,
+    "meta": 0x01000022,
+    "alt": 0x01000023,
+    "capslock": 0x01000024,
+    "space": 0x20,
+}
+SPECIAL_NAMES = {code: name.title() for name, code in SPECIAL_KEYS.items()}
+SPECIAL_KEYS["control"] = SPECIAL_KEYS["ctrl"]
+SPECIAL_KEYS["return"] = SPECIAL_KEYS["enter"]
+SPECIAL_KEYS["option"] = SPECIAL_KEYS["alt"]
+
+DEFAULT_CHORDS = """\
+# 1行に1つのコード。キーは空白で区切る
+a s
+a s d
+a s d f
+q w e r t
+z x c v b
+a s d f j k l ;
+shift a s d
+ctrl shift z x
+"""
+
+PASS = "pass"
+DROPPED = "dropped"
+GHOST = "ghost"
+
+
+def key_slot(qt_key):
+    """Qtのキーコードの番号。扱えないキーは-1"""
+    if 0 < qt_key < 0x100:
+        return qt_key
+    if qt_key & ~0xFF == SPECIAL_KEY_BASE:
+        return 0x100 | (qt_key & 0xFF)
+    return -1
+
+
+def slot_key(slot):
+    """番号からQtのキーコードに戻す"""
+    if slot & 0x100:
+        return SPECIAL_KEY_BASE | (slot & 0xFF)
+    return slot
+
+
+def slot_label(slot):
+    if slot & 0x100:
+        code = SPECIAL_KEY_BASE | (slot & 0xFF)
+        return SPECIAL_NAMES.get(code, f"0x{code:x}")
+    return SPECIAL_NAMES.get(slot) or chr(slot).lower()
+
+
+def parse_key(token):
+    code = SPECIAL_KEYS.get(token.lower())
+    if code is None and len(token) == 1:
+        code = ord(token.upper())
+    if code is None or key_slot(code) < 0:
+        raise ValueError(f"unknown key {token!r}")
+    return key_slot(code)
+
+
+def parse_chords(text):
+    """コードの一覧を読み、キーの番号のタプルのリストを返す"""
+    chords = []
+    for line_num, line in enumerate(text.splitlines(), start=1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            slots = tuple(dict.fromkeys(parse_key(token) for token in line.split()))
+        except ValueError as error:
+            raise ValueError(f"line {line_num}: {error}") from None
+        chords.append(slots)
+    return chords
+
+
+class _Bits:
+    """固定長のビット集合"""
+
+    __slots__ = ("data",)
+
+    def __init__(self):
+        self.data = bytearray(KEY_SLOTS // 8)
+
+    def __contains__(self, slot):
+        return self.data[slot >> 3] & (1 << (slot & 7))
+
+    def add(self, slot):
+        self.data[slot >> 3] |= 1 << (slot & 7)
+
+    def discard(self, slot):
+        self.data[slot >> 3] &= ~(1 << (slot & 7)) & 0xFF
+
+    def clear(self):
+        self.data[:] = bytes(len(self.data))
+
+    def slots(self):
+        return [
+            (index << 3) | bit
+            for index, byte in enumerate(self.data)
+            if byte
+            for bit in range(8)
+            if byte & (1 << bit)
+        ]
+
+
+class ChordResult:
+    def __init__(self, chord, status, missing, extra):
+        self.chord = chord
+        self.status = status
+        self.missing = missing
+        self.extra = extra
+
+    @property
+    def keys(self):
+        return (*self.chord, *self.extra)
+
+
+class RolloverTester:
+    """押されているキーをビット集合で追跡し、コードの一覧を順番に試す
+
+    1回の試行は最初のキーを押してから全てのキーを離すまで。その間に押されたキーと
+    コードを比べ、コードのキーが届かなければ取りこぼし、コードにないキーが届けばゴーストとする。
+    キーはQtのキーコードで区別するため、Shiftで記号が変わるキーはコードに含めない。
+    イベントごとの処理はビット演算とカウンタの更新だけで、オブジェクトを作らない。
+    """
+
+    def __init__(self, chords=None):
+        self.held = _Bits()
+        self.seen = _Bits()
+        self.extra = _Bits()
+        self.chord_bits = _Bits()
+        self.enabled = False
+        self.chords = []
+        # 結果が変わるたびに増える (表示側の再描画の判定用)
+        self.revision = 0
+        self.set_chords(chords if chords is not None else parse_chords(DEFAULT_CHORDS))
+
+    def set_chords(self, chords):
+        self.chords = chords
+        self.restart()
+
+    def restart(self):
+        self.results = []
+        self.max_held = 0
+        self.chord_index = 0
+        self._start_chord()
+
+    @property
+    def current_chord(self):
+        if self.chord_index < len(self.chords):
+            return self.chords[self.chord_index]
+        return None
+
+    @property
+    def finished(self):
+        return self.chord_index >= len(self.chords)
+
+    def _start_chord(self):
+        self.held.clear()
+        self.held_count = 0
+        self._begin_attempt()
+        self.chord_bits.clear()
+        for slot in self.current_chord or ():
+            self.chord_bits.add(slot)
+        self.revision += 1
+
+    def _begin_attempt(self):
+        self.seen.clear()
+        self.extra.clear()
+        self.extra_count = 0
+        self.attempt_held = 0
+        self.chord_held = 0
+        self.chord_complete = False
+
+    def press(self, qt_key):
+        slot = key_slot(qt_key)
+        if slot < 0 or slot in self.held:
+            return
+        self.held.add(slot)
+        self.held_count += 1
+        if self.held_count > self.attempt_held:
+            self.attempt_held = self.held_count
+            if self.held_count > self.max_held:
+                self.max_held = self.held_count
+        self.seen.add(slot)
+        if slot in self.chord_bits:
+            self.chord_held += 1
+            if self.chord_held == len(self.current_chord):
+                self.chord_complete = True
+        elif slot not in self.extra:
+            self.extra.add(slot)
+            self.extra_count += 1
+        self.revision += 1
+
+    def release(self, qt_key):
+        slot = key_slot(qt_key)
+        if slot < 0 or slot not in self.held:
+            return
+        self.held.discard(slot)
+        self.held_count -= 1
+        if slot in self.chord_bits:
+            self.chord_held -= 1
+        if not self.held_count:
+            self._finish_attempt()
+        self.revision += 1
+
+    def release_all(self):
+        """解放のイベントが届かなかった場合は、その試行を捨てる"""
+        self.held.clear()
+        self.held_count = 0
+        self._begin_attempt()
+        self.revision += 1
+
+    def _finish_attempt(self):
+        chord = self.current_chord
+        if chord is None:
+            return
+        missing = tuple(slot for slot in chord if slot not in self.seen)
+        extra = tuple(self.extra.slots()) if self.extra_count else ()
+        # 1つだけ叩いた場合や、全てのキーが届いたが同時に押されていなかった場合はやり直す
+        single_tap = self.attempt_held < 2 <= len(chord)
+        if single_tap or (not missing and not extra and not self.chord_complete):
+            self._begin_attempt()
+            return
+        if extra:
+            status = GHOST
+        elif missing:
+            status = DROPPED
+        else:
+            status = PASS
+        self.results.append(ChordResult(chord, status, missing, extra))
+        self.chord_index += 1
+        self._start_chord()
+
+    def held_slots(self):
+        return self.held.slots()
@@ -0,0 +1,149 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtWidgets import QMessageBox
+
+from rollover_tester import PASS, parse_chords, slot_key, slot_label
+
+REFRESH_INTERVAL_MS = 100
+
+
+class RolloverView(QtWidgets.QWidget):
+    """同時押しのテストの進み具合と結果を表示する
+
+    表示している間だけテストを有効にする。キー入力のたびには描画せず、一定間隔で
+    テストの状態が変わっていれば表示を更新する。
+    """
+
+    def __init__(self, parent_window, parent=None):
+        super().__init__(parent)
+        self.window = parent_window
+        self.tester = parent_window.rollover_tester
+        self.shown_revision = None
+        self.shown_results = 0
+        self._setup_ui()
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def _setup_ui(self):
+        layout = QtWidgets.QVBoxLayout(self)
+        self.chord_label = QtWidgets.QLabel()
+        font = self.chord_label.font()
+        font.setPointSize(font.pointSize() + 6)
+        font.setBold(True)
+        self.chord_label.setFont(font)
+        layout.addWidget(self.chord_label)
+        self.held_label = QtWidgets.QLabel()
+        layout.addWidget(self.held_label)
+
+        self.result_list = QtWidgets.QListWidget()
+        self.result_list.setFocusPolicy(QtCore.Qt.NoFocus)
+        self.result_list.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        layout.addWidget(self.result_list)
+        self.switch_label = QtWidgets.QLabel()
+        self.switch_label.setWordWrap(True)
+        layout.addWidget(self.switch_label)
+
+        buttons = QtWidgets.QHBoxLayout()
+        load_button = QtWidgets.QPushButton("Load Chords...")
+        load_button.clicked.connect(self._load_chords)
+        restart_button = QtWidgets.QPushButton("Restart")
+        restart_button.clicked.connect(self._restart)
+        for button in (load_button, restart_button):
+            # テスト中のキー入力をボタンが受け取らないようにする
+            button.setFocusPolicy(QtCore.Qt.NoFocus)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+    def showEvent(self, event):
+        self.tester.enabled = True
+        self.timer.start()
+        self.refresh()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.tester.enabled = False
+        self.tester.release_all()
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def _restart(self):
+        self.tester.restart()
+        self.refresh()
+
+    def _load_chords(self):
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Load Chords", "", "Text Files (*.txt);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            with open(file_path, encoding="utf-8") as file:
+                chords = parse_chords(file.read())
+        except (OSError, UnicodeDecodeError, ValueError) as error:
+            QMessageBox.warning(self, "Error", f"Cannot load chords: {error}")
+            return
+        self.tester.set_chords(chords)
+        self.refresh()
+
+    @staticmethod
+    def _keys_text(slots):
+        return " ".join(slot_label(slot) for slot in slots)
+
+    def refresh(self):
+        tester = self.tester
+        if self.shown_revision == tester.revision:
+            return
+        self.shown_revision = tester.revision
+        if tester.finished:
+            passed = sum(result.status == PASS for result in tester.results)
+            self.chord_label.setText(f"Done: {passed}/{len(tester.results)} passed")
+        else:
+            self.chord_label.setText(
+                f"{tester.chord_index + 1}/{len(tester.chords)}: "
+                f"{self._keys_text(tester.current_chord)}"
+            )
+        self.held_label.setText(
+            f"Held: {tester.held_count}  Max simultaneous: {tester.max_held}"
+        )
+
+        if len(tester.results) < self.shown_results:
+            self.result_list.clear()
+            self.shown_results = 0
+        if len(tester.results) == self.shown_results:
+            return
+        key_map = self.window.data_store.key_map
+        keyboard_layout = self.window.keyboard_layout
+        for result in tester.results[self.shown_results :]:
+            text = f"{self._keys_text(result.chord)}: {result.status}"
+            if result.missing:
+                text += f" (missing {self._keys_text(result.missing)})"
+            if result.extra:
+                text += f" (unexpected {self._keys_text(result.extra)})"
+            item = QtWidgets.QListWidgetItem(text)
+            if result.status != PASS:
+                item.setForeground(QtGui.QColor(QtCore.Qt.red))
+            self.result_list.addItem(item)
+        self.result_list.scrollToBottom()
+        self.shown_results = len(tester.results)
+
+        # 失敗したコードに含まれるキーに割り当てられたスイッチ
+        switches = {}
+        for result in tester.results:
+            if result.status == PASS:
+                continue
+            for slot in result.keys:
+                key = keyboard_layout.resolve(0, slot_key(slot))
+                switch_name = key_map.get(key)
+                if switch_name:
+                    switches.setdefault(switch_name, set()).add(
+                        keyboard_layout.label(key)
+                    )
+        self.switch_label.setText(
+            "Switches involved: "
+            + ", ".join(
+                f"{name} ({' '.join(sorted(keys))})"
+                for name, keys in sorted(switches.items())
+            )
+            if switches
+            else ""
+        )
@@ -0,0 +1,37 @@
+"""起動時間の計測 (環境変数 KEYTESTER_STARTUP_TIMING=1 で有効)"""
+
+import os
+import sys
+import time
+
+STARTED_AT = time.perf_counter()
+ENABLED = bool(os.environ.get("KEYTESTER_STARTUP_TIMING"))
+STAGES = ("import", "ui_build", "first_paint", "config_load")
+
+
+class StartupTimer:
+    def __init__(self, stages=STAGES):
+        self.stages = stages
+        self.marks = {}
+
+    def mark(self, name):
+        if name in self.marks:
+            return
+        self.marks[name] = time.perf_counter() - STARTED_AT
+        if all(stage in self.marks for stage in self.stages):
+            self.report()
+
+    def report(self):
+        if not ENABLED:
+            return
+        previous = 0.0
+        lines = ["Startup timing:"]
+        for name, elapsed in sorted(self.marks.items(), key=lambda item: item[1]):
+            lines.append(
+                f"  {name:<12} {elapsed * 1000:8.1f} ms (+{(elapsed - previous) * 1000:.1f})"
+            )
+            previous = elapsed
+        print("\n".join(lines), file=sys.stderr)
+
+
+startup_timer = StartupTimer()
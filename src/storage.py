@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+
+from constants import DATABASE_FILE, KEY_MAP_FILE, SWITCH_FILE
+from switch_record import SwitchRecord, to_dicts, to_records
+from write_behind import write_json_atomic
+
+
+class JsonStorage:
+    """key_map.json と switch_info.json に保存する (デフォルト)"""
+
+    def __init__(self, key_map_file, switch_file, writer):
+        self.key_map_file = key_map_file
+        self.switch_file = switch_file
+        self.writer = writer
+
+    def load_key_map(self):
+        return self._load(self.key_map_file)
+
+    def load_switch_info(self):
+        return to_records(self._load(self.switch_file))
+
+    def read_all(self):
+        return self.load_key_map(), self.load_switch_info()
+
+    def save_key_map(self, key_map):
+        self.writer.schedule(self.key_map_file, key_map)
+
+    def save_switch_info(self, switch_info):
+        self.writer.schedule(self.switch_file, switch_info)
+
+    def update_key(self, key_map, key):
+        self.save_key_map(key_map)
+
+    def delete_key(self, key_map, key):
+        self.save_key_map(key_map)
+
+    def update_keys(self, key_map, keys):
+        self.save_key_map(key_map)
+
+    def update_switch(self, switch_info, switch_name):
+        self.save_switch_info(switch_info)
+
+    def update_switches(self, switch_info, switch_names):
+        self.save_switch_info(switch_info)
+
+    def delete_switch(self, switch_info, switch_name):
+        self.save_switch_info(switch_info)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.flush()
+
+    @staticmethod
+    def _load(file_path):
+        if os.path.exists(file_path):
+            with open(file_path, "r") as file:
+                return json.load(file)
+        return {}
+
+
+class SqliteStorage:
+    """大きなスイッチカタログ向けに、1スイッチ1行でSQLiteに保存する"""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.connection = sqlite3.connect(db_file)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS switches"
+                " (name TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS key_map"
+                " (key TEXT PRIMARY KEY, switch_name TEXT NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS key_map_switch_name"
+                " ON key_map (switch_name)"
+            )
+
+    def load_key_map(self):
+        return self._read_key_map(self.connection)
+
+    def load_switch_info(self):
+        return self._read_switch_info(self.connection)
+
+    def read_all(self):
+        # sqlite3の接続はスレッド間で共有できないため、読み込み用に別の接続を開く
+        connection = sqlite3.connect(self.db_file)
+        try:
+            return self._read_key_map(connection), self._read_switch_info(connection)
+        finally:
+            connection.close()
+
+    def get_switch(self, switch_name):
+        row = self.connection.execute(
+            "SELECT data FROM switches WHERE name = ?", (switch_name,)
+        ).fetchone()
+        return SwitchRecord.from_dict(json.loads(row[0])) if row else None
+
+    def get_keys_for_switch(self, switch_name):
+        return [
+            key
+            for (key,) in self.connection.execute(
+                "SELECT key FROM key_map WHERE switch_name = ?", (switch_name,)
+            )
+        ]
+
+    def save_key_map(self, key_map):
+        with self.connection:
+            self.connection.execute("DELETE FROM key_map")
+            self.connection.executemany(
+                "INSERT INTO key_map (key, switch_name) VALUES (?, ?)",
+                key_map.items(),
+            )
+
+    def save_switch_info(self, switch_info):
+        with self.connection:
+            self.connection.execute("DELETE FROM switches")
+            self.connection.executemany(
+                "INSERT INTO switches (name, data) VALUES (?, ?)",
+                ((name, self._dumps(info)) for name, info in switch_info.items()),
+            )
+
+    def update_key(self, key_map, key):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO key_map (key, switch_name) VALUES (?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET switch_name = excluded.switch_name",
+                (key, key_map[key]),
+            )
+
+    def update_keys(self, key_map, keys):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO key_map (key, switch_name) VALUES (?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET switch_name = excluded.switch_name",
+                ((key, key_map[key]) for key in keys),
+            )
+
+    def delete_key(self, key_map, key):
+        with self.connection:
+            self.connection.execute("DELETE FROM key_map WHERE key = ?", (key,))
+
+    def update_switch(self, switch_info, switch_name):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO switches (name, data) VALUES (?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET data = excluded.data",
+                (switch_name, self._dumps(switch_info[switch_name])),
+            )
+
+    def update_switches(self, switch_info, switch_names):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO switches (name, data) VALUES (?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET data = excluded.data",
+                ((name, self._dumps(switch_info[name])) for name in switch_names),
+            )
+
+    def delete_switch(self, switch_info, switch_name):
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM switches WHERE name = ?", (switch_name,)
+            )
+
+    def import_data(self, key_map, switch_info):
+        """既存のJSONレイアウトから一括で移行する"""
+        self.save_switch_info(switch_info)
+        self.save_key_map(key_map)
+
+    def export_json(self, key_map_file, switch_file):
+        write_json_atomic(switch_file, to_dicts(self.load_switch_info()))
+        write_json_atomic(key_map_file, self.load_key_map())
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def _read_key_map(connection):
+        return dict(connection.execute("SELECT key, switch_name FROM key_map"))
+
+    @staticmethod
+    def _read_switch_info(connection):
+        return {
+            name: SwitchRecord.from_dict(json.loads(data))
+            for name, data in connection.execute("SELECT name, data FROM switches")
+        }
+
+    @staticmethod
+    def _dumps(info):
+        if isinstance(info, SwitchRecord):
+            info = info.to_dict()
+        return json.dumps(info, separators=(",", ":"))
+
+
+def read_base_dir(base_dir):
+    """使用中でないベースディレクトリを読み込む (ワーカースレッドから呼べる)"""
+    database_file = os.path.join(base_dir, DATABASE_FILE)
+    if os.path.exists(database_file):
+        connection = sqlite3.connect(database_file)
+        try:
+            return (
+                SqliteStorage._read_key_map(connection),
+                SqliteStorage._read_switch_info(connection),
+            )
+        except sqlite3.DatabaseError:
+            return {}, {}
+        finally:
+            connection.close()
+    storage = JsonStorage(
+        os.path.join(base_dir, KEY_MAP_FILE), os.path.join(base_dir, SWITCH_FILE), None
+    )
+    return storage.read_all()
@@ -0,0 +1,178 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtWidgets import QMessageBox
+
+from constants import NUMERIC_FIELDS
+from switch_query import CATEGORY_FIELDS
+
+ANY = "Any"
+SORT_BY_NAME = "Name"
+FILTER_DELAY_MS = 100
+
+
+def _title(field):
+    return field.replace("_", " ").title()
+
+
+class SwitchFilterDialog(QtWidgets.QDialog):
+    """スイッチ情報を種類や数値の範囲で絞り込み、結果をまとめてキーに割り当てる"""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.switch_query = self.parent.switch_query
+        self.results = []
+        self.category_combos = {}
+        self.range_edits = {}
+        self.filter_timer = QtCore.QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self._apply_filter)
+        self._setup_ui()
+
+    def rebind(self, key):
+        """表示のたびに選択肢を最新のカタログから作り直す"""
+        index = self.switch_query.index
+        for field, combo in self.category_combos.items():
+            current = combo.currentText()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItem(ANY)
+            combo.addItems([value for value in index.values_of(field) if value])
+            combo.setCurrentText(current if combo.findText(current) >= 0 else ANY)
+            combo.blockSignals(False)
+        for field, (low_edit, high_edit) in self.range_edits.items():
+            bounds = index.bounds_of(field)
+            if bounds:
+                low_edit.setPlaceholderText(f"{bounds[0]:g}")
+                high_edit.setPlaceholderText(f"{bounds[1]:g}")
+        layout_key = self.parent.keyboard_layout.by_key.get(key)
+        self.keys_edit.setText((layout_key.text or key) if layout_key else "")
+        self._apply_filter()
+
+    def _setup_ui(self):
+        self.setWindowTitle("Filter Switches")
+        self.setGeometry(600, 300, 400, 600)
+        layout = QtWidgets.QVBoxLayout(self)
+
+        form = QtWidgets.QFormLayout()
+        for field in CATEGORY_FIELDS:
+            combo = QtWidgets.QComboBox()
+            combo.addItem(ANY)
+            combo.currentIndexChanged.connect(self.filter_timer.start)
+            self.category_combos[field] = combo
+            form.addRow(f"{_title(field)}: ", combo)
+
+        validator = QtGui.QDoubleValidator(0.0, 1e9, 3, self)
+        for field, unit in NUMERIC_FIELDS.items():
+            low_edit = QtWidgets.QLineEdit()
+            high_edit = QtWidgets.QLineEdit()
+            range_layout = QtWidgets.QHBoxLayout()
+            for edit in (low_edit, high_edit):
+                edit.setValidator(validator)
+                edit.textChanged.connect(self.filter_timer.start)
+            range_layout.addWidget(low_edit)
+            range_layout.addWidget(QtWidgets.QLabel("-"))
+            range_layout.addWidget(high_edit)
+            if unit:
+                range_layout.addWidget(QtWidgets.QLabel(unit))
+            self.range_edits[field] = (low_edit, high_edit)
+            form.addRow(f"{_title(field)}: ", range_layout)
+
+        self.sort_combo = QtWidgets.QComboBox()
+        self.sort_combo.addItem(SORT_BY_NAME)
+        self.sort_combo.addItems([_title(field) for field in NUMERIC_FIELDS])
+        self.sort_combo.currentIndexChanged.connect(self.filter_timer.start)
+        self.descending_check = QtWidgets.QCheckBox("Descending")
+        self.descending_check.toggled.connect(self.filter_timer.start)
+        sort_layout = QtWidgets.QHBoxLayout()
+        sort_layout.addWidget(self.sort_combo)
+        sort_layout.addWidget(self.descending_check)
+        form.addRow("Sort By: ", sort_layout)
+        layout.addLayout(form)
+
+        self.count_label = QtWidgets.QLabel("")
+        layout.addWidget(self.count_label)
+
+        self.result_model = QtCore.QStringListModel(self)
+        self.result_view = QtWidgets.QListView()
+        self.result_view.setUniformItemSizes(True)
+        self.result_view.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.result_view.setModel(self.result_model)
+        layout.addWidget(self.result_view)
+
+        # 絞り込み結果を上から順に、入力したキーへ割り当てる
+        self.keys_edit = QtWidgets.QLineEdit()
+        self.keys_edit.setPlaceholderText(
+            "Keys to assign in order, e.g. qwerty or f1 f2 f3"
+        )
+        layout.addWidget(self.keys_edit)
+
+        assign_button = QtWidgets.QPushButton("Assign to Keys", self)
+        assign_button.clicked.connect(self._assign)
+        layout.addWidget(assign_button)
+
+        close_button = QtWidgets.QPushButton("Close", self)
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+
+    def _conditions(self):
+        equals = {
+            field: combo.currentText()
+            for field, combo in self.category_combos.items()
+            if combo.currentText() != ANY
+        }
+        ranges = {}
+        for field, (low_edit, high_edit) in self.range_edits.items():
+            low = self._to_float(low_edit.text())
+            high = self._to_float(high_edit.text())
+            if low is not None or high is not None:
+                ranges[field] = (low, high)
+        return equals, ranges
+
+    def _apply_filter(self):
+        self.filter_timer.stop()
+        equals, ranges = self._conditions()
+        sort_index = self.sort_combo.currentIndex()
+        sort_by = list(NUMERIC_FIELDS)[sort_index - 1] if sort_index > 0 else None
+        self.results = self.switch_query.search(
+            equals, ranges, sort_by, self.descending_check.isChecked()
+        )
+        self.result_model.setStringList(self.results)
+        self.count_label.setText(f"{len(self.results)} switches")
+
+    def _assign(self):
+        if self.filter_timer.isActive():
+            self._apply_filter()
+        keyboard_layout = self.parent.keyboard_layout
+        keys = []
+        # 空白で区切った名前 (f1、spaceなど) か、入力される文字で指定する
+        for token in self.keys_edit.text().split():
+            if len(token) > 1 and token.lower() in keyboard_layout.by_key:
+                candidates = [token.lower()]
+            else:
+                candidates = [
+                    keyboard_layout.key_for_text(text.lower()) for text in token
+                ]
+            for key in candidates:
+                if key is not None and key not in keys:
+                    keys.append(key)
+        assignments = dict(zip(keys, self.results))
+        if not assignments:
+            QMessageBox.information(self, "Message", "Nothing to assign.")
+            return
+        reply = QMessageBox.question(
+            self,
+            "Message",
+            f"Assign {len(assignments)} switches to keys {''.join(assignments)}?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No,
+        )
+        if reply == QMessageBox.Yes:
+            self.parent.key_map_manager.update_key_maps(assignments)
+
+    @staticmethod
+    def _to_float(text):
+        try:
+            return float(text)
+        except ValueError:
+            return None
@@ -1,31 +1,61 @@
-import os
-import shutil
-
-
 class SwitchInfoManager:
     def __init__(self, parent):
         self.parent = parent
-        self.switch_info = self.parent.config_manager.load_switch_file()
+        self.data_store = self.parent.data_store
+        self.writer = self.parent.config_manager.writer
+        self._unreferenced_files = []
+        self.writer.saved.connect(self._release_unreferenced_files)
+
+    @property
+    def switch_info(self):
+        return self.data_store.switch_info
 
     def get_switch_info(self):
-        return self.switch_info
+        return self.data_store.switch_info
 
     def set_switch_info(self, switch_info):
-        self.switch_info = switch_info
+        self.data_store.set_switch_info(switch_info)
 
     def update_switch_info(self, switch_name, switch_info):
-        self.switch_info[switch_name] = switch_info
-        self.parent.config_manager.save_switch_file(self.switch_info)
+        old_files = self._files_of(switch_name)
+        self.data_store.update_switch(switch_name, switch_info)
+        self._release_files(old_files)
+
+    def update_switch_fields(self, switch_name, changes):
+        old_files = self._files_of(switch_name)
+        self.data_store.update_switch_fields(switch_name, changes)
+        self._release_files(old_files)
+
+    def update_switch_infos(self, switch_info):
+        self.data_store.update_switches(switch_info)
 
     def delete_switch_info(self, switch_name):
-        self.switch_info.pop(switch_name, None)
-        self.parent.config_manager.save_switch_file(self.switch_info)
-
-    def save_image(self, file_path):
-        if file_path and os.path.exists(file_path):
-            saved_path = os.path.join(
-                self.parent.config_manager.get_image_dir(), os.path.basename(file_path)
-            )
-            shutil.copy(file_path, saved_path)
-            return saved_path
-        return None
+        old_files = self._files_of(switch_name)
+        self.data_store.delete_switch(switch_name)
+        self._release_files(old_files)
+
+    def rename_switch_info(self, old_name, new_name):
+        self.data_store.rename_switch(old_name, new_name)
+
+    def _files_of(self, switch_name):
+        switch_info = self.data_store.switch_info.get(switch_name)
+        if not switch_info:
+            return None, None
+        return switch_info.get("image"), switch_info.get("force_curve")
+
+    def _release_files(self, files):
+        # 保存前に落ちても元のファイルが画像を参照できるよう、削除は保存後に行う
+        self._unreferenced_files.append(files)
+        if not self.writer.has_pending():
+            self._release_unreferenced_files()
+
+    def _release_unreferenced_files(self):
+        # 他のスイッチが使っていなければ取り込んだ画像と荷重曲線を削除する
+        released, self._unreferenced_files = self._unreferenced_files, []
+        for image, force_curve in released:
+            if image:
+                self.parent.image_store.release(image, self.data_store.switch_info)
+            if force_curve:
+                self.parent.curve_store.release(
+                    force_curve, self.data_store.switch_info
+                )
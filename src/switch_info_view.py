@@ -0,0 +1,209 @@
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import Qt
+
+LAYOUT_CACHE_SIZE = 64
+ROW_SPACING = 6
+LINK_PREFIX = "Link: "
+LINK_TEXT = "url"
+
+
+class _TextRow:
+    """事前にレイアウト済みの1行分のテキスト"""
+
+    __slots__ = ("static_text", "font", "width", "height")
+
+    def __init__(self, text, font):
+        self.static_text = QtGui.QStaticText(text)
+        self.static_text.setTextFormat(Qt.PlainText)
+        self.static_text.prepare(QtGui.QTransform(), font)
+        self.font = font
+        size = self.static_text.size()
+        self.width = size.width()
+        self.height = QtGui.QFontMetricsF(font).height()
+
+
+class _LinkRow:
+    __slots__ = ("url", "prefix", "anchor", "width", "height")
+
+    def __init__(self, url, font, link_font):
+        self.url = url
+        self.prefix = _TextRow(LINK_PREFIX, font)
+        self.anchor = _TextRow(LINK_TEXT, link_font)
+        self.width = self.prefix.width + self.anchor.width
+        self.height = max(self.prefix.height, self.anchor.height)
+
+
+class _ImageRow:
+    __slots__ = ("pixmap", "width", "height")
+
+    def __init__(self, pixmap):
+        self.pixmap = pixmap
+        self.width = pixmap.width()
+        self.height = pixmap.height()
+
+
+class SwitchInfoView(QtWidgets.QWidget):
+    """キー、スイッチ情報、リンク、画像を1つのpaintEventで描画する"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMouseTracking(True)
+        self.setSizePolicy(
+            QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Expanding
+        )
+        self.font_normal = QtGui.QFont(self.font())
+        self.font_title = QtGui.QFont(self.font())
+        self.font_title.setBold(True)
+        self.font_title.setPixelSize(20)
+        self.font_link = QtGui.QFont(self.font())
+        self.font_link.setUnderline(True)
+
+        self.key_row = None
+        self.message_row = None
+        self.record_rows = ()
+        self.link_row = None
+        self.pixmap = None
+        self.image_row = None
+        self.link_rect = QtCore.QRectF()
+        self._key_text = None
+        self._message = None
+        self._record = None
+        self._layouts = OrderedDict()
+        self._key_rows = {}
+        self._size_hint = QtCore.QSize()
+
+    def set_key(self, text):
+        if text == self._key_text:
+            return
+        self._key_text = text
+        self.key_row = None
+        if text:
+            self.key_row = self._key_rows.get(text)
+            if self.key_row is None:
+                self.key_row = self._key_rows[text] = _TextRow(text, self.font_normal)
+        self.update()
+
+    def set_message(self, message):
+        if message == self._message:
+            return
+        self._message = message
+        self.message_row = _TextRow(message, self.font_normal) if message else None
+        self._refresh()
+
+    def set_record(self, lines, link):
+        """linesの先頭はスイッチ名として太字で描画する"""
+        record = (lines, link)
+        if record == self._record:
+            return
+        self._record = record
+        layout = self._layouts.get(record)
+        if layout is None:
+            layout = self._build_layout(lines, link)
+            self._layouts[record] = layout
+            if len(self._layouts) > LAYOUT_CACHE_SIZE:
+                self._layouts.popitem(last=False)
+        else:
+            self._layouts.move_to_end(record)
+        self.record_rows, self.link_row = layout
+        self._refresh()
+
+    def set_pixmap(self, pixmap):
+        if pixmap is self.pixmap:
+            return
+        self.pixmap = pixmap
+        self.image_row = _ImageRow(pixmap) if pixmap is not None else None
+        self._refresh()
+
+    def sizeHint(self):
+        rows = self._rows()
+        width = max((row.width for row in rows), default=0)
+        height = sum(row.height for row in rows) + ROW_SPACING * max(len(rows) - 1, 0)
+        return QtCore.QSize(int(width) + 1, int(height) + 1)
+
+    def minimumSizeHint(self):
+        return self.sizeHint()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        rows = self._rows()
+        if not rows:
+            return
+        natural_height = sum(row.height for row in rows)
+        natural_height += ROW_SPACING * (len(rows) - 1)
+        extra = max(0.0, self.height() - natural_height) / len(rows)
+        width = self.width()
+        self.link_rect = QtCore.QRectF()
+
+        y = 0.0
+        for row in rows:
+            slot_height = row.height + extra
+            top = y + (slot_height - row.height) / 2
+            left = (width - row.width) / 2
+            if isinstance(row, _ImageRow):
+                painter.drawPixmap(QtCore.QPointF(left, top), row.pixmap)
+            elif isinstance(row, _LinkRow):
+                self._draw_text(painter, row.prefix, left, top)
+                anchor_left = left + row.prefix.width
+                painter.setPen(self.palette().color(QtGui.QPalette.Link))
+                self._draw_text(painter, row.anchor, anchor_left, top)
+                painter.setPen(self.palette().color(QtGui.QPalette.WindowText))
+                self.link_rect = QtCore.QRectF(
+                    anchor_left, top, row.anchor.width, row.anchor.height
+                )
+            else:
+                self._draw_text(painter, row, left, top)
+            y += slot_height + ROW_SPACING
+
+    def mouseMoveEvent(self, event):
+        if self.link_rect.contains(QtCore.QPointF(event.pos())):
+            self.setCursor(Qt.PointingHandCursor)
+        else:
+            self.unsetCursor()
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if (
+            event.button() == Qt.LeftButton
+            and self.link_row is not None
+            and self.link_rect.contains(QtCore.QPointF(event.pos()))
+        ):
+            QtGui.QDesktopServices.openUrl(QtCore.QUrl(self.link_row.url))
+        super().mouseReleaseEvent(event)
+
+    def _refresh(self):
+        # 必要な大きさが変わったときだけレイアウトを更新する
+        size_hint = self.sizeHint()
+        if size_hint != self._size_hint:
+            self._size_hint = size_hint
+            self.updateGeometry()
+        self.update()
+
+    def _rows(self):
+        rows = []
+        if self.key_row:
+            rows.append(self.key_row)
+        if self.message_row:
+            rows.append(self.message_row)
+        if self.image_row:
+            rows.append(self.image_row)
+        rows.extend(self.record_rows)
+        if self.link_row:
+            rows.append(self.link_row)
+        return rows
+
+    def _build_layout(self, lines, link):
+        rows = tuple(
+            _TextRow(line, self.font_title if index == 0 else self.font_normal)
+            for index, line in enumerate(lines)
+        )
+        link_row = None
+        if link is not None:
+            link_row = _LinkRow(link, self.font_normal, self.font_link)
+        return rows, link_row
+
+    @staticmethod
+    def _draw_text(painter, row, left, top):
+        painter.setFont(row.font)
+        painter.drawStaticText(QtCore.QPointF(left, top), row.static_text)
@@ -0,0 +1,174 @@
+from bisect import bisect_left, insort
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt
+
+
+def _sort_key(name):
+    return name.casefold(), name
+
+
+def _trigrams(text):
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class SwitchNameIndex:
+    """スイッチ名の前方一致・部分一致検索用の索引 (ソート済み配列 + trigram)"""
+
+    def __init__(self, names=()):
+        self.sorted_keys = sorted(_sort_key(name) for name in names)
+        self.trigrams = {}
+        for _, name in self.sorted_keys:
+            self._add_trigrams(name)
+
+    def __len__(self):
+        return len(self.sorted_keys)
+
+    def __contains__(self, name):
+        return self.position(name) is not None
+
+    def names(self):
+        return [name for _, name in self.sorted_keys]
+
+    def position(self, name):
+        key = _sort_key(name)
+        index = bisect_left(self.sorted_keys, key)
+        if index < len(self.sorted_keys) and self.sorted_keys[index] == key:
+            return index
+        return None
+
+    def add(self, name):
+        if name in self:
+            return None
+        key = _sort_key(name)
+        insort(self.sorted_keys, key)
+        self._add_trigrams(name)
+        return bisect_left(self.sorted_keys, key)
+
+    def remove(self, name):
+        index = self.position(name)
+        if index is None:
+            return None
+        del self.sorted_keys[index]
+        folded = name.casefold()
+        for trigram in _trigrams(folded):
+            names = self.trigrams.get(trigram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self.trigrams[trigram]
+        return index
+
+    def search(self, text):
+        """前方一致を先に、続けて部分一致の名前をソート順で返す"""
+        query = text.casefold()
+        if not query:
+            return self.names()
+        start = bisect_left(self.sorted_keys, (query, ""))
+        prefix = []
+        for folded, name in self.sorted_keys[start:]:
+            if not folded.startswith(query):
+                break
+            prefix.append(name)
+
+        if len(query) >= 3:
+            candidates = None
+            # 候補の少ないtrigramから積集合をとる
+            trigrams = sorted(
+                _trigrams(query), key=lambda t: len(self.trigrams.get(t, ()))
+            )
+            for trigram in trigrams:
+                names = self.trigrams.get(trigram, set())
+                candidates = set(names) if candidates is None else candidates & names
+                if not candidates:
+                    break
+            candidates = sorted(candidates or (), key=_sort_key)
+        else:
+            candidates = (name for _, name in self.sorted_keys)
+        prefix_set = set(prefix)
+        substring = [
+            name
+            for name in candidates
+            if name not in prefix_set and query in name.casefold()
+        ]
+        return prefix + substring
+
+    def _add_trigrams(self, name):
+        for trigram in _trigrams(name.casefold()):
+            self.trigrams.setdefault(trigram, set()).add(name)
+
+
+class SwitchListModel(QtCore.QAbstractListModel):
+    """DataStoreのスイッチ名を表示するモデル。ダイアログ間で共有する"""
+
+    def __init__(self, data_store, parent=None):
+        super().__init__(parent)
+        self.data_store = data_store
+        self.index = SwitchNameIndex()
+        self.filter_text = ""
+        self.names = []
+        data_store.reset.connect(self._rebuild)
+        data_store.switch_changed.connect(self._on_switch_changed)
+        data_store.switch_removed.connect(self._on_switch_removed)
+        self._rebuild()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.EditRole) and index.isValid():
+            return self.names[index.row()]
+        return None
+
+    def name_at(self, row):
+        if 0 <= row < len(self.names):
+            return self.names[row]
+        return None
+
+    def row_of(self, name):
+        if self.filter_text:
+            try:
+                return self.names.index(name)
+            except ValueError:
+                return -1
+        row = self.index.position(name) if name is not None else None
+        return -1 if row is None else row
+
+    def set_filter(self, text):
+        if text == self.filter_text:
+            return
+        self.beginResetModel()
+        self.filter_text = text
+        self.names = self.index.search(text)
+        self.endResetModel()
+
+    def _rebuild(self):
+        self.beginResetModel()
+        self.index = SwitchNameIndex(self.data_store.switch_info)
+        self.names = self.index.search(self.filter_text)
+        self.endResetModel()
+
+    def _on_switch_changed(self, name):
+        if name in self.index:
+            return
+        row = self.index.add(name)
+        if self.filter_text:
+            if self.filter_text.casefold() not in name.casefold():
+                return
+            # 絞り込み中は並び順が変わるため作り直す
+            self.beginResetModel()
+            self.names = self.index.search(self.filter_text)
+            self.endResetModel()
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.names.insert(row, name)
+        self.endInsertRows()
+
+    def _on_switch_removed(self, name):
+        row = self.row_of(name)
+        self.index.remove(name)
+        if row < 0:
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self.names[row]
+        self.endRemoveRows()
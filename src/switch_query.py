@@ -0,0 +1,232 @@
+import math
+from bisect import bisect_left, insort
+
+from constants import NUMERIC_FIELDS
+
+# 完全一致で絞り込むフィールド (大文字小文字は区別しない)
+CATEGORY_FIELDS = (
+    "switch_type",
+    "top_housing",
+    "bottom_housing",
+    "stem",
+    "pin",
+    "spring",
+    "factory_lubed",
+)
+_NUMERIC_POSITIONS = {field: position for position, field in enumerate(NUMERIC_FIELDS)}
+
+
+def _category_value(text):
+    return text.strip().casefold() if isinstance(text, str) else ""
+
+
+class SwitchSpecIndex:
+    """スイッチ情報の検索用索引
+
+    数値フィールドは (値, 名前) のソート済み配列、分類フィールドは値→名前集合の転置索引で持ち、
+    条件ごとの候補集合を小さい順に積集合をとって絞り込む。
+    """
+
+    def __init__(self, switch_info=None):
+        self.numeric = {field: [] for field in NUMERIC_FIELDS}
+        self.categories = {field: {} for field in CATEGORY_FIELDS}
+        self.labels = {field: {} for field in CATEGORY_FIELDS}
+        self.names = set()
+        # レコードはその場で書き換えられるため、削除用に索引へ入れた値を覚えておく
+        self.indexed = {}
+        if switch_info:
+            self._build(switch_info)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, record):
+        if name in self.names:
+            self.remove(name)
+        numeric = tuple(record.value(field) for field in NUMERIC_FIELDS)
+        categories = tuple(record.get(field, "") for field in CATEGORY_FIELDS)
+        for field, value in zip(NUMERIC_FIELDS, numeric):
+            if value is not None:
+                insort(self.numeric[field], (value, name))
+        for field, text in zip(CATEGORY_FIELDS, categories):
+            self._add_category(field, text, name)
+        self.indexed[name] = (numeric, categories)
+        self.names.add(name)
+
+    def remove(self, name):
+        indexed = self.indexed.pop(name, None)
+        if indexed is None:
+            return
+        self.names.discard(name)
+        numeric, categories = indexed
+        for field, value in zip(NUMERIC_FIELDS, numeric):
+            if value is None:
+                continue
+            entries = self.numeric[field]
+            index = bisect_left(entries, (value, name))
+            if index < len(entries) and entries[index] == (value, name):
+                del entries[index]
+        for field, text in zip(CATEGORY_FIELDS, categories):
+            value = _category_value(text)
+            names = self.categories[field].get(value)
+            if names is None:
+                continue
+            names.discard(name)
+            if not names:
+                del self.categories[field][value]
+                del self.labels[field][value]
+
+    def values_of(self, field):
+        """分類フィールドに登録されている値を表示用の文字列で返す"""
+        return sorted(self.labels[field].values(), key=str.casefold)
+
+    def bounds_of(self, field):
+        entries = self.numeric[field]
+        if not entries:
+            return None
+        return entries[0][0], entries[-1][0]
+
+    def count_range(self, field, low=None, high=None):
+        start, stop = self._range_slice(field, low, high)
+        return stop - start
+
+    def query(self, equals=None, ranges=None):
+        """条件に一致するスイッチ名の集合を返す
+
+        equals: {フィールド: 値 または 値のリスト}、ranges: {フィールド: (下限, 上限)}。
+        下限・上限はNoneで無制限。条件がなければ全てのスイッチを返す。
+        """
+        candidates = []
+        for field, wanted in (equals or {}).items():
+            if isinstance(wanted, str):
+                wanted = (wanted,)
+            index = self.categories[field]
+            sets = [index.get(_category_value(value), ()) for value in wanted]
+            candidates.append((sum(len(names) for names in sets), "equals", sets))
+        for field, (low, high) in (ranges or {}).items():
+            if low is None and high is None:
+                continue
+            start, stop = self._range_slice(field, low, high)
+            candidates.append((stop - start, "range", (field, low, high, start, stop)))
+        if not candidates:
+            return set(self.names)
+
+        # 小さい候補から積集合をとり、空になった時点で打ち切る
+        candidates.sort(key=lambda candidate: candidate[0])
+        result = None
+        for size, kind, data in candidates:
+            if size == 0:
+                return set()
+            if kind == "equals":
+                names = set().union(*data)
+            else:
+                field, low, high, start, stop = data
+                if result is not None and len(result) < size:
+                    # 絞り込み済みの候補が少なければ、範囲を展開せずに値で確かめる
+                    result = {
+                        name
+                        for name in result
+                        if self._in_range(name, field, low, high)
+                    }
+                    if not result:
+                        return result
+                    continue
+                names = {name for _, name in self.numeric[field][start:stop]}
+            result = names if result is None else result & names
+            if not result:
+                return result
+        return result
+
+    def sort(self, names, field=None, descending=False):
+        """数値フィールドの値で並べ替える。値のないスイッチは最後に名前順で並べる"""
+        if field is None:
+            return sorted(names, key=str.casefold, reverse=descending)
+        position = _NUMERIC_POSITIONS[field]
+        with_value = []
+        without_value = []
+        for name in names:
+            value = self.indexed[name][0][position]
+            if value is None:
+                without_value.append(name)
+            else:
+                with_value.append((value, name.casefold(), name))
+        with_value.sort(reverse=descending)
+        without_value.sort(key=str.casefold)
+        return [name for _, _, name in with_value] + without_value
+
+    def _build(self, switch_info):
+        numeric = {field: [] for field in NUMERIC_FIELDS}
+        for name, record in switch_info.items():
+            values = tuple(record.value(field) for field in NUMERIC_FIELDS)
+            categories = tuple(record.get(field, "") for field in CATEGORY_FIELDS)
+            for field, value in zip(NUMERIC_FIELDS, values):
+                if value is not None:
+                    numeric[field].append((value, name))
+            for field, text in zip(CATEGORY_FIELDS, categories):
+                self._add_category(field, text, name)
+            self.indexed[name] = (values, categories)
+            self.names.add(name)
+        for field, entries in numeric.items():
+            entries.sort()
+            self.numeric[field] = entries
+
+    def _add_category(self, field, text, name):
+        value = _category_value(text)
+        self.categories[field].setdefault(value, set()).add(name)
+        self.labels[field].setdefault(
+            value, text.strip() if isinstance(text, str) else ""
+        )
+
+    def _range_slice(self, field, low, high):
+        # 要素は (値, 名前) なので、(値,) は同じ値のどの要素よりも前に来る。
+        # bisectのkey引数はPython 3.10からなので使わない
+        entries = self.numeric[field]
+        start = 0 if low is None else bisect_left(entries, (low,))
+        stop = (
+            len(entries)
+            if high is None
+            else bisect_left(entries, (math.nextafter(high, math.inf),))
+        )
+        return start, max(start, stop)
+
+    def _in_range(self, name, field, low, high):
+        value = self.indexed[name][0][_NUMERIC_POSITIONS[field]]
+        if value is None:
+            return False
+        return (low is None or low <= value) and (high is None or value <= high)
+
+
+class SwitchQuery:
+    """DataStoreと同期したSwitchSpecIndex。最初の検索時に索引を作る"""
+
+    def __init__(self, data_store):
+        self.data_store = data_store
+        self._index = None
+        data_store.reset.connect(self._invalidate)
+        data_store.switch_changed.connect(self._on_switch_changed)
+        data_store.switch_removed.connect(self._on_switch_removed)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = SwitchSpecIndex(self.data_store.switch_info)
+        return self._index
+
+    def search(self, equals=None, ranges=None, sort_by=None, descending=False):
+        index = self.index
+        return index.sort(index.query(equals, ranges), sort_by, descending)
+
+    def _invalidate(self):
+        self._index = None
+
+    def _on_switch_changed(self, name):
+        if self._index is not None:
+            record = self.data_store.switch_info.get(name)
+            if record is None:
+                self._index.remove(name)
+            else:
+                self._index.add(name, record)
+
+    def _on_switch_removed(self, name):
+        if self._index is not None:
+            self._index.remove(name)
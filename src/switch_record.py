@@ -0,0 +1,178 @@
+import re
+import sys
+
+from constants import FIELDS, NUMERIC_FIELDS
+
+# 正規化後の単位への換算係数
+_UNIT_SCALES = {
+    "mm": {"": 1.0, "mm": 1.0, "cm": 10.0, "in": 25.4},
+    "gf": {
+        "": 1.0,
+        "g": 1.0,
+        "gf": 1.0,
+        "cn": 1.0197,
+        "n": 101.97,
+        "oz": 28.35,
+        "ozf": 28.35,
+    },
+    "": None,
+}
+_NUMBER = re.compile(r"(\d+(?:\.\d+)?|\.\d+)\s*([a-z]*)", re.IGNORECASE)
+# 3桁ごとの区切り ("1,000") と、数字に挟まれた小数点のカンマ ("2,0")
+_THOUSANDS = re.compile(r"(?<![\d.,])[1-9]\d{0,2}(?:,\d{3})+(?![\d,])")
+_DECIMAL_COMMA = re.compile(r"(?<=\d),(?=\d)")
+# 種類が少なく、多くのスイッチで同じ値になるフィールド
+_INTERNED_FIELDS = (
+    "switch_type",
+    "top_housing",
+    "bottom_housing",
+    "stem",
+    "pin",
+    "factory_lubed",
+)
+_VALUE_SLOTS = {field: f"{field}_value" for field in NUMERIC_FIELDS}
+
+
+def parse_spec(text, unit):
+    """文字列 ("45g" や "2.0mm" など) をunitに換算した数値を返す。解釈できなければNone
+
+    >>> parse_spec("2,0mm", "mm"), parse_spec(".5mm", "mm"), parse_spec("1,000g", "gf")
+    (2.0, 0.5, 1000.0)
+    """
+    if isinstance(text, bool):
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    if not isinstance(text, str):
+        return None
+    text = _THOUSANDS.sub(lambda group: group.group().replace(",", ""), text)
+    match = _NUMBER.search(_DECIMAL_COMMA.sub(".", text))
+    if match is None:
+        return None
+    scales = _UNIT_SCALES[unit]
+    if scales is None:
+        return float(match.group(1))
+    scale = scales.get(match.group(2).lower())
+    if scale is None:
+        return None
+    return float(match.group(1)) * scale
+
+
+class SwitchRecord:
+    """1スイッチ分の情報。表示用の元の文字列と、数値フィールドの解釈結果を持つ
+
+    dictと同じようにフィールド名でアクセスでき、to_dictで読み込んだ時と同じ内容に戻せる。
+    """
+
+    __slots__ = tuple(FIELDS) + tuple(_VALUE_SLOTS.values()) + ("extra",)
+
+    def __init__(self, fields=None):
+        self.extra = None
+        for field in _VALUE_SLOTS.values():
+            setattr(self, field, None)
+        if fields:
+            self.update(fields)
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data.copy()
+        return cls(data)
+
+    def to_dict(self):
+        data = {}
+        for field in FIELDS:
+            try:
+                data[field] = getattr(self, field)
+            except AttributeError:
+                pass
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def copy(self):
+        return SwitchRecord(self.to_dict())
+
+    def value(self, field):
+        """数値フィールドを正規化した値で返す (mm, gf, 価格)。未設定・解釈不能ならNone"""
+        return getattr(self, _VALUE_SLOTS[field])
+
+    def sort_key(self, field):
+        value = self.value(field)
+        return (value is None, value or 0.0)
+
+    def __getitem__(self, field):
+        if field in _FIELD_SET:
+            try:
+                return getattr(self, field)
+            except AttributeError:
+                raise KeyError(field) from None
+        if self.extra and field in self.extra:
+            return self.extra[field]
+        raise KeyError(field)
+
+    def __setitem__(self, field, text):
+        if field not in _FIELD_SET:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[field] = text
+            return
+        if field in _INTERNED_FIELDS and isinstance(text, str):
+            text = sys.intern(text)
+        setattr(self, field, text)
+        unit = NUMERIC_FIELDS.get(field)
+        if unit is not None:
+            setattr(self, _VALUE_SLOTS[field], parse_spec(text, unit))
+
+    def __contains__(self, field):
+        try:
+            self[field]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, SwitchRecord):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"SwitchRecord({self.to_dict()!r})"
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.to_dict())
+
+    def items(self):
+        return self.to_dict().items()
+
+    def update(self, fields):
+        for field, text in dict(fields).items():
+            self[field] = text
+
+
+_FIELD_SET = frozenset(FIELDS)
+
+
+def to_records(switch_info):
+    return {
+        name: info if isinstance(info, SwitchRecord) else SwitchRecord(info)
+        for name, info in switch_info.items()
+    }
+
+
+def to_dicts(switch_info):
+    return {name: info.to_dict() for name, info in switch_info.items()}
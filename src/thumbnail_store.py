@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+from constants import (
+    IMAGE_DISPLAY_SIZE,
+    IMAGE_EXTENSIONS,
+    THUMBNAIL_DIR,
+    THUMBNAIL_INDEX_FILE,
+)
+
+# 壊れた画像や、展開すると巨大になる画像でPillowが送出するもの
+THUMBNAIL_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_thumbnail(source_path, thumb_dir, size=IMAGE_DISPLAY_SIZE):
+    """サムネイルを作成し、インデックスのエントリを返す (プロセスプールから呼ばれる)"""
+    stat = os.stat(source_path)
+    content_hash = hash_file(source_path)
+    with Image.open(source_path) as image:
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        extension = "png" if has_alpha else "jpg"
+        thumbnail = f"{content_hash}_{size[0]}x{size[1]}.{extension}"
+        thumb_path = os.path.join(thumb_dir, thumbnail)
+        if not os.path.exists(thumb_path):
+            image.thumbnail(size)
+            if not has_alpha and image.mode != "RGB":
+                image = image.convert("RGB")
+            tmp_path = f"{thumb_path}.{os.getpid()}.tmp"
+            image.save(tmp_path, "PNG" if has_alpha else "JPEG", quality=90)
+            os.replace(tmp_path, thumb_path)
+    return {
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "hash": content_hash,
+        "thumbnail": thumbnail,
+    }
+
+
+class ThumbnailStore:
+    """images/.thumbs/ に表示サイズのサムネイルを保存する"""
+
+    def __init__(self, image_dir, size=IMAGE_DISPLAY_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self.set_image_dir(image_dir)
+
+    def set_image_dir(self, image_dir):
+        with self._lock:
+            self.image_dir = image_dir
+            self.thumb_dir = os.path.join(image_dir, THUMBNAIL_DIR)
+            self.index_file = os.path.join(self.thumb_dir, THUMBNAIL_INDEX_FILE)
+            self.index = None
+            self.dirty = False
+
+    def get_thumbnail_path(self, image_path):
+        """有効なサムネイルのパスを返す。作成できない場合はNone"""
+        if os.path.dirname(image_path) != self.image_dir:
+            # 先読み中の他のプロファイルの画像
+            return None
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        name = os.path.basename(image_path)
+        with self._lock:
+            entry = self._get_index().get(name)
+            thumb_dir = self.thumb_dir
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            thumb_path = os.path.join(thumb_dir, entry["thumbnail"])
+            if os.path.exists(thumb_path):
+                return thumb_path
+
+        try:
+            os.makedirs(thumb_dir, exist_ok=True)
+            entry = build_thumbnail(image_path, thumb_dir, self.size)
+        except THUMBNAIL_ERRORS:
+            return None
+        with self._lock:
+            if thumb_dir == self.thumb_dir:
+                self._get_index()[name] = entry
+                self.dirty = True
+        return os.path.join(thumb_dir, entry["thumbnail"])
+
+    def save_index(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            index = dict(self.index)
+            self.dirty = False
+        self._write_index(index)
+
+    def rebuild(self, progress_callback=None):
+        """全画像のサムネイルを全コアで作り直す"""
+        if not os.path.isdir(self.image_dir):
+            return 0
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        names = [
+            name
+            for name in os.listdir(self.image_dir)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        index = {}
+        cancelled = False
+        with ProcessPoolExecutor() as executor:
+            futures = {
+                executor.submit(
+                    build_thumbnail,
+                    os.path.join(self.image_dir, name),
+                    self.thumb_dir,
+                    self.size,
+                ): name
+                for name in names
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    index[futures[future]] = future.result()
+                except THUMBNAIL_ERRORS:
+                    pass
+                if progress_callback and not progress_callback(done, len(names)):
+                    for pending in futures:
+                        pending.cancel()
+                    cancelled = True
+                    break
+
+        with self._lock:
+            if cancelled:
+                index = {**self._get_index(), **index}
+            self.index = index
+            self.dirty = False
+        if not cancelled:
+            self._remove_orphans({entry["thumbnail"] for entry in index.values()})
+        self._write_index(index)
+        return len(index)
+
+    def _get_index(self):
+        if self.index is None:
+            try:
+                with open(self.index_file, "r") as file:
+                    self.index = json.load(file)
+            except (OSError, ValueError):
+                self.index = {}
+        return self.index
+
+    def _write_index(self, index):
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        tmp_path = f"{self.index_file}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(index, file)
+        os.replace(tmp_path, self.index_file)
+
+    def _remove_orphans(self, thumbnails):
+        for name in os.listdir(self.thumb_dir):
+            if name != THUMBNAIL_INDEX_FILE and name not in thumbnails:
+                try:
+                    os.remove(os.path.join(self.thumb_dir, name))
+                except OSError:
+                    pass
@@ -1,23 +1,38 @@
 import os
 
-from PyQt5 import QtWidgets, QtGui
-from PyQt5.QtCore import Qt
+from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtGui import QKeySequence
 
-from constants import FIELDS
+from constants import FIELDS, FRAME_INTERVAL_MS, IMAGE_DISPLAY_SIZE
+from force_curve_view import ForceCurveWidget
+from switch_info_view import SwitchInfoView
 
 
 class UIManager:
     def __init__(self, parent):
         self.parent = parent
-        self.labels = {}
+        self.view = None
+        self.curve_view = None
         self.edit_button = None
         self.main_layout = None
+        self.pending_image_path = None
+        self.pending_key = None
+        self.rendered_image = None
+        self.rendered_curve = None
+        self.render_timer = QtCore.QTimer(self.parent)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self._render_pending)
+        self.frame_clock = QtCore.QElapsedTimer()
+        self.profile_menu = None
+        self.profile_actions = None
 
     def setup_ui(self):
+        self.parent.image_loader.image_loaded.connect(self._on_image_loaded)
+        self.parent.data_store.key_changed.connect(self._on_key_changed)
+        self.parent.data_store.reset.connect(self._on_data_reset)
         self._setup_menu()
         self._setup_main_layout()
-        self._setup_labels()
+        self._setup_view()
         self._setup_edit_button()
 
     def _setup_menu(self):
@@ -33,29 +48,199 @@ class UIManager:
         )
         setting_menu.addAction(change_base_dir_action)
 
+        rebuild_thumbnails_action = QtWidgets.QAction("Rebuild Thumbnails", self.parent)
+        rebuild_thumbnails_action.triggered.connect(self.parent.rebuild_thumbnails)
+        setting_menu.addAction(rebuild_thumbnails_action)
+
+        optimize_images_action = QtWidgets.QAction("Optimize Images...", self.parent)
+        optimize_images_action.triggered.connect(self.parent.optimize_images)
+        setting_menu.addAction(optimize_images_action)
+
+        ignore_auto_repeat_action = QtWidgets.QAction("Ignore Auto-Repeat", self.parent)
+        ignore_auto_repeat_action.setCheckable(True)
+        ignore_auto_repeat_action.setChecked(
+            self.parent.config_manager.get_ignore_auto_repeat()
+        )
+        ignore_auto_repeat_action.toggled.connect(
+            self.parent.config_manager.set_ignore_auto_repeat
+        )
+        setting_menu.addAction(ignore_auto_repeat_action)
+
+        self.push_server_action = QtWidgets.QAction("Overlay Server", self.parent)
+        self.push_server_action.setCheckable(True)
+        self.push_server_action.setChecked(self.parent.push_server is not None)
+        self.push_server_action.toggled.connect(self._set_push_server)
+        setting_menu.addAction(self.push_server_action)
+
+        setting_menu.addSeparator()
+        migrate_action = QtWidgets.QAction("Migrate to SQLite Storage", self.parent)
+        migrate_action.triggered.connect(self.parent.config_manager.migrate_to_sqlite)
+        setting_menu.addAction(migrate_action)
+
+        export_action = QtWidgets.QAction("Export to JSON", self.parent)
+        export_action.triggered.connect(self.parent.config_manager.export_to_json)
+        setting_menu.addAction(export_action)
+
         switch_menu = menubar.addMenu("Switches")
         edit_switch_info_action = QtWidgets.QAction("Edit Switch Info...", self.parent)
         edit_switch_info_action.setShortcut(QKeySequence("Ctrl+E"))
         edit_switch_info_action.triggered.connect(self.parent.open_switch_edit)
         switch_menu.addAction(edit_switch_info_action)
 
+        filter_switches_action = QtWidgets.QAction("Filter Switches...", self.parent)
+        filter_switches_action.setShortcut(QKeySequence("Ctrl+F"))
+        filter_switches_action.triggered.connect(self.parent.open_filter_dialog)
+        switch_menu.addAction(filter_switches_action)
+
+        compare_curves_action = QtWidgets.QAction(
+            "Compare Force Curves...", self.parent
+        )
+        compare_curves_action.triggered.connect(self.parent.open_curve_compare)
+        switch_menu.addAction(compare_curves_action)
+
+        import_catalog_action = QtWidgets.QAction("Import Catalog...", self.parent)
+        import_catalog_action.triggered.connect(self.parent.import_catalog)
+        switch_menu.addAction(import_catalog_action)
+
+        view_menu = menubar.addMenu("View")
+        board_action = QtWidgets.QAction("Board Overview", self.parent)
+        board_action.setCheckable(True)
+        board_action.setShortcut(QKeySequence("Ctrl+B"))
+        board_action.toggled.connect(self.parent.set_board_visible)
+        view_menu.addAction(board_action)
+
+        chatter_action = QtWidgets.QAction("Chatter Monitor", self.parent)
+        chatter_action.setCheckable(True)
+        chatter_action.setShortcut(QKeySequence("Ctrl+T"))
+        chatter_action.toggled.connect(self.parent.set_chatter_visible)
+        view_menu.addAction(chatter_action)
+
+        rollover_action = QtWidgets.QAction("Rollover Test", self.parent)
+        rollover_action.setCheckable(True)
+        rollover_action.setShortcut(QKeySequence("Ctrl+K"))
+        rollover_action.toggled.connect(self.parent.set_rollover_visible)
+        view_menu.addAction(rollover_action)
+
+        self.layout_menu = view_menu.addMenu("Keyboard Layout")
+        self.layout_menu.aboutToShow.connect(self._populate_layout_menu)
+        self.layout_actions = QtWidgets.QActionGroup(self.parent)
+        self.layout_actions.setExclusive(True)
+        self.layout_actions.triggered.connect(
+            lambda action: self.parent.set_layout(action.data())
+        )
+
+        recorder_menu = menubar.addMenu("Recorder")
+        record_action = QtWidgets.QAction("Record Key Events", self.parent)
+        record_action.setCheckable(True)
+        record_action.setShortcut(QKeySequence("Ctrl+R"))
+        record_action.toggled.connect(self.parent.set_recording)
+        recorder_menu.addAction(record_action)
+
+        export_csv_action = QtWidgets.QAction("Export as CSV...", self.parent)
+        export_csv_action.triggered.connect(
+            lambda: self.parent.export_recording(columnar=False)
+        )
+        recorder_menu.addAction(export_csv_action)
+
+        export_columns_action = QtWidgets.QAction("Export as Columns...", self.parent)
+        export_columns_action.triggered.connect(
+            lambda: self.parent.export_recording(columnar=True)
+        )
+        recorder_menu.addAction(export_columns_action)
+
+        self._setup_profile_menu(menubar)
+
+    def _set_push_server(self, enabled):
+        if not self.parent.set_push_server(enabled):
+            self.push_server_action.blockSignals(True)
+            self.push_server_action.setChecked(False)
+            self.push_server_action.blockSignals(False)
+
+    def _setup_profile_menu(self, menubar):
+        self.profile_menu = menubar.addMenu("Profiles")
+        self.profile_menu.aboutToShow.connect(self._populate_profile_menu)
+        self.profile_actions = QtWidgets.QActionGroup(self.parent)
+        self.profile_actions.setExclusive(True)
+        self.profile_actions.triggered.connect(
+            lambda action: self.parent.profile_manager.activate(action.data())
+        )
+        self.profile_menu.addSeparator()
+
+        next_profile_action = QtWidgets.QAction("Next Profile", self.parent)
+        next_profile_action.setShortcut(QKeySequence("Ctrl+P"))
+        next_profile_action.triggered.connect(self.parent.profile_manager.activate_next)
+        self.profile_menu.addAction(next_profile_action)
+
+        add_profile_action = QtWidgets.QAction("Add Profile...", self.parent)
+        add_profile_action.triggered.connect(self.parent.config_manager.change_base_dir)
+        self.profile_menu.addAction(add_profile_action)
+
+        remove_profile_action = QtWidgets.QAction("Remove Profile...", self.parent)
+        remove_profile_action.triggered.connect(self._remove_profile)
+        self.profile_menu.addAction(remove_profile_action)
+
+    def _populate_profile_menu(self):
+        for action in self.profile_actions.actions():
+            self.profile_actions.removeAction(action)
+            self.profile_menu.removeAction(action)
+            action.deleteLater()
+        profile_manager = self.parent.profile_manager
+        separator = self.profile_menu.actions()[0]
+        for base_dir in profile_manager.profiles():
+            action = QtWidgets.QAction(
+                os.path.basename(base_dir.rstrip("/")) or base_dir, self.parent
+            )
+            action.setToolTip(base_dir)
+            action.setData(base_dir)
+            action.setCheckable(True)
+            action.setChecked(base_dir == profile_manager.current())
+            self.profile_actions.addAction(action)
+            self.profile_menu.insertAction(separator, action)
+
+    def _remove_profile(self):
+        profile_manager = self.parent.profile_manager
+        profiles = [
+            base_dir
+            for base_dir in profile_manager.profiles()
+            if base_dir != profile_manager.current()
+        ]
+        if not profiles:
+            QtWidgets.QMessageBox.information(
+                self.parent, "Message", "There is no other profile to remove."
+            )
+            return
+        base_dir, ok = QtWidgets.QInputDialog.getItem(
+            self.parent, "Remove Profile", "Profile:", profiles, 0, False
+        )
+        if ok:
+            profile_manager.remove_profile(base_dir)
+
+    def _populate_layout_menu(self):
+        for action in self.layout_actions.actions():
+            self.layout_actions.removeAction(action)
+            self.layout_menu.removeAction(action)
+            action.deleteLater()
+        current = self.parent.keyboard_layout.layout_id
+        for layout_id in sorted(self.parent.available_layouts()):
+            action = QtWidgets.QAction(layout_id, self.parent)
+            action.setData(layout_id)
+            action.setCheckable(True)
+            action.setChecked(layout_id == current)
+            self.layout_actions.addAction(action)
+            self.layout_menu.addAction(action)
+
     def _setup_main_layout(self):
         central_widget = QtWidgets.QWidget()
         self.parent.setCentralWidget(central_widget)
         self.main_layout = QtWidgets.QVBoxLayout(central_widget)
 
-    def _setup_labels(self):
-        label_configs = {}
-        label_configs["key"] = {"text": ""}
-        label_configs["message"] = {"text": "Press any key."}
-        for field in FIELDS:
-            label_configs[field] = {"text": ""}
-        label_configs["switch_name"] = {"text": "", "bold": True, "font_size": 20}
-        label_configs["link"] = {"text": "", "link": True}
-
-        for key, config in label_configs.items():
-            self.labels[key] = self._create_label(**config)
-            self.main_layout.addWidget(self.labels[key])
+    def _setup_view(self):
+        self.view = SwitchInfoView(self.parent)
+        self.view.set_message("Press any key.")
+        self.main_layout.addWidget(self.view)
+        self.curve_view = ForceCurveWidget(self.parent.curve_store)
+        self.curve_view.hide()
+        self.main_layout.addWidget(self.curve_view)
 
     def _setup_edit_button(self):
         self.edit_button = QtWidgets.QPushButton("Change", self.parent)
@@ -63,74 +248,124 @@ class UIManager:
         self.edit_button.hide()
         self.main_layout.addWidget(self.edit_button)
 
-    def _create_label(
-        self, text, alignment=Qt.AlignCenter, bold=False, font_size=None, link=False
-    ):
-        label = QtWidgets.QLabel(text, self.parent)
-        label.setAlignment(alignment)
-        style = []
-        if bold:
-            style.append("font-weight: bold;")
-        if font_size:
-            style.append(f"font-size: {font_size}px;")
-        if style:
-            label.setStyleSheet("".join(style))
-        if link:
-            label.setOpenExternalLinks(True)
-            label.setTextInteractionFlags(Qt.TextBrowserInteraction)
-            label.setTextFormat(Qt.RichText)
-        return label
+    def request_display_info(self, key):
+        """連続したキー入力をまとめ、1フレームに1回だけ最新のキーを描画する"""
+        self.pending_key = key
+        if self.render_timer.isActive():
+            return
+        elapsed = self.frame_clock.elapsed() if self.frame_clock.isValid() else None
+        if elapsed is None or elapsed >= FRAME_INTERVAL_MS:
+            self._render_pending()
+        else:
+            self.render_timer.start(FRAME_INTERVAL_MS - elapsed)
+
+    def _render_pending(self):
+        key, self.pending_key = self.pending_key, None
+        self.frame_clock.restart()
+        self.update_display_info(key, self.parent.data_store.resolve(key))
+        self.show_edit_button()
 
     def update_display_info(self, key, switch_info):
-        self.labels["key"].setText(f"Key: {key}")
+        self.publish_display_info(key, switch_info)
+        # SwitchInfoView側で変化がなければ再描画しない
+        self.view.set_key(
+            f"Key: {self.parent.keyboard_layout.label(key)}" if key else None
+        )
         if key and switch_info:
-            self._update_label_info(switch_info)
+            self.view.set_message(None)
+            self.view.set_record(*self._record_contents(switch_info))
+            self._update_image(switch_info.get("image"))
+            self._update_curve(switch_info)
         else:
-            self._clear_labels(key)
+            if self.parent.data_store.load_error:
+                message = "Cannot load the configuration files."
+            elif not self.parent.data_store.is_loaded:
+                message = "Loading..."
+            elif key:
+                message = "No information available."
+            else:
+                message = "Press any key."
+            self.view.set_message(message)
+            self.view.set_record((), None)
+            self._update_image(None)
+            self._update_curve(None)
 
-    def _update_label_info(self, switch_info):
-        self._update_label(
-            self.labels["image"], switch_info.get("image"), is_image=True
-        )
+    def publish_display_info(self, key, switch_info):
+        # 変更分だけを送るのはサーバー側で行う
+        if self.parent.push_server is not None:
+            self.parent.push_server.publish_record(
+                key,
+                self.parent.keyboard_layout.label(key) if key else "",
+                switch_info.to_dict() if switch_info else None,
+            )
 
-        exclude_fields = ["image"]
+    @staticmethod
+    def _record_contents(switch_info):
+        exclude_fields = ["image", "force_curve", "link"]
+        lines = []
         for field in filter(lambda f: f not in exclude_fields, FIELDS):
             field_title = (
                 f"{field.replace('_', ' ').title()}: " if field != "switch_name" else ""
             )
-            self._update_label(
-                self.labels[field], f"{field_title}{switch_info.get(field)}"
-            )
-        self._update_label(
-            self.labels["link"], f'Link: <a href="{switch_info.get("link")}">url</a>'
-        )
+            lines.append(f"{field_title}{switch_info.get(field)}")
+        return tuple(lines), str(switch_info.get("link"))
 
-    def _update_label(self, label, content, is_image=False):
-        if is_image:
-            label.clear()
-            image_path = os.path.join(
-                self.parent.config_manager.get_image_dir(), content
-            )
-            if os.path.exists(image_path):
-                pixmap = QtGui.QPixmap(image_path)
-                if not pixmap.isNull():
-                    label.setPixmap(pixmap.scaled(200, 200, Qt.KeepAspectRatio))
-        else:
-            label.setText(content or "")
-
-    def _clear_labels(self, key):
-        for label in self.labels.values():
-            if not label in (self.labels["message"], self.labels["key"]):
-                label.clear()
-        if key:
-            self.labels["message"].setText("No information available.")
-            self.labels["message"].show()
+    def _update_image(self, image):
+        image_path = None
+        if image:
+            image_path = os.path.join(self.parent.config_manager.get_image_dir(), image)
+        rendered_image = (image_path, self.parent.image_cache.generation)
+        if rendered_image == self.rendered_image:
+            return
+        self.rendered_image = rendered_image
+        self.pending_image_path = None
+        if not image_path:
+            self.view.set_pixmap(None)
+            return
+        pixmap = self.parent.image_cache.lookup(image_path, IMAGE_DISPLAY_SIZE)
+        if pixmap is None:
+            # 読み込み完了時に_on_image_loadedで表示する
+            self.pending_image_path = image_path
+            self.parent.image_loader.request(image_path, IMAGE_DISPLAY_SIZE)
+        self.view.set_pixmap(pixmap)
+
+    def _update_curve(self, switch_info):
+        curve_name = switch_info.get("force_curve") if switch_info else None
+        pre_travel = switch_info.value("pre_travel") if curve_name else None
+        # 同じ曲線ならCurveStoreを引き直さない (開けなかった曲線も毎回は開き直さない)
+        rendered_curve = (curve_name, pre_travel, self.parent.curve_store.curve_dir)
+        if rendered_curve == self.rendered_curve:
+            return
+        self.rendered_curve = rendered_curve
+        if curve_name and self.parent.curve_store.open(curve_name) is not None:
+            self.curve_view.set_curve(curve_name, pre_travel=pre_travel)
+            self.curve_view.show()
         else:
-            self.labels["message"].setText("Press any key.")
-            self.labels["key"].hide()
+            self.curve_view.set_curve(None)
+            self.curve_view.hide()
+
+    def refresh_key(self, key):
+        if key == self.parent.key_map_manager.get_current_key():
+            self.update_display_info(key, self.parent.data_store.resolve(key))
+
+    def _on_key_changed(self, key):
+        self.refresh_key(key)
+
+    def _on_data_reset(self):
+        # 読み込み直した後は、前に開けなかった曲線も開き直す
+        self.rendered_curve = None
+        key = self.parent.key_map_manager.get_current_key()
+        # 読み込みに失敗したときはキー入力前でも"Loading..."を置き換える
+        if key or self.parent.data_store.load_error:
+            self.update_display_info(key, self.parent.data_store.resolve(key))
 
-    def hide_label(self, label_name):
-        self.labels[label_name].hide()
+    def _on_image_loaded(self, image_path):
+        if image_path != self.pending_image_path:
+            return
+        self.pending_image_path = None
+        pixmap = self.parent.image_cache.peek(image_path, IMAGE_DISPLAY_SIZE)
+        if pixmap is not None:
+            self.view.set_pixmap(pixmap)
 
     def show_edit_button(self):
         self.edit_button.show()
@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from PyQt5 import QtCore
+
+from constants import WRITE_BEHIND_DELAY_MS
+from switch_record import SwitchRecord
+
+
+def write_json_atomic(file_path, data):
+    """一時ファイルに書き込んでから置き換えるので、途中で落ちても元のファイルは壊れない"""
+    directory = os.path.dirname(file_path) or "."
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file, separators=(",", ":"))
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            mode = os.stat(file_path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _snapshot(data):
+    snapshot = {}
+    for key, value in data.items():
+        if isinstance(value, SwitchRecord):
+            value = value.to_dict()
+        elif isinstance(value, dict):
+            value = dict(value)
+        snapshot[key] = value
+    return snapshot
+
+
+class ImmediateWriter:
+    """WriteBehindWriterと同じインターフェースで、すぐに書き込む (GUIなしで使う場合)"""
+
+    def schedule(self, file_path, data):
+        write_json_atomic(file_path, _snapshot(data))
+
+    def has_pending(self):
+        return False
+
+    def flush(self):
+        pass
+
+
+class WriteBehindWriter(QtCore.QObject):
+    """連続した保存要求をまとめ、アイドル後にワーカースレッドで書き込む
+
+    書き込みに失敗したデータは保留に戻し、次の保存要求かflushで書き直す。
+    保留が全て書き込めたらsavedを送る。
+    """
+
+    failed = QtCore.pyqtSignal(str, str)
+    saved = QtCore.pyqtSignal()
+    _write_done = QtCore.pyqtSignal()
+
+    def __init__(self, delay=WRITE_BEHIND_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self._pending = {}
+        self._in_flight = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        # 自分で書き込んだファイルの (mtime, サイズ)。ファイル監視で自分の変更を無視するため
+        self.written = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._write_pending)
+        self._write_done.connect(self._on_write_done)
+
+    def schedule(self, file_path, data):
+        self._pending[file_path] = data
+        self._timer.start()
+
+    def has_pending(self):
+        """まだ書き込みが終わっていない保存要求があるか"""
+        return bool(self._pending or self._failures) or self._in_flight > 0
+
+    def flush(self):
+        """保留中の書き込みを全て終えるまで待つ"""
+        self._timer.stop()
+        self._write_pending()
+        self._executor.submit(lambda: None).result()
+        # 終了時にも結果を知らせるよう、ワーカーからの通知を待たずに処理する
+        self._on_write_done()
+
+    def _write_pending(self):
+        pending, self._pending = self._pending, {}
+        for file_path, data in pending.items():
+            # シリアライズ中に変更されないよう、GUIスレッドでコピーしておく
+            with self._lock:
+                self._in_flight += 1
+            snapshot = _snapshot(data)
+            future = self._executor.submit(self._write, file_path, snapshot)
+            future.add_done_callback(partial(self._on_future_done, file_path, snapshot))
+
+    def _write(self, file_path, data):
+        write_json_atomic(file_path, data)
+        stat = os.stat(file_path)
+        self.written[file_path] = (stat.st_mtime_ns, stat.st_size)
+
+    def _on_future_done(self, file_path, data, future):
+        error = future.exception()
+        with self._lock:
+            if error is not None:
+                self._failures.append((file_path, data, str(error)))
+            self._in_flight -= 1
+        # 保留に戻すのも知らせるのもGUIスレッドで行う
+        self._write_done.emit()
+
+    def _on_write_done(self):
+        with self._lock:
+            failures, self._failures = self._failures, []
+        for file_path, data, message in failures:
+            # 失敗の後に新しい保存要求が来ていれば、そちらを書く
+            self._pending.setdefault(file_path, data)
+            self.failed.emit(file_path, message)
+        if not self.has_pending():
+            self.saved.emit()
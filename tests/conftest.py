@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PyQt5 import QtWidgets
+
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def settings(tmp_path):
+    """ベースディレクトリをtmp_pathにした、テスト用の設定"""
+    from PyQt5 import QtCore
+
+    settings = QtCore.QSettings(
+        str(tmp_path / "settings.ini"), QtCore.QSettings.IniFormat
+    )
+    settings.setValue("base_dir", str(tmp_path / "KeyTester"))
+    return settings
+
+
+def wait_until(condition, timeout_ms=5000):
+    from PyQt5.QtTest import QTest
+
+    for _ in range(timeout_ms // 10):
+        if condition():
+            return True
+        QTest.qWait(10)
+    return condition()
@@ -0,0 +1,23 @@
+from catalog_import import CatalogImporter, build_column_map
+
+
+def test_build_column_map_skips_extra_cells():
+    assert build_column_map(["name", None]) == {"name": "switch_name"}
+
+
+def test_ragged_csv(tmp_path):
+    source = tmp_path / "catalog.csv"
+    source.write_text(
+        "name,type,actuation_force\n"
+        "Red,Linear,45g,\n"
+        "Blue,Tactile,55g,extra,cells\n"
+        "Brown,Tactile\n"
+    )
+    importer = CatalogImporter({}, str(tmp_path / "images"), copy_images=False)
+    result = importer.run(str(source))
+    assert sorted(result.records) == ["Blue", "Brown", "Red"]
+    assert result.records["Red"]["operation_force"] == "45g"
+    assert result.records["Brown"]["operation_force"] == ""
+    # 空のセルだけなら警告しない
+    assert result.warnings == [(3, "2 cells beyond the header ignored")]
+    assert result.errors == []
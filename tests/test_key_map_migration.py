@@ -0,0 +1,53 @@
+import json
+import os
+
+from PyQt5 import QtWidgets
+
+from conftest import wait_until
+
+
+def _open_window(settings, key_map, monkeypatch):
+    from main_window import MainWindow
+
+    base_dir = settings.value("base_dir")
+    os.makedirs(os.path.join(base_dir, "images"))
+    with open(os.path.join(base_dir, "key_map.json"), "w") as file:
+        json.dump(key_map, file)
+    with open(os.path.join(base_dir, "switch_info.json"), "w") as file:
+        json.dump({name: {"switch_name": name} for name in key_map.values()}, file)
+    questions = []
+
+    def question(*args, **kwargs):
+        questions.append(args[2])
+        return QtWidgets.QMessageBox.Yes
+
+    monkeypatch.setattr(QtWidgets.QMessageBox, "question", question)
+    window = MainWindow(settings)
+    assert wait_until(lambda: window.data_store.is_loaded)
+    # 読み込み後の移行はsingleShotで呼ばれる
+    wait_until(lambda: False, 50)
+    return window, questions
+
+
+def test_load_under_us_then_switch_to_de(qapp, settings, monkeypatch):
+    settings.setValue("layout", "us_ansi_104")
+    window, questions = _open_window(
+        settings, {"z": "Red", "y": "Blue", "q": "Red"}, monkeypatch
+    )
+    try:
+        # USでは文字とキーが同じなので、まだ移行したことにはしない
+        assert questions == []
+        assert window.config_manager.get_key_map_layout() is None
+
+        window.set_layout("de_iso_105")
+        assert len(questions) == 1
+        assert window.data_store.key_map == {"y": "Red", "z": "Blue", "q": "Red"}
+        assert window.config_manager.get_key_map_layout() == "de_iso_105"
+
+        # 一度移したら、配列を変えても聞かずにそのまま使う
+        window.set_layout("us_ansi_104")
+        window.set_layout("de_iso_105")
+        assert len(questions) == 1
+        assert window.data_store.key_map == {"y": "Red", "z": "Blue", "q": "Red"}
+    finally:
+        window.close()
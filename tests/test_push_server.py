@@ -0,0 +1,56 @@
+import asyncio
+import base64
+import os
+
+import pytest
+
+from push_server import PushServer
+
+
+@pytest.fixture
+def server():
+    server = PushServer(None, port=0)
+    server.start()
+    yield server
+    server.stop()
+
+
+def _upgrade(server, origin=None):
+    """WebSocketへのアップグレードを要求し、応答の1行目を返す"""
+
+    async def request():
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        lines = [
+            "GET /ws HTTP/1.1",
+            f"Host: 127.0.0.1:{server.port}",
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            f"Sec-WebSocket-Key: {key}",
+            "Sec-WebSocket-Version: 13",
+        ]
+        if origin:
+            lines.append(f"Origin: {origin}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        await writer.drain()
+        status = await reader.readline()
+        writer.close()
+        return status.decode().strip()
+
+    return asyncio.run(request())
+
+
+def test_websocket_without_origin(server):
+    assert _upgrade(server) == "HTTP/1.1 101 Switching Protocols"
+
+
+def test_websocket_from_own_page(server):
+    origin = f"http://localhost:{server.port}"
+    assert _upgrade(server, origin) == "HTTP/1.1 101 Switching Protocols"
+
+
+def test_websocket_from_foreign_origin(server):
+    assert _upgrade(server, "https://example.com") == "HTTP/1.1 403 Forbidden"
+    # 同じホストでも別のポートで動くページは別のサイト
+    origin = f"http://127.0.0.1:{server.port + 1}"
+    assert _upgrade(server, origin) == "HTTP/1.1 403 Forbidden"